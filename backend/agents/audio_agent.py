@@ -1,26 +1,79 @@
-import whisper
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional
+from collections import Counter
 from .base_agent import BaseAgent
+from utils.model_registry import get_whisper_model
+from utils.vad import speech_windows
 
 class AudioAgent(BaseAgent):
     """Agent for processing audio files"""
     
-    def __init__(self):
+    file_type = "audio"
+    
+    def __init__(self, model_size: str = "base", compute_type: str = "float32",
+                 batch_size: int = 8, window_seconds: float = 30.0,
+                 language: Optional[str] = None):
         super().__init__("AudioAgent")
-        # Load Whisper model (base model for balance of speed/accuracy)
-        self.log("Loading Whisper model...")
-        self.model = whisper.load_model("base")
+        # Whisper is loaded lazily from the shared model registry on first use
+        self.model_size = model_size
+        self.compute_type = compute_type
+        # Speech windows decoded together in one forward pass
+        self.batch_size = batch_size
+        # Whisper's receptive field is 30 s, so windows never exceed it
+        self.window_seconds = min(window_seconds, 30.0)
+        self.language = language
+    
+    @property
+    def model(self):
+        return get_whisper_model(self.model_size, self.compute_type)
+    
+    def iter_segments(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """Yield {"start", "end", "text", "language"} in time order as batches finish
+        
+        The audio is split on silence into windows of at most
+        `window_seconds`, and windows are decoded `batch_size` at a time,
+        so long recordings never hold more than one batch of spectrograms.
+        """
+        import torch
+        import whisper
+        
+        model = self.model
+        audio = whisper.load_audio(file_path)
+        sample_rate = whisper.audio.SAMPLE_RATE
+        windows = speech_windows(audio, sample_rate, max_seconds=self.window_seconds)
+        options = whisper.DecodingOptions(
+            language=self.language,
+            without_timestamps=True,
+            fp16=model.device.type == "cuda"
+        )
+        
+        for i in range(0, len(windows), self.batch_size):
+            batch = windows[i:i + self.batch_size]
+            mels = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[start:end]), model.dims.n_mels)
+                for start, end in batch
+            ]).to(model.device)
+            with torch.no_grad():
+                results = whisper.decode(model, mels, options)
+            
+            for (start, end), result in zip(batch, results):
+                text = result.text.strip()
+                if not text or (result.no_speech_prob > 0.6 and result.avg_logprob < -1.0):
+                    continue
+                yield {
+                    "start": start / sample_rate,
+                    "end": end / sample_rate,
+                    "text": text,
+                    "language": result.language
+                }
     
     def process(self, file_path: str) -> Dict[str, Any]:
         """Transcribe audio to text"""
         self.log(f"Processing Audio: {file_path}")
         
         try:
-            # Transcribe audio
-            result = self.model.transcribe(file_path)
-            
-            text = result["text"]
-            segments = result.get("segments", [])
+            segments = list(self.iter_segments(file_path))
+            text = " ".join(seg["text"] for seg in segments)
+            languages = Counter(seg["language"] for seg in segments)
             
             self.log(f"Transcribed audio ({len(segments)} segments)")
             
@@ -30,7 +83,7 @@ class AudioAgent(BaseAgent):
                 "content": text.strip(),
                 "metadata": {
                     "segments": len(segments),
-                    "language": result.get("language", "unknown"),
+                    "language": languages.most_common(1)[0][0] if languages else "unknown",
                     "timestamps": [
                         {
                             "start": seg["start"],
@@ -5,6 +5,8 @@ from datetime import datetime
 class BaseAgent(ABC):
     """Base class for all processing agents"""
     
+    file_type = "unknown"
+    
     def __init__(self, agent_name: str):
         self.agent_name = agent_name
         self.logs = []
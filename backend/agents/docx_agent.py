@@ -5,6 +5,8 @@ from .base_agent import BaseAgent
 class DOCXAgent(BaseAgent):
     """Agent for processing DOCX files"""
     
+    file_type = "docx"
+    
     def __init__(self):
         super().__init__("DOCXAgent")
     
@@ -1,40 +1,43 @@
 from PIL import Image
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except:
-    TESSERACT_AVAILABLE = False
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from .base_agent import BaseAgent
+from utils.ocr import OCREngine, TESSERACT_AVAILABLE
 
 class ImageAgent(BaseAgent):
     """Agent for processing image files"""
     
-    def __init__(self):
+    file_type = "image"
+    
+    def __init__(self, ocr: Optional[OCREngine] = None):
         super().__init__("ImageAgent")
+        self.ocr = ocr or OCREngine()
     
     def process(self, file_path: str) -> Dict[str, Any]:
         """Extract text from images using OCR"""
         self.log(f"Processing Image: {file_path}")
         
         try:
-            image = Image.open(file_path)
+            with Image.open(file_path) as image:
+                image_size, image_format = image.size, image.format
             
             # Extract text using Tesseract OCR
             if TESSERACT_AVAILABLE:
-                text = pytesseract.image_to_string(image)
+                ocr = self.ocr.recognize(file_path)
+                text, blocks = ocr["text"], ocr["blocks"]
+                source = "cache" if ocr["cached"] else f"{ocr['tiles']} tiles"
+                self.log(f"Extracted {len(blocks)} text blocks from image ({source})")
             else:
                 text = "[Tesseract OCR not installed - Please install to extract text from images]"
-            
-            self.log(f"Extracted text from image")
+                blocks = []
             
             return {
                 "type": "image",
                 "file_path": file_path,
                 "content": text.strip(),
+                "blocks": blocks,
                 "metadata": {
-                    "image_size": image.size,
-                    "format": image.format
+                    "image_size": image_size,
+                    "format": image_format
                 }
             }
         except Exception as e:
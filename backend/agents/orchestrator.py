@@ -1,39 +1,65 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .pdf_agent import PDFAgent
 from .docx_agent import DOCXAgent
 from .image_agent import ImageAgent
 from .audio_agent import AudioAgent
+from .base_agent import BaseAgent
+from utils.ocr import OCREngine
+from utils.metrics import metrics
 import os
 
 class AgentOrchestrator:
     """Orchestrates different agents based on file type"""
     
-    def __init__(self):
+    def __init__(self, whisper_model: str = "base", pdf_workers: int = 4,
+                 pdf_pages_per_task: int = 16, whisper_compute_type: str = "float32",
+                 whisper_batch_size: int = 8, whisper_window_seconds: float = 30.0,
+                 ocr: Optional[OCREngine] = None):
+        # One agent instance per modality, shared across its file extensions
+        pdf_agent = PDFAgent(workers=pdf_workers, pages_per_task=pdf_pages_per_task)
+        docx_agent = DOCXAgent()
+        image_agent = ImageAgent(ocr=ocr)
+        audio_agent = AudioAgent(
+            model_size=whisper_model,
+            compute_type=whisper_compute_type,
+            batch_size=whisper_batch_size,
+            window_seconds=whisper_window_seconds
+        )
+        
         self.agents = {
-            ".pdf": PDFAgent(),
-            ".docx": DOCXAgent(),
-            ".doc": DOCXAgent(),
-            ".png": ImageAgent(),
-            ".jpg": ImageAgent(),
-            ".jpeg": ImageAgent(),
-            ".gif": ImageAgent(),
-            ".bmp": ImageAgent(),
-            ".mp3": AudioAgent(),
-            ".wav": AudioAgent(),
-            ".m4a": AudioAgent(),
-            ".ogg": AudioAgent(),
+            ".pdf": pdf_agent,
+            ".docx": docx_agent,
+            ".doc": docx_agent,
+            ".png": image_agent,
+            ".jpg": image_agent,
+            ".jpeg": image_agent,
+            ".gif": image_agent,
+            ".bmp": image_agent,
+            ".mp3": audio_agent,
+            ".wav": audio_agent,
+            ".m4a": audio_agent,
+            ".ogg": audio_agent,
         }
         self.processed_files = []
     
-    def process_file(self, file_path: str) -> Dict[str, Any]:
-        """Route file to appropriate agent"""
+    def get_agent(self, file_path: str) -> BaseAgent:
+        """Return the agent responsible for a file"""
         file_ext = os.path.splitext(file_path)[1].lower()
         
         if file_ext not in self.agents:
             raise ValueError(f"Unsupported file type: {file_ext}")
         
-        agent = self.agents[file_ext]
-        result = agent.process(file_path)
+        return self.agents[file_ext]
+    
+    def get_file_type(self, file_path: str) -> str:
+        """Return the modality ("pdf", "docx", "image", "audio") of a file"""
+        return self.get_agent(file_path).file_type
+    
+    def process_file(self, file_path: str) -> Dict[str, Any]:
+        """Route file to appropriate agent"""
+        agent = self.get_agent(file_path)
+        with metrics.stage("extract", metric="ingest_stage_seconds", type=agent.file_type):
+            result = agent.process(file_path)
         
         self.processed_files.append(result)
         return result
@@ -41,6 +67,6 @@ class AgentOrchestrator:
     def get_all_logs(self) -> List[Dict[str, Any]]:
         """Collect logs from all agents"""
         all_logs = []
-        for agent in self.agents.values():
+        for agent in {id(a): a for a in self.agents.values()}.values():
             all_logs.extend(agent.get_logs())
         return all_logs
@@ -1,42 +1,104 @@
 import PyPDF2
-from typing import Dict, Any
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import Dict, Any, Iterator, List, Tuple
 from .base_agent import BaseAgent
 
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) of a PDF (runs in a worker process)"""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [
+            (page_num + 1, (pdf_reader.pages[page_num].extract_text() or "").strip())
+            for page_num in range(start, min(end, len(pdf_reader.pages)))
+        ]
+
+
+def _worker_context():
+    """Start method for extraction workers that never forks the (multi-threaded) server
+
+    Forking a process that runs torch, FAISS and executor threads can leave
+    children blocked on locks held by parent threads. The fork server is a
+    clean single-threaded process that preloads only this module.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
 class PDFAgent(BaseAgent):
     """Agent for processing PDF files"""
     
-    def __init__(self):
+    file_type = "pdf"
+    
+    def __init__(self, workers: int = 4, pages_per_task: int = 16):
         super().__init__("PDFAgent")
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self._pool = None
+        self._pool_lock = threading.Lock()
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_worker_context())
+            return self._pool
+    
+    def iter_pages(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """Yield {"page", "text"} in page order as extraction proceeds
+        
+        Page ranges are extracted in parallel worker processes; at most
+        2 x workers ranges are in flight, so memory stays bounded however
+        many pages the file has.
+        """
+        with open(file_path, 'rb') as file:
+            num_pages = len(PyPDF2.PdfReader(file).pages)
+        
+        ranges = [(start, start + self.pages_per_task)
+                  for start in range(0, num_pages, self.pages_per_task)]
+        
+        # Small files are not worth the process round trip
+        if self.workers <= 1 or len(ranges) <= 1:
+            for start, end in ranges:
+                for page, text in _extract_page_range(file_path, start, end):
+                    yield {"page": page, "text": text}
+            return
+        
+        pool = self._get_pool()
+        pending = deque()
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < 2 * self.workers:
+                start, end = ranges[next_range]
+                pending.append(pool.submit(_extract_page_range, file_path, start, end))
+                next_range += 1
+            for page, text in pending.popleft().result():
+                yield {"page": page, "text": text}
     
     def process(self, file_path: str) -> Dict[str, Any]:
         """Extract text from PDF"""
         self.log(f"Processing PDF: {file_path}")
         
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text_content = []
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    text_content.append({
-                        "page": page_num + 1,
-                        "text": text.strip()
-                    })
-                
-                full_text = " ".join([p["text"] for p in text_content])
-                
-                self.log(f"Extracted {len(text_content)} pages from PDF")
-                
-                return {
-                    "type": "pdf",
-                    "file_path": file_path,
-                    "content": full_text,
-                    "metadata": {
-                        "pages": len(text_content),
-                        "page_contents": text_content
-                    }
+            text_content = list(self.iter_pages(file_path))
+            full_text = " ".join([p["text"] for p in text_content])
+            
+            self.log(f"Extracted {len(text_content)} pages from PDF")
+            
+            return {
+                "type": "pdf",
+                "file_path": file_path,
+                "content": full_text,
+                "metadata": {
+                    "pages": len(text_content),
+                    "page_contents": text_content
                 }
+            }
         except Exception as e:
             self.log(f"Error processing PDF: {str(e)}")
             raise
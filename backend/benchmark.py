@@ -0,0 +1,320 @@
+"""Reproducible benchmarks for the ingest and query paths
+
+    python benchmark.py corpus ./bench_corpus --pdf 20 --docx 20 --image 10 --audio 4
+    python benchmark.py micro ./bench_corpus --out micro.json --baseline micro_baseline.json
+    python benchmark.py load ./bench_corpus --url http://localhost:8000 --reset --out load.json
+    python benchmark.py compare micro.json micro_baseline.json
+
+Component scenarios, each with the same --out/--baseline options:
+
+    python benchmark.py generation      # batched vs unbatched generation
+    python benchmark.py prefix-cache    # time to first token with and without prefix reuse
+    python benchmark.py backends        # tokens/s, embeddings/s and RSS per inference backend
+    python benchmark.py ocr ./bench_corpus image.png ...
+    python benchmark.py rerank eval.jsonl
+
+micro runs offline and in-process against a temporary vector store (the
+server's data directories are not touched); load drives a running server
+over HTTP; rerank searches the server's vector store, so stop the server
+first. Results are JSON; with --baseline (or compare) metrics that moved
+by more than --tolerance are reported and the exit code is 1 on regressions.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import config
+from utils.benchmark import (bench_vector_store, bench_build_context, bench_agents, bench_generation,
+                             bench_prefix_cache, bench_backend, bench_ocr, bench_rerank_context,
+                             load_test, environment, compare)
+from utils.synthetic_corpus import generate_corpus, synthetic_chunks, synthetic_queries, FILE_TYPES
+
+MICRO_PARTS = ["vector_store", "build_context", "agents"]
+PROMPTS = [f"Question: What is {topic}?\n\nAnswer:" for topic in
+           ["retrieval", "a vector index", "speech recognition", "OCR", "a PDF", "batching"]]
+
+
+def load_manifest(corpus_dir: str) -> dict:
+    path = os.path.join(corpus_dir, "manifest.json")
+    if not os.path.exists(path):
+        sys.exit(f"No manifest.json in {corpus_dir}; create the corpus with: python benchmark.py corpus {corpus_dir}")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_micro(args) -> dict:
+    from agents.orchestrator import AgentOrchestrator
+    from utils.vector_store import VectorStore
+    from utils.rag_pipeline import RAGPipeline
+    from utils.ocr import OCREngine
+
+    manifest = load_manifest(args.corpus) if "agents" in args.parts else None
+    chunks = synthetic_chunks(args.chunks, seed=args.seed)
+    queries = synthetic_queries(args.queries, seed=args.seed + 1)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as db_path:
+        store = VectorStore(
+            model_name=config.EMBEDDING_MODEL,
+            embedding_backend=config.EMBEDDING_BACKEND,
+            db_path=db_path,
+            index_type=config.VECTOR_INDEX_TYPE,
+            index_params=config.VECTOR_INDEX_PARAMS,
+            search_batch_size=config.SEARCH_BATCH_SIZE,
+            search_batch_wait_ms=config.SEARCH_BATCH_WAIT_MS,
+            lexical_weight=config.HYBRID_LEXICAL_WEIGHT,
+            fusion_depth=config.HYBRID_FUSION_DEPTH
+        )
+        if "vector_store" in args.parts or "build_context" in args.parts:
+            results["vector_store"] = bench_vector_store(
+                store, chunks, queries, add_batch_size=args.batch_size, top_k=args.top_k,
+                concurrency=tuple(args.concurrency)
+            )
+            if "vector_store" not in args.parts:
+                del results["vector_store"]
+        if "build_context" in args.parts:
+            pipeline = RAGPipeline(model_path=config.MODEL_PATH, vector_store=store, logger=None,
+                                   model_name=config.LLM_MODEL_NAME, backend=config.LLM_BACKEND)
+            results["build_context"] = bench_build_context(pipeline, store, queries, top_k=args.top_k)
+        store.reset()
+
+    if "agents" in args.parts:
+        orchestrator = AgentOrchestrator(
+            whisper_model=config.WHISPER_MODEL,
+            pdf_workers=config.PDF_WORKERS,
+            pdf_pages_per_task=config.PDF_PAGES_PER_TASK,
+            whisper_compute_type=config.WHISPER_COMPUTE_TYPE,
+            whisper_batch_size=config.WHISPER_BATCH_SIZE,
+            whisper_window_seconds=config.WHISPER_WINDOW_SECONDS,
+            ocr=OCREngine(workers=config.OCR_WORKERS, tile_size=config.OCR_TILE_SIZE,
+                          target_dpi=config.OCR_TARGET_DPI, lang=config.OCR_LANG,
+                          binarize=config.OCR_BINARIZE)
+        )
+        results["agents"] = bench_agents(orchestrator, manifest["files"])
+
+    return {
+        "kind": "micro",
+        "environment": environment({
+            "embedding_model": config.EMBEDDING_MODEL,
+            "embedding_backend": config.EMBEDDING_BACKEND,
+            "index_type": config.VECTOR_INDEX_TYPE,
+        }),
+        "parameters": {key: value for key, value in vars(args).items() if key != "func"},
+        "results": results,
+    }
+
+
+def run_load(args) -> dict:
+    manifest = load_manifest(args.corpus)
+    return {
+        "kind": "load",
+        "environment": environment({"url": args.url}),
+        "parameters": {key: value for key, value in vars(args).items() if key != "func"},
+        "corpus": {"seed": manifest["seed"], "counts": manifest["counts"]},
+        "results": load_test(args.url, manifest["files"], manifest["queries"],
+                             concurrency=tuple(args.concurrency), query_requests=args.queries,
+                             top_k=args.top_k, reset=args.reset),
+    }
+
+
+def scenario_output(kind: str, args, results: dict, extra: dict = None) -> dict:
+    return {
+        "kind": kind,
+        "environment": environment(extra),
+        "parameters": {key: value for key, value in vars(args).items() if key != "func"},
+        "results": results,
+    }
+
+
+def run_generation(args) -> dict:
+    from utils.generation_scheduler import GenerationScheduler
+    from utils.inference_backends import load_generator
+
+    generator = load_generator(config.LLM_BACKEND, config.LLM_MODEL_NAME, config.MODEL_PATH)
+
+    def kwargs():
+        return {"max_new_tokens": args.max_new_tokens, "do_sample": False}
+
+    unbatched = GenerationScheduler(lambda: generator, kwargs, max_batch_size=1, max_wait_ms=0)
+    batched = GenerationScheduler(lambda: generator, kwargs, max_batch_size=config.GENERATION_BATCH_SIZE,
+                                  max_wait_ms=config.GENERATION_BATCH_WAIT_MS)
+    unbatched.generate(PROMPTS[0])  # warm up
+    return scenario_output("generation", args, {
+        "unbatched": bench_generation(unbatched.generate, PROMPTS, tuple(args.concurrency)),
+        "batched": bench_generation(batched.generate, PROMPTS, tuple(args.concurrency)),
+    }, {"llm_backend": config.LLM_BACKEND, "llm_model": config.LLM_MODEL_NAME})
+
+
+def run_prefix_cache(args) -> dict:
+    from utils.inference_backends import load_generator
+    from utils.prefix_cache import PrefixKVCache
+    from utils.rag_pipeline import RAGPipeline
+
+    chunks = [{"document": chunk["text"], "metadata": {"file_path": f"doc_{i}.pdf"}}
+              for i, chunk in enumerate(synthetic_chunks(12, seed=args.seed))]
+    pipeline = RAGPipeline(model_path=config.MODEL_PATH, vector_store=None, logger=None,
+                           model_name=config.LLM_MODEL_NAME, backend=config.LLM_BACKEND)
+    # Queries whose top hits overlap, as follow-up questions on the same documents do
+    questions = [f"What does document {i} say about {topic}?"
+                 for i, topic in enumerate(["latency", "revenue", "storage", "incidents"] * 3)]
+    prompts = [pipeline._build_prompt(question, pipeline._context_segments(question, chunks[i % 3:i % 3 + 4]))
+               for i, question in enumerate(questions)]
+    generator = load_generator(config.LLM_BACKEND, config.LLM_MODEL_NAME, config.MODEL_PATH,
+                               prefix_cache=PrefixKVCache(max_bytes=config.PREFIX_CACHE_MB * 1024 * 1024))
+    return scenario_output("prefix-cache", args, bench_prefix_cache(generator, prompts),
+                           {"llm_backend": config.LLM_BACKEND, "llm_model": config.LLM_MODEL_NAME})
+
+
+def run_backends(args) -> dict:
+    from utils.inference_backends import LLM_BACKENDS, EMBEDDING_BACKENDS
+
+    texts = [chunk["text"] for chunk in synthetic_chunks(512, seed=args.seed)]
+    return scenario_output("backends", args, {
+        "llm": {backend: bench_backend("llm", backend, model_name=config.LLM_MODEL_NAME,
+                                       model_path=config.MODEL_PATH, prompts=PROMPTS,
+                                       max_new_tokens=args.max_new_tokens)
+                for backend in args.llm or LLM_BACKENDS},
+        "embedder": {backend: bench_backend("embedder", backend, model_name=config.EMBEDDING_MODEL, texts=texts)
+                     for backend in args.embedder or EMBEDDING_BACKENDS},
+    }, {"llm_model": config.LLM_MODEL_NAME, "embedding_model": config.EMBEDDING_MODEL})
+
+
+def run_ocr(args) -> dict:
+    from utils.ocr import OCREngine
+
+    paths = []
+    for path in args.images:
+        if os.path.isdir(path):
+            paths.extend(f["path"] for f in load_manifest(path)["files"] if f["type"] == "image")
+        else:
+            paths.append(path)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        engine = OCREngine(workers=config.OCR_WORKERS, tile_size=config.OCR_TILE_SIZE,
+                           target_dpi=config.OCR_TARGET_DPI, lang=config.OCR_LANG,
+                           binarize=config.OCR_BINARIZE, cache_dir=cache_dir)
+        return scenario_output("ocr", args, {"images": len(paths), **bench_ocr(engine, paths)})
+
+
+def run_rerank(args) -> dict:
+    from utils.vector_store import VectorStore
+    from utils.reranker import Reranker
+
+    with open(args.examples, 'r', encoding='utf-8') as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    store = VectorStore(model_name=config.EMBEDDING_MODEL, embedding_backend=config.EMBEDDING_BACKEND,
+                        db_path=config.VECTOR_DB_PATH,
+                        index_type=config.VECTOR_INDEX_TYPE, index_params=config.VECTOR_INDEX_PARAMS,
+                        search_batch_size=1)
+    reranker = Reranker(model_name=config.RERANK_MODEL, candidates=config.RERANK_CANDIDATES or 20,
+                        batch_size=config.RERANK_BATCH_SIZE)
+    return scenario_output("rerank", args, bench_rerank_context(store, reranker, examples),
+                           {"rerank_model": config.RERANK_MODEL, "embedding_model": config.EMBEDDING_MODEL})
+
+
+def report(output: dict, args) -> int:
+    """Print and save results, comparing against a baseline; returns the exit code"""
+    code = 0
+    if getattr(args, "baseline", None):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            output["comparison"] = compare(output, json.load(f), tolerance=args.tolerance)
+        code = 1 if output["comparison"]["regressions"] else 0
+    text = json.dumps(output, indent=2)
+    print(text)
+    if getattr(args, "out", None):
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    if "comparison" in output:
+        for entry in output["comparison"]["regressions"]:
+            print(f"REGRESSION {entry['metric']}: {entry['baseline']} -> {entry['current']}", file=sys.stderr)
+    return code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and query performance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    corpus = commands.add_parser("corpus", help="Generate a synthetic PDF/DOCX/image/audio corpus")
+    corpus.add_argument("corpus", help="Output directory")
+    for file_type in FILE_TYPES:
+        corpus.add_argument(f"--{file_type}", type=int, default=2, help=f"Number of {file_type} files")
+    corpus.add_argument("--pages", type=int, default=5, help="Pages per PDF (other types scale with it)")
+    corpus.add_argument("--audio-seconds", type=float, default=20.0)
+    corpus.add_argument("--seed", type=int, default=0)
+
+    def add_output(command, baseline: bool = True):
+        command.add_argument("--out", default=None, help="Write results JSON here")
+        if baseline:
+            command.add_argument("--baseline", default=None, help="Results JSON to compare against")
+        command.add_argument("--tolerance", type=float, default=0.2,
+                             help="Relative change reported as a regression (default 0.2 = 20%%)")
+
+    micro = commands.add_parser("micro", help="Offline in-process micro-benchmarks")
+    micro.add_argument("corpus", help="Corpus directory (for the agent benchmarks)")
+    micro.add_argument("--parts", nargs="+", choices=MICRO_PARTS, default=MICRO_PARTS)
+    micro.add_argument("--chunks", type=int, default=2000, help="Synthetic chunks added to the store")
+    micro.add_argument("--queries", type=int, default=200)
+    micro.add_argument("--batch-size", type=int, default=64, help="Chunks per add_documents call")
+    micro.add_argument("--top-k", type=int, default=5)
+    micro.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    micro.add_argument("--seed", type=int, default=0)
+    add_output(micro)
+
+    load = commands.add_parser("load", help="Concurrent HTTP load against a running server")
+    load.add_argument("corpus", help="Corpus directory to upload and query")
+    load.add_argument("--url", default=f"http://localhost:{config.API_PORT}")
+    load.add_argument("--queries", type=int, default=100, help="Query requests per concurrency level")
+    load.add_argument("--top-k", type=int, default=5)
+    load.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    load.add_argument("--reset", action="store_true",
+                      help="DELETE /reset first so uploads are ingested, not deduplicated")
+    add_output(load)
+
+    generation = commands.add_parser("generation", help="Batched vs unbatched generation throughput")
+    generation.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    generation.add_argument("--max-new-tokens", type=int, default=64)
+    add_output(generation)
+
+    prefix = commands.add_parser("prefix-cache", help="Time to first token with and without prefix reuse")
+    prefix.add_argument("--seed", type=int, default=0)
+    add_output(prefix)
+
+    backends = commands.add_parser("backends", help="Tokens/s, embeddings/s and RSS per inference backend")
+    backends.add_argument("--llm", nargs="+", default=None, help="LLM backends (default: all)")
+    backends.add_argument("--embedder", nargs="+", default=None, help="Embedding backends (default: all)")
+    backends.add_argument("--max-new-tokens", type=int, default=64)
+    backends.add_argument("--seed", type=int, default=0)
+    add_output(backends)
+
+    ocr = commands.add_parser("ocr", help="Tiled, cached OCR vs whole-image Tesseract")
+    ocr.add_argument("images", nargs="+", help="Image files, or corpus directories (their images)")
+    add_output(ocr)
+
+    rerank = commands.add_parser("rerank", help="Context needed for the evidence, with and without reranking")
+    rerank.add_argument("examples", help='JSONL file, one {"question": ..., "evidence": ...} per line')
+    add_output(rerank)
+
+    comparison = commands.add_parser("compare", help="Compare two results files")
+    comparison.add_argument("current")
+    comparison.add_argument("baseline")
+    comparison.add_argument("--tolerance", type=float, default=0.2)
+
+    args = parser.parse_args()
+    if args.command == "corpus":
+        manifest = generate_corpus(args.corpus, {t: getattr(args, t) for t in FILE_TYPES},
+                                   pages=args.pages, audio_seconds=args.audio_seconds, seed=args.seed)
+        print(f"Wrote {len(manifest['files'])} files and {len(manifest['queries'])} queries to {args.corpus}")
+        return
+    if args.command == "compare":
+        with open(args.current, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        sys.exit(report(current, args))
+
+    runners = {"micro": run_micro, "load": run_load, "generation": run_generation,
+               "prefix-cache": run_prefix_cache, "backends": run_backends, "ocr": run_ocr, "rerank": run_rerank}
+    sys.exit(report(runners[args.command](args), args))
+
+
+if __name__ == "__main__":
+    main()
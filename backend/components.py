@@ -0,0 +1,139 @@
+"""Construction of the ingestion and query components from config
+
+Importing this module has no side effects. The API server (main.py) and
+the bulk CLI (ingest.py) each call build_components() once, in their main
+process; worker processes (PDF extraction) re-import the launching script
+and must never open the vector store.
+"""
+from typing import Optional
+
+import config
+from agents.orchestrator import AgentOrchestrator
+from utils.vector_store import VectorStore
+from utils.logger import QueryLogger
+from utils.rag_pipeline import RAGPipeline
+from utils.model_registry import registry
+from utils.answer_cache import AnswerCache
+from utils.content_index import ContentIndex
+from utils.ingestion import IngestionPipeline
+from utils.chunker import Chunker
+from utils.ocr import OCREngine
+from utils.reranker import Reranker
+from utils.prefix_cache import PrefixKVCache
+from utils.context_packer import ContextPacker
+from utils.segment_store import lock_directory
+
+
+class Components:
+    """The components one process uses; logger and rag_pipeline are None for ingestion only"""
+
+    def __init__(self, orchestrator: AgentOrchestrator, vector_store: VectorStore,
+                 content_index: ContentIndex, ingestion: IngestionPipeline,
+                 logger: Optional[QueryLogger], rag_pipeline: Optional[RAGPipeline], lock):
+        self.orchestrator = orchestrator
+        self.vector_store = vector_store
+        self.content_index = content_index
+        self.ingestion = ingestion
+        self.logger = logger
+        self.rag_pipeline = rag_pipeline
+        self._lock = lock
+
+    def close(self):
+        """Flush the query history and release the vector store lock"""
+        if self.logger is not None:
+            self.logger.close()
+        self._lock.close()
+
+
+def build_orchestrator() -> AgentOrchestrator:
+    return AgentOrchestrator(
+        whisper_model=config.WHISPER_MODEL,
+        pdf_workers=config.PDF_WORKERS,
+        pdf_pages_per_task=config.PDF_PAGES_PER_TASK,
+        whisper_compute_type=config.WHISPER_COMPUTE_TYPE,
+        whisper_batch_size=config.WHISPER_BATCH_SIZE,
+        whisper_window_seconds=config.WHISPER_WINDOW_SECONDS,
+        ocr=OCREngine(
+            workers=config.OCR_WORKERS,
+            tile_size=config.OCR_TILE_SIZE,
+            target_dpi=config.OCR_TARGET_DPI,
+            lang=config.OCR_LANG,
+            cache_dir=config.OCR_CACHE_DIR,
+            binarize=config.OCR_BINARIZE
+        )
+    )
+
+
+def build_components(query: bool = True) -> Components:
+    """Open the vector store (locked against other processes) and build the pipelines
+
+    query=False skips the query history and RAG pipeline (bulk ingestion).
+    Models are loaded lazily on first use.
+    """
+    lock = lock_directory(config.VECTOR_DB_PATH)
+    registry.idle_timeout = config.MODEL_IDLE_TIMEOUT
+    orchestrator = build_orchestrator()
+    vector_store = VectorStore(
+        model_name=config.EMBEDDING_MODEL,
+        embedding_backend=config.EMBEDDING_BACKEND,
+        db_path=config.VECTOR_DB_PATH,
+        compact_threshold=config.VECTOR_DB_COMPACT_SEGMENTS,
+        purge_ratio=config.VECTOR_DB_PURGE_RATIO,
+        index_type=config.VECTOR_INDEX_TYPE,
+        index_params=config.VECTOR_INDEX_PARAMS,
+        search_batch_size=config.SEARCH_BATCH_SIZE,
+        search_batch_wait_ms=config.SEARCH_BATCH_WAIT_MS,
+        lexical_weight=config.HYBRID_LEXICAL_WEIGHT,
+        fusion_depth=config.HYBRID_FUSION_DEPTH,
+        exact_filter_limit=config.FILTER_EXACT_LIMIT
+    )
+    content_index = ContentIndex(db_path=config.VECTOR_DB_PATH)
+    chunker = Chunker(
+        count_tokens=vector_store.count_tokens,
+        max_tokens=config.CHUNK_MAX_TOKENS,
+        overlap_tokens=config.CHUNK_OVERLAP_TOKENS
+    )
+    ingestion = IngestionPipeline(orchestrator, vector_store, content_index, chunker=chunker)
+    if not query:
+        return Components(orchestrator, vector_store, content_index, ingestion, None, None, lock)
+
+    logger = QueryLogger(
+        log_dir=config.LOGS_DIR,
+        max_bytes=config.HISTORY_MAX_BYTES,
+        max_age_seconds=config.HISTORY_ROTATE_SECONDS,
+        max_files=config.HISTORY_MAX_FILES,
+        flush_interval_ms=config.HISTORY_FLUSH_INTERVAL_MS
+    )
+    rag_pipeline = RAGPipeline(
+        model_path=config.MODEL_PATH,
+        vector_store=vector_store,
+        logger=logger,
+        max_tokens=config.MAX_TOKENS,
+        temperature=config.TEMPERATURE,
+        model_name=config.LLM_MODEL_NAME,
+        backend=config.LLM_BACKEND,
+        prefix_cache=PrefixKVCache(
+            max_bytes=config.PREFIX_CACHE_MB * 1024 * 1024
+        ) if config.PREFIX_CACHE_MB > 0 else None,
+        batch_size=config.GENERATION_BATCH_SIZE,
+        batch_wait_ms=config.GENERATION_BATCH_WAIT_MS,
+        answer_cache=AnswerCache(
+            max_entries=config.ANSWER_CACHE_SIZE,
+            ttl_seconds=config.ANSWER_CACHE_TTL,
+            similarity_threshold=config.ANSWER_CACHE_THRESHOLD
+        ) if config.ANSWER_CACHE_SIZE > 0 else None,
+        reranker=Reranker(
+            model_name=config.RERANK_MODEL,
+            candidates=config.RERANK_CANDIDATES,
+            batch_size=config.RERANK_BATCH_SIZE,
+            budget_ms=config.RERANK_BUDGET_MS,
+            cache_size=config.RERANK_CACHE_SIZE
+        ) if config.RERANK_CANDIDATES > 0 else None,
+        context_packer=ContextPacker(
+            token_budget=config.CONTEXT_TOKEN_BUDGET,
+            max_chunks=config.CONTEXT_MAX_CHUNKS,
+            mmr_lambda=config.CONTEXT_MMR_LAMBDA,
+            duplicate_threshold=config.CONTEXT_DUPLICATE_THRESHOLD
+        )
+    )
+    return Components(orchestrator, vector_store, content_index, ingestion, logger, rag_pipeline, lock)
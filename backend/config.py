@@ -10,6 +10,21 @@ EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./data/uploads")
 VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "./data/vector_db")
 LOGS_DIR = os.getenv("LOGS_DIR", "./logs")
+# Merge append-only vector store segments once this many accumulate
+VECTOR_DB_COMPACT_SEGMENTS = int(os.getenv("VECTOR_DB_COMPACT_SEGMENTS", 16))
+# Purge deleted chunks from every store once they make up this share of the index
+VECTOR_DB_PURGE_RATIO = float(os.getenv("VECTOR_DB_PURGE_RATIO", 0.1))
+
+# Vector Index - flat, ivf_flat, ivf_pq or hnsw (ANN types train once VECTOR_INDEX_TRAIN_SIZE vectors exist)
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+VECTOR_INDEX_PARAMS = {
+    "train_size": int(os.getenv("VECTOR_INDEX_TRAIN_SIZE", 10000)),
+    "nlist": int(os.getenv("VECTOR_INDEX_NLIST", 1024)),
+    "pq_m": int(os.getenv("VECTOR_INDEX_PQ_M", 48)),
+    "hnsw_m": int(os.getenv("VECTOR_INDEX_HNSW_M", 32)),
+    "nprobe": int(os.getenv("VECTOR_INDEX_NPROBE", 16)),
+    "ef_search": int(os.getenv("VECTOR_INDEX_EF_SEARCH", 64)),
+}
 
 # API - Hardcoded to port 8000
 API_HOST = "0.0.0.0"
@@ -19,7 +34,102 @@ API_PORT = 8000
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", 512))
 TEMPERATURE = float(os.getenv("TEMPERATURE", 0.7))
 TOP_K = int(os.getenv("TOP_K", 5))
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "Qwen/Qwen2.5-0.5B-Instruct")
+# Inference backends - LLM: torch (fp32), int8, onnx or gguf (llama.cpp on MODEL_PATH);
+# embedder: torch, int8 or onnx
+LLM_BACKEND = os.getenv("LLM_BACKEND", "torch")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+# "int8" dynamically quantizes Whisper for faster CPU inference
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "float32")
+# Speech windows (split on silence, at most 30 s) transcribed per batch
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", 8))
+WHISPER_WINDOW_SECONDS = float(os.getenv("WHISPER_WINDOW_SECONDS", 30))
+# Dynamic batching of concurrent generations (batch size 1 disables it)
+GENERATION_BATCH_SIZE = int(os.getenv("GENERATION_BATCH_SIZE", 8))
+GENERATION_BATCH_WAIT_MS = float(os.getenv("GENERATION_BATCH_WAIT_MS", 20))
+
+# Model Registry - unload models unused for this many seconds (0 keeps them loaded)
+MODEL_IDLE_TIMEOUT = float(os.getenv("MODEL_IDLE_TIMEOUT", 0))
+
+# Ingestion job queue
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 100))
+# /reset waits this long for running ingestion jobs before answering 409
+RESET_WAIT_SECONDS = float(os.getenv("RESET_WAIT_SECONDS", 60))
+# Concurrent jobs allowed per modality (Whisper and OCR are CPU heavy)
+INGEST_CONCURRENCY = {
+    "pdf": int(os.getenv("INGEST_PDF_CONCURRENCY", 2)),
+    "docx": int(os.getenv("INGEST_DOCX_CONCURRENCY", 2)),
+    "image": int(os.getenv("INGEST_IMAGE_CONCURRENCY", 2)),
+    "audio": int(os.getenv("INGEST_AUDIO_CONCURRENCY", 1)),
+}
+
+# Micro-batching of concurrent searches (batch size 1 disables it)
+SEARCH_BATCH_SIZE = int(os.getenv("SEARCH_BATCH_SIZE", 32))
+SEARCH_BATCH_WAIT_MS = float(os.getenv("SEARCH_BATCH_WAIT_MS", 2))
+
+# Hybrid retrieval - share of BM25 in reciprocal-rank fusion (0 = dense only, 1 = BM25 only)
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", 0.5))
+# Hits taken from each retriever before fusion
+HYBRID_FUSION_DEPTH = int(os.getenv("HYBRID_FUSION_DEPTH", 50))
+# Filtered searches matching at most this many chunks are scored exactly on those chunks only
+FILTER_EXACT_LIMIT = int(os.getenv("FILTER_EXACT_LIMIT", 50000))
+
+# Cross-encoder reranking - hits over-fetched and rescored per query (0 candidates disables it)
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 0))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 16))
+# Per-request reranking budget; fewer candidates are scored (or none) when it would be exceeded
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 200))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", 10000))
+
+# Context packing - LLM tokens of retrieved chunks per prompt (also capped by the model's input length)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 800))
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", 8))
+# Maximal marginal relevance trade-off: 1.0 ranks by relevance only, lower values favour diversity
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+# Share of a chunk's word 5-grams already in the context above which it is dropped as a duplicate
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.8))
+
+# Answer cache (0 entries disables it)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 1024))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))
+# Cosine similarity above which a different question reuses a cached answer (0 = exact matches only)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0))
+
+# Prompt-prefix KV cache - memory for reused prefill state (0 disables it)
+PREFIX_CACHE_MB = int(os.getenv("PREFIX_CACHE_MB", 256))
+
+# Image OCR - images are resampled to the target DPI and large ones split into tiles
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 4))
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 300))
+OCR_TILE_SIZE = int(os.getenv("OCR_TILE_SIZE", 2000))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+# Otsu-binarize images before Tesseract (turn off for photos with uneven lighting)
+OCR_BINARIZE = os.getenv("OCR_BINARIZE", "true").lower() in ("1", "true", "yes")
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "./data/ocr_cache")
+
+# Bulk ingestion (ingest.py and /upload/batch) - files per index commit and embedding batch size
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", 4))
+BULK_GROUP_SIZE = int(os.getenv("BULK_GROUP_SIZE", 64))
+BULK_EMBED_BATCH_SIZE = int(os.getenv("BULK_EMBED_BATCH_SIZE", 256))
+
+# Chunking - size in embedding-model tokens, with overlap between neighbours
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 200))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 30))
+
+# PDF extraction - worker processes and pages per task
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", 4))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+
+# Query history - rotated by size or age, newest HISTORY_MAX_FILES rotated files kept
+HISTORY_MAX_BYTES = int(os.getenv("HISTORY_MAX_BYTES", 50 * 1024 * 1024))
+HISTORY_ROTATE_SECONDS = float(os.getenv("HISTORY_ROTATE_SECONDS", 86400))
+HISTORY_MAX_FILES = int(os.getenv("HISTORY_MAX_FILES", 30))
+# Appends are batched off the request path at this interval
+HISTORY_FLUSH_INTERVAL_MS = float(os.getenv("HISTORY_FLUSH_INTERVAL_MS", 500))
 
 # Create directories
-for directory in [UPLOAD_DIR, VECTOR_DB_PATH, LOGS_DIR]:
+for directory in [UPLOAD_DIR, VECTOR_DB_PATH, LOGS_DIR, OCR_CACHE_DIR]:
     os.makedirs(directory, exist_ok=True)
@@ -0,0 +1,55 @@
+"""Bulk ingestion from the command line
+
+    python ingest.py ./archive                 # every supported file under a directory
+    python ingest.py files.txt --checkpoint run.jsonl
+
+Uses the same configuration and data directories as the API server. The
+vector store is locked while either runs, so stop the server first.
+"""
+import argparse
+import json
+
+import config
+from components import build_components
+from utils.bulk_ingest import BulkIngestor, discover_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a directory or manifest of files")
+    parser.add_argument("source", help="Directory to walk, or a manifest with one path per line")
+    parser.add_argument("--checkpoint", default=None,
+                        help="JSONL checkpoint; finished files listed there are skipped on resume")
+    parser.add_argument("--workers", type=int, default=config.BULK_WORKERS)
+    parser.add_argument("--group-size", type=int, default=config.BULK_GROUP_SIZE)
+    parser.add_argument("--embed-batch-size", type=int, default=config.BULK_EMBED_BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        components = build_components(query=False)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    files = discover_files(args.source, components.orchestrator.agents.keys())
+    print(f"Found {len(files)} files in {args.source}")
+
+    ingestor = BulkIngestor(
+        components.ingestion,
+        workers=args.workers,
+        group_size=args.group_size,
+        embed_batch_size=args.embed_batch_size,
+        checkpoint_path=args.checkpoint
+    )
+
+    def progress(report):
+        print(f"[{report['processed'] + report['skipped']}/{report['files']}] "
+              f"{report['files_per_second']} files/s, {report['chunks_per_second']} chunks/s, "
+              f"{report['failed']} failed")
+
+    try:
+        report = ingestor.run(files, progress=progress)
+    finally:
+        components.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,79 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 import os
+import json
 import shutil
-from datetime import datetime
+import time
+import uuid
 
-from agents.orchestrator import AgentOrchestrator
-from utils.vector_store import VectorStore
-from utils.logger import QueryLogger
-from utils.rag_pipeline import RAGPipeline
+from components import build_components
+from utils.model_registry import registry
+from utils.job_queue import IngestionJobQueue, QueueFullError
+from utils.bulk_ingest import BulkIngestor
+from utils.metrics import metrics, Trace
 import config
 
-app = FastAPI(title="Multi-modal RAG System", version="1.0.0")
+# Components are built at startup, not on import: worker processes (e.g. PDF
+# extraction) re-import the launching script and must not open the vector store
+components = orchestrator = vector_store = logger = rag_pipeline = None
+content_index = ingestion = ingest_queue = None
+
+def start():
+    """Build the components (models are loaded lazily on first use) and the ingestion queue"""
+    global components, orchestrator, vector_store, logger, rag_pipeline, content_index, ingestion, ingest_queue
+    components = build_components()
+    orchestrator = components.orchestrator
+    vector_store = components.vector_store
+    logger = components.logger
+    rag_pipeline = components.rag_pipeline
+    content_index = components.content_index
+    ingestion = components.ingestion
+    ingest_queue = IngestionJobQueue(
+        max_workers=config.INGEST_WORKERS,
+        max_queued=config.INGEST_QUEUE_SIZE,
+        modality_limits=config.INGEST_CONCURRENCY
+    )
+
+    # Scrape-time gauges for /metrics
+    metrics.gauge("ingest_queue_pending", lambda: {
+        (("type", file_type),): pending for file_type, pending in ingest_queue.get_stats()["pending_by_type"].items()
+    }, "Ingestion jobs queued or running, by type")
+    metrics.gauge("generation_queue_depth",
+                  lambda: rag_pipeline.scheduler.get_stats()["queue_depth"] if rag_pipeline.scheduler else None,
+                  "Prompts waiting for a generation batch")
+    metrics.gauge("search_queue_depth",
+                  lambda: vector_store.batcher.get_stats()["queue_depth"] if vector_store.batcher else None,
+                  "Searches waiting for a search batch")
+    metrics.gauge("history_pending_writes", lambda: logger.get_stats()["pending_writes"],
+                  "Query history entries not yet written to disk")
+    metrics.gauge("index_vectors", lambda: vector_store.index.ntotal, "Vectors in the FAISS index")
+    metrics.gauge("deleted_vectors", lambda: len(vector_store.tombstones), "Tombstoned vectors awaiting purge")
+    metrics.gauge("process_rss_bytes", lambda: registry.get_stats()["process_rss_bytes"], "Resident memory of the server")
+    metrics.gauge("model_memory_bytes", lambda: {
+        (("model", name),): stats["memory_bytes"]
+        for name, stats in registry.get_stats()["models"].items() if stats["loaded"]
+    }, "Resident memory added by loading each model")
+    metrics.gauge("model_loaded", lambda: {
+        (("model", name),): int(stats["loaded"]) for name, stats in registry.get_stats()["models"].items()
+    }, "Whether each registered model is loaded")
+
+def stop():
+    """Let running ingestion jobs finish, flush the query history and release the store"""
+    ingest_queue.shutdown(wait=True)
+    components.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start()
+    yield
+    stop()
+
+app = FastAPI(title="Multi-modal RAG System", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -21,30 +82,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
-# Initialize components
-orchestrator = AgentOrchestrator()
-vector_store = VectorStore(model_name=config.EMBEDDING_MODEL, db_path=config.VECTOR_DB_PATH)
-logger = QueryLogger(log_dir=config.LOGS_DIR)
-rag_pipeline = RAGPipeline(
-    model_path=config.MODEL_PATH,
-    vector_store=vector_store,
-    logger=logger,
-    max_tokens=config.MAX_TOKENS,
-    temperature=config.TEMPERATURE
-)
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    """Time every request by route and tag it with a trace id (X-Trace-Id, accepted or generated)"""
+    request.state.trace_id = request.headers.get("X-Trace-Id") or uuid.uuid4().hex[:16]
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = request.state.trace_id
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.observe("http_request_seconds", time.perf_counter() - start_time,
+                        method=request.method, route=getattr(route, "path", "unmatched"),
+                        status=str(status))
 
 # Pydantic models
 class QueryRequest(BaseModel):
     question: str
     top_k: Optional[int] = 5
+    nprobe: Optional[int] = None  # IVF lists to scan (ANN indexes only)
+    ef_search: Optional[int] = None  # HNSW search depth (ANN indexes only)
+    lexical_weight: Optional[float] = None  # BM25 share in hybrid fusion (0 = dense only, 1 = BM25 only)
+    # Metadata filters, e.g. {"type": "audio", "file_path": {"in": ["a.pdf"]}, "timestamp": {"gt": "2024-01-01"}}
+    filters: Optional[Dict[str, Any]] = None
+    rerank: Optional[bool] = None  # False skips cross-encoder reranking (when enabled)
+    trace: bool = False  # Return per-stage timings of this query
 
 class QueryResponse(BaseModel):
     question: str
     answer: str
     sources: List[dict]
     processing_time: float
+    cached: bool = False
+    trace: Optional[dict] = None
 
 @app.get("/")
 async def root():
@@ -55,69 +131,231 @@ async def root():
         "version": "1.0.0"
     }
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload and process a file"""
+def _save_upload(file: UploadFile) -> str:
+    """Save an uploaded file under a unique staging name in the upload directory
+    
+    Concurrent uploads of the same filename each get their own file, so a
+    job never reads bytes of another upload; _publish_upload moves the file
+    to its final name once its job is done.
+    """
+    file_path = os.path.join(config.UPLOAD_DIR, f".{uuid.uuid4().hex}-{os.path.basename(file.filename)}")
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    return file_path
+
+def _publish_upload(file_path: str, filename: str, keep: bool = True):
+    """Move a staged upload to UPLOAD_DIR/filename (the last finished upload wins), or drop it"""
+    if not os.path.exists(file_path):
+        return
+    if keep:
+        os.replace(file_path, os.path.join(config.UPLOAD_DIR, os.path.basename(filename)))
+    else:
+        os.remove(file_path)
+
+def _ingest_upload(job, file_path: str, filename: str) -> Dict[str, Any]:
+    ingested = False
     try:
-        # Save uploaded file
-        file_path = os.path.join(config.UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Process file with appropriate agent
-        result = orchestrator.process_file(file_path)
-        
-        # Extract content for embedding
-        content = result["content"]
-        if not content or not content.strip():
-            raise HTTPException(status_code=400, detail="No content extracted from file")
-        
-        # For documents, split into chunks (simple splitting by paragraphs)
-        chunks = [chunk.strip() for chunk in content.split("\n\n") if chunk.strip()]
-        if not chunks:
-            chunks = [content]
+        result = ingestion.ingest(file_path, filename, progress=job.update)
+        ingested = True
+        return result
+    finally:
+        _publish_upload(file_path, filename, keep=ingested)
+
+@app.post("/upload", status_code=202)
+async def upload_file(file: UploadFile = File(...), wait: bool = False):
+    """Upload a file and queue it for processing
+    
+    Returns a job id immediately; poll /jobs/{job_id} for progress.
+    Pass wait=true to block until the job finishes (legacy behaviour).
+    """
+    try:
+        file_type = orchestrator.get_file_type(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    file_path = None
+    try:
+        file_path = await run_in_threadpool(_save_upload, file)
+        job = ingest_queue.submit(
+            file.filename, file_type,
+            lambda job: _ingest_upload(job, file_path, file.filename),
+            on_cancel=lambda: _publish_upload(file_path, file.filename, keep=False)
+        )
+    except QueueFullError as e:
+        _publish_upload(file_path, file.filename, keep=False)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if wait:
+        await run_in_threadpool(job.done.wait)
+        if job.status == "failed":
+            raise HTTPException(status_code=500, detail=job.error)
+        if job.status == "cancelled":
+            raise HTTPException(status_code=409, detail=job.error)
+        return job.result
+    
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "filename": file.filename,
+        "type": file_type,
+        "message": f"Queued {file.filename} for processing"
+    }
+
+@app.post("/upload/batch", status_code=202)
+async def upload_batch(files: List[UploadFile] = File(...), wait: bool = False):
+    """Upload many files and ingest them as one pipelined batch job
+    
+    Chunks from all files are embedded in large batches and committed to the
+    index in groups; the job's details report throughput as it runs.
+    """
+    unsupported = []
+    for file in files:
+        try:
+            orchestrator.get_file_type(file.filename)
+        except ValueError:
+            unsupported.append(file.filename)
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported file types: {', '.join(unsupported)}")
+    
+    items = []
+    try:
+        for file in files:
+            items.append((await run_in_threadpool(_save_upload, file), file.filename))
+        ingestor = BulkIngestor(
+            ingestion,
+            workers=config.BULK_WORKERS,
+            group_size=config.BULK_GROUP_SIZE,
+            embed_batch_size=config.BULK_EMBED_BATCH_SIZE
+        )
         
-        # Prepare metadata for each chunk
-        metadata_list = []
-        for i, chunk in enumerate(chunks):
-            meta = {
-                "file_path": file.filename,
-                "type": result["type"],
-                "chunk_id": i,
-                "timestamp": datetime.now().isoformat(),
-                **result.get("metadata", {})
-            }
-            metadata_list.append(meta)
+        def run(job):
+            def progress(report):
+                finished = report["processed"] + report["skipped"] >= report["files"]
+                job.update("indexed" if finished else "embedded", details=report)
+            report = None
+            try:
+                report = ingestor.run(items, progress=progress)
+                return report
+            finally:
+                failed = {error["filename"] for error in report["errors"]} if report else None
+                for path, filename in items:
+                    _publish_upload(path, filename, keep=failed is not None and filename not in failed)
         
-        # Add to vector store
-        vector_store.add_documents(chunks, metadata_list)
+        def cancel():
+            for path, filename in items:
+                _publish_upload(path, filename, keep=False)
         
-        return {
-            "status": "success",
-            "filename": file.filename,
-            "type": result["type"],
-            "chunks_created": len(chunks),
-            "message": f"✅ Successfully processed {file.filename} ({len(chunks)} chunks)"
-        }
-    
+        job = ingest_queue.submit(f"{len(files)} files", "batch", run, on_cancel=cancel)
+    except QueueFullError as e:
+        for path, filename in items:
+            _publish_upload(path, filename, keep=False)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
+        for path, filename in items:
+            _publish_upload(path, filename, keep=False)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if wait:
+        await run_in_threadpool(job.done.wait)
+        if job.status == "failed":
+            raise HTTPException(status_code=500, detail=job.error)
+        if job.status == "cancelled":
+            raise HTTPException(status_code=409, detail=job.error)
+        return job.result
+    
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "files": len(files),
+        "message": f"Queued {len(files)} files for batch processing"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the progress of an ingestion job"""
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
+def _traced(trace: Trace, function, *args, **kwargs):
+    """Run function with trace collecting its stage timings"""
+    with metrics.activate(trace):
+        return function(*args, **kwargs)
 
 @app.post("/query", response_model=QueryResponse)
-async def query_system(request: QueryRequest):
-    """Query the RAG system"""
+async def query_system(request: QueryRequest, http_request: Request):
+    """Query the RAG system
+    
+    With trace=true the response includes the time spent in each stage
+    (cache lookup, embedding, FAISS/BM25 search, rerank, generation...).
+    """
+    trace = Trace(http_request.state.trace_id)
     try:
-        result = rag_pipeline.query(request.question, top_k=request.top_k)
+        result = await run_in_threadpool(
+            _traced, trace, rag_pipeline.query, request.question, top_k=request.top_k,
+            nprobe=request.nprobe, ef_search=request.ef_search,
+            lexical_weight=request.lexical_weight, filters=request.filters,
+            rerank=request.rerank
+        )
+        if request.trace:
+            result["trace"] = trace.to_dict()
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest, http_request: Request):
+    """Query the RAG system, streaming the answer as server-sent events
+    
+    Events: "sources" (retrieved evidence), "token" (answer text as it is
+    generated), "error", and a final "done" with the full answer and timings
+    (plus per-stage timings with trace=true).
+    """
+    trace = Trace(http_request.state.trace_id)
+    
+    def event_stream():
+        events = rag_pipeline.stream_query(
+            request.question, top_k=request.top_k,
+            nprobe=request.nprobe, ef_search=request.ef_search,
+            lexical_weight=request.lexical_weight, filters=request.filters,
+            rerank=request.rerank
+        )
+        try:
+            while True:
+                # Each step may run on a different threadpool worker, so activate the trace per step
+                with metrics.activate(trace):
+                    event = next(events, None)
+                if event is None:
+                    break
+                if event["event"] == "done" and request.trace:
+                    event["data"]["trace"] = trace.to_dict()
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+    
+    # Sync generators are iterated in the threadpool, off the event loop
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/history")
-async def get_history(limit: int = 50):
-    """Get query history"""
+async def get_history(limit: int = 50, before: Optional[int] = None):
+    """Get query history, oldest first
+    
+    Pages backwards: pass the returned next_cursor as `before` to get the
+    preceding page (next_cursor is null on the oldest page).
+    """
     try:
-        history = logger.get_history(limit=limit)
-        return {"history": history}
+        history = await run_in_threadpool(logger.get_history, limit=limit, before=before)
+        next_cursor = history[0]["id"] if history and history[0]["id"] > logger.oldest_id() else None
+        return {"history": history, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -126,27 +364,80 @@ async def get_stats():
     """Get system statistics"""
     try:
         vector_stats = vector_store.get_stats()
-        query_history = logger.get_history(limit=10000)
+        history_stats = logger.get_stats()
         
         return {
             "total_documents": vector_stats.get("total_documents", 0),
-            "total_queries": len(query_history),
-            "index_size": vector_stats.get("index_size", 0)
+            "total_files": content_index.get_stats()["files"],
+            "total_queries": history_stats["total_queries"],
+            "history": history_stats,
+            "index_size": vector_stats.get("index_size", 0),
+            "index_type": vector_stats.get("index_type"),
+            "index_report": vector_stats.get("index_report"),
+            "models": registry.get_stats(),
+            "ingest_queue": ingest_queue.get_stats(),
+            "generation": rag_pipeline.scheduler.get_stats() if rag_pipeline.scheduler else None,
+            "answer_cache": rag_pipeline.answer_cache.get_stats() if rag_pipeline.answer_cache else None,
+            "reranker": rag_pipeline.reranker.get_stats() if rag_pipeline.reranker else None,
+            "prefix_cache": rag_pipeline.prefix_cache.get_stats() if rag_pipeline.prefix_cache else None,
+            "context_packer": rag_pipeline.context_packer.get_stats()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: per-stage latency quantiles, token counts, queue depths and model memory"""
+    text = await run_in_threadpool(metrics.render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@app.delete("/documents/{filename:path}")
+async def delete_document(filename: str):
+    """Delete an uploaded file and its chunks from the index
+    
+    Vectors are tombstoned immediately and purged from the index in the
+    background once enough deletions accumulate.
+    """
+    try:
+        result = await run_in_threadpool(ingestion.remove, filename)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document: {filename}")
+    
+    upload_dir = os.path.realpath(config.UPLOAD_DIR)
+    file_path = os.path.realpath(os.path.join(upload_dir, filename))
+    if os.path.dirname(file_path) == upload_dir and os.path.isfile(file_path):
+        os.remove(file_path)
+    return {"status": "success", **result}
+
 @app.delete("/reset")
 async def reset_system():
-    """Reset the system (clear all data)"""
+    """Reset the system (clear all documents, vectors and uploads)
+    
+    Queued ingestion jobs are cancelled and running ones are waited for, so
+    none of them writes into the fresh index or reads a deleted upload.
+    """
+    def reset():
+        with ingest_queue.paused(timeout=config.RESET_WAIT_SECONDS):
+            ingestion.reset()
+            if rag_pipeline.answer_cache is not None:
+                rag_pipeline.answer_cache.clear()
+            for name in os.listdir(config.UPLOAD_DIR):
+                path = os.path.join(config.UPLOAD_DIR, name)
+                if os.path.isfile(path):
+                    os.remove(path)
+    
     try:
-        # This is a simplified reset - in production, you'd want proper cleanup
-        return {
-            "status": "success",
-            "message": "System reset functionality - implement with caution"
-        }
+        await run_in_threadpool(reset)
+    except TimeoutError as e:
+        raise HTTPException(status_code=409, detail=f"Ingestion jobs are still running: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "status": "success",
+        "message": "All documents, vectors and uploads were deleted"
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Tests run from backend/ or the repository root; modules import as utils.*, agents.*
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import vector_store as vector_store_module  # noqa: E402
+from utils.vector_store import VectorStore  # noqa: E402
+
+
+class HashEmbedder:
+    """Deterministic bag-of-words embeddings, so tests need no model download"""
+
+    dimension = 384
+
+    class tokenizer:
+        @staticmethod
+        def encode(text, add_special_tokens=False):
+            return text.split()
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, **kwargs):
+        vectors = np.zeros((len(sentences), self.dimension), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            for word in sentence.lower().split():
+                digest = hashlib.md5(word.encode("utf-8")).digest()
+                vectors[row, int.from_bytes(digest[:4], "little") % self.dimension] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    model = HashEmbedder()
+    monkeypatch.setattr(vector_store_module, "get_embedding_model", lambda *args, **kwargs: model)
+    return model
+
+
+@pytest.fixture
+def make_store(tmp_path, embedder):
+    """Factory for vector stores on a temporary directory (reopenable on the same path)"""
+    def make(path=None, **kwargs):
+        kwargs.setdefault("search_batch_size", 1)
+        return VectorStore(db_path=str(path or tmp_path / "vector_db"), **kwargs)
+    return make
+
+
+def settle(store):
+    """Wait for the store's background compaction, migration and purge threads"""
+    for thread in [store._compactor, store._migrator, store._purger]:
+        if thread is not None:
+            thread.join()
+
+
+def searchable(store) -> int:
+    settle(store)
+    return store.get_stats()["total_documents"]
@@ -0,0 +1,34 @@
+import numpy as np
+
+from utils.answer_cache import AnswerCache
+
+
+def embed_counting(calls):
+    def embed(question):
+        calls.append(question)
+        return np.array([1.0, 0.0, 0.0], dtype=np.float32) * 3
+    return embed
+
+
+def test_exact_only_by_default_never_embeds():
+    cache = AnswerCache()
+    calls = []
+    assert cache.get("What is X?", (), 1, embed_counting(calls)) == (None, None)
+    cache.put("What is X?", (), 1, None, {"answer": "x"})
+
+    assert cache.get("what is x", (), 1, embed_counting(calls))[0] == {"answer": "x"}
+    assert cache.get("What is Y?", (), 1, embed_counting(calls)) == (None, None)
+    assert calls == []
+
+
+def test_semantic_lookup_returns_embedding_for_reuse():
+    cache = AnswerCache(similarity_threshold=0.9)
+    calls = []
+    result, embedding = cache.get("What is X?", (), 1, embed_counting(calls))
+    assert result is None and calls == ["What is X?"]
+    cache.put("What is X?", (), 1, embedding, {"answer": "x"})
+
+    # Unnormalized embeddings are compared by cosine
+    result, _ = cache.get("Tell me about X", (), 1, embed_counting(calls))
+    assert result == {"answer": "x"}
+    assert cache.get("Tell me about X", (), 2, embed_counting(calls))[0] is None
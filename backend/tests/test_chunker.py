@@ -0,0 +1,81 @@
+from utils.chunker import Chunker
+
+
+def words(text):
+    return len(text.split())
+
+
+def paragraph(name, count):
+    return " ".join(f"{name}{i}" for i in range(count)) + "."
+
+
+def test_chunks_break_at_paragraph_boundaries_within_budget():
+    chunker = Chunker(count_tokens=words, max_tokens=20, overlap_tokens=0)
+    paragraphs = [paragraph("a", 8), paragraph("b", 8), paragraph("c", 8), paragraph("d", 3)]
+    chunks = chunker.chunk_text("\n\n".join(paragraphs), {"page": 2})
+
+    assert [chunk["text"] for chunk in chunks] == [
+        paragraphs[0] + "\n\n" + paragraphs[1],
+        paragraphs[2] + "\n\n" + paragraphs[3],
+    ]
+    assert all(chunk["metadata"] == {"page": 2} for chunk in chunks)
+    chunks[0]["metadata"]["page"] = 3
+    assert chunks[1]["metadata"] == {"page": 2}
+
+
+def test_oversized_paragraph_splits_at_sentences_then_words():
+    chunker = Chunker(count_tokens=words, max_tokens=10, overlap_tokens=0)
+    long_sentence = " ".join(f"w{i}" for i in range(25)) + "."
+    text = "First short sentence here. " + long_sentence + " Last one."
+    chunks = chunker.chunk_text(text)
+
+    assert all(words(chunk["text"]) <= 10 for chunk in chunks)
+    assert chunks[0]["text"].startswith("First short sentence here.")
+    # Without overlap every word appears exactly once, in order
+    assert " ".join(chunk["text"] for chunk in chunks).split() == text.split()
+
+
+def test_chunks_start_with_overlap_from_the_previous_chunk():
+    chunker = Chunker(count_tokens=words, max_tokens=12, overlap_tokens=4)
+    sentences = [paragraph(f"s{i}x", 4) for i in range(6)]
+    chunks = chunker.chunk_text(" ".join(sentences))
+
+    assert len(chunks) > 1
+    assert all(words(chunk["text"]) <= 12 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        tail = previous["text"].split(". ")[-1].rstrip(".")
+        assert chunk["text"].startswith(tail)
+    assert chunks[-1]["text"].endswith(sentences[-1])
+
+
+def test_segments_are_packed_whole_with_their_time_range():
+    chunker = Chunker(count_tokens=words, max_tokens=6, overlap_tokens=2)
+    segments = [{"start": float(i), "end": float(i) + 1, "text": f"seg{i} one two"} for i in range(5)]
+    chunks = chunker.chunk_segments(segments)
+
+    assert all(words(chunk["text"]) <= 6 for chunk in chunks)
+    assert chunks[0] == {"text": "seg0 one two seg1 one two", "metadata": {"start": 0.0, "end": 2.0}}
+    texts = {segment["text"] for segment in segments}
+    for chunk in chunks:
+        # Only whole segments: every 3-word group is one of the inputs
+        parts = chunk["text"].split()
+        assert {" ".join(parts[i:i + 3]) for i in range(0, len(parts), 3)} <= texts
+    assert chunks[-1]["metadata"]["end"] == 5.0
+
+
+def test_blocks_keep_their_bounding_boxes():
+    chunker = Chunker(count_tokens=words, max_tokens=6, overlap_tokens=0)
+    blocks = [
+        {"text": "left column text", "bbox": [0, 0, 10, 10]},
+        {"text": "right column", "bbox": [20, 0, 30, 10]},
+        {"text": "footer note here", "bbox": [0, 20, 30, 30]},
+        {"text": " ".join(f"long{i}" for i in range(10)), "bbox": [0, 40, 30, 50]},
+    ]
+    chunks = chunker.chunk_blocks(blocks)
+
+    assert chunks[0] == {"text": "left column text\n\nright column",
+                         "metadata": {"bboxes": [[0, 0, 10, 10], [20, 0, 30, 10]]}}
+    assert chunks[1]["metadata"] == {"bboxes": [[0, 20, 30, 30]]}
+    assert len(chunks) == 4
+    assert all(chunk["metadata"] == {"bboxes": [[0, 40, 30, 50]]} and words(chunk["text"]) <= 6
+               for chunk in chunks[2:])
@@ -0,0 +1,64 @@
+import numpy as np
+
+from utils.context_packer import ContextPacker
+
+
+def words(text):
+    return len(text.split())
+
+
+def segment(number, hit, text):
+    return f"[{number}] {text}"
+
+
+def hit(text, file_path="a.txt"):
+    return {"document": text, "metadata": {"file_path": file_path}}
+
+
+def sentence(name, count):
+    return " ".join(f"{name}{i}" for i in range(count))
+
+
+def test_packs_within_the_token_budget_skipping_chunks_that_do_not_fit():
+    packer = ContextPacker(token_budget=100, max_chunks=8)
+    hits = [hit(sentence("a", 10), "a.txt"), hit(sentence("b", 30), "b.txt"), hit(sentence("c", 5), "c.txt")]
+
+    segments = packer.pack(hits, 20, words, segment)
+    # "[n]" headers count too: 11 + 6 tokens fit, the 31-token chunk does not
+    assert segments == ["[1] " + sentence("a", 10), "[2] " + sentence("c", 5)]
+    assert sum(words(s) for s in segments) <= 20
+    assert packer.get_stats()["over_budget"] == 1
+
+    # The packer's own budget caps the caller's
+    assert ContextPacker(token_budget=15).pack(hits, 1000, words, segment) == ["[1] " + sentence("a", 10)]
+    assert packer.pack(hits, 0, words, segment) == []
+
+
+def test_near_duplicates_are_dropped_and_chunk_overlap_trimmed():
+    packer = ContextPacker(token_budget=500, max_chunks=8, mmr_lambda=1.0)
+    first = sentence("w", 20)
+    hits = [
+        hit(first),
+        hit(first + " extra", "b.txt"),  # the same text from another file
+        hit(" ".join(first.split()[-6:]) + " " + sentence("x", 10)),  # repeats the chunker's overlap
+    ]
+
+    segments = packer.pack(hits, 500, words, segment)
+    assert segments == ["[1] " + first, "[2] " + sentence("x", 10)]
+    stats = packer.get_stats()
+    assert stats["duplicates"] == 1 and stats["trimmed"] == 1
+
+
+def test_mmr_prefers_diverse_chunks_up_to_max_chunks():
+    hits = [hit(sentence(name, 8), f"{name}.txt") for name in ["a", "b", "c", "d"]]
+    vectors = np.array([[1, 0], [1, 0], [0.6, 0.8], [0, 1]], dtype=np.float32)
+
+    packer = ContextPacker(token_budget=500, max_chunks=2, mmr_lambda=0.5)
+    segments = packer.pack(hits, 500, words, segment, vectors)
+    # The second hit repeats the first's embedding, so the most different chunk comes next
+    assert segments == ["[1] " + sentence("a", 8), "[2] " + sentence("d", 8)]
+
+    # Relevance alone keeps retrieval order
+    relevance_only = ContextPacker(token_budget=500, max_chunks=3, mmr_lambda=1.0)
+    assert relevance_only.pack(hits, 500, words, segment, vectors) == [
+        f"[{number}] " + sentence(name, 8) for number, name in [(1, "a"), (2, "b"), (3, "c")]]
@@ -0,0 +1,191 @@
+import pytest
+
+from utils.chunker import Chunker
+from utils.content_index import ContentIndex, hash_file
+from utils.ingestion import IngestionPipeline
+
+from conftest import searchable
+
+
+class FailingPDFAgent:
+    """Streams pages, then fails like a corrupt page partway through the file"""
+
+    file_type = "pdf"
+
+    def __init__(self, pages, fail=True):
+        self.pages = pages
+        self.fail = fail
+
+    def iter_pages(self, file_path):
+        for page, text in enumerate(self.pages, 1):
+            yield {"page": page, "text": text}
+        if self.fail:
+            raise ValueError("corrupt page")
+
+    def log(self, message):
+        pass
+
+
+class FailingAudioAgent:
+    """Streams transcript segments, then fails like an audio decode error"""
+
+    file_type = "audio"
+
+    def __init__(self, pages, fail=True):
+        self.pages = pages
+        self.fail = fail
+
+    def iter_segments(self, file_path):
+        for i, text in enumerate(self.pages):
+            yield {"start": float(i), "end": float(i + 1), "text": text}
+        if self.fail:
+            raise RuntimeError("decode error")
+
+    def log(self, message):
+        pass
+
+
+class Orchestrator:
+    def __init__(self, agent):
+        self.agent = agent
+
+    def get_agent(self, file_path):
+        return self.agent
+
+
+def pages(count):
+    return [f"page {i} talks about topic{i} and widget{i} in detail" for i in range(count)]
+
+
+@pytest.fixture
+def pipeline(tmp_path, make_store):
+    def make(agent):
+        store = make_store()
+        index = ContentIndex(db_path=str(tmp_path / "vector_db"))
+        return IngestionPipeline(Orchestrator(agent), store, index,
+                                 chunker=Chunker(max_tokens=20, overlap_tokens=0), batch_size=4)
+    return make
+
+
+@pytest.mark.parametrize("agent_class", [FailingPDFAgent, FailingAudioAgent])
+def test_failed_stream_ingest_leaves_nothing_searchable(tmp_path, pipeline, agent_class):
+    upload = tmp_path / "report.pdf"
+    upload.write_bytes(b"%PDF-1.4 report")
+    ingestion = pipeline(agent_class(pages(10)))
+
+    with pytest.raises((ValueError, RuntimeError)):
+        ingestion.ingest(str(upload), "report.pdf")
+
+    store = ingestion.vector_store
+    assert len(store.docs) > 0  # batches were indexed before the failure
+    assert searchable(store) == 0
+    assert ingestion.content_index.get_file("report.pdf") is None
+    assert store.search("topic3 widget3", top_k=5) == []
+
+
+def test_retry_after_failed_ingest_stores_one_copy(tmp_path, pipeline):
+    upload = tmp_path / "report.pdf"
+    upload.write_bytes(b"%PDF-1.4 report")
+    agent = FailingPDFAgent(pages(10))
+    ingestion = pipeline(agent)
+    with pytest.raises(ValueError):
+        ingestion.ingest(str(upload), "report.pdf")
+
+    agent.fail = False
+    result = ingestion.ingest(str(upload), "report.pdf")
+    store = ingestion.vector_store
+    assert searchable(store) == result["total_chunks"] == 10
+
+    ingestion.remove("report.pdf")
+    assert searchable(store) == 0
+    assert store.search("topic3 widget3", top_k=5) == []
+
+
+def test_byte_identical_copy_gets_its_own_rows(tmp_path, pipeline):
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"%PDF-1.4 same bytes")
+    second.write_bytes(b"%PDF-1.4 same bytes")
+    ingestion = pipeline(FailingPDFAgent(pages(6), fail=False))
+    ingestion.ingest(str(first), "a.pdf")
+
+    result = ingestion.ingest(str(second), "b.pdf")
+    assert result["change"] == "duplicate" and result["chunks_created"] == 6
+    store = ingestion.vector_store
+    hits = store.search("topic3 widget3", top_k=5, filters={"file_path": "b.pdf"})
+    assert hits and all(hit["metadata"]["file_path"] == "b.pdf" for hit in hits)
+
+    ingestion.remove("a.pdf")
+    assert searchable(store) == 6
+    hits = store.search("topic3 widget3", top_k=5)
+    assert hits and all(hit["metadata"]["file_path"] == "b.pdf" for hit in hits)
+    assert store.search("topic3 widget3", top_k=5, filters={"file_path": "a.pdf"}) == []
+    assert ingestion.content_index.find_by_hash(hash_file(str(second)))["filename"] == "b.pdf"
+
+
+def test_shared_chunks_reuse_embeddings_but_not_rows(tmp_path, pipeline, embedder, monkeypatch):
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"%PDF-1.4 first")
+    second.write_bytes(b"%PDF-1.4 second")
+    ingestion = pipeline(FailingPDFAgent(pages(6), fail=False))
+    ingestion.ingest(str(first), "a.pdf")
+
+    embedded = []
+    encode = embedder.encode
+    monkeypatch.setattr(embedder, "encode", lambda sentences, **kwargs: embedded.extend(sentences) or encode(sentences))
+    ingestion.orchestrator.agent = FailingPDFAgent(pages(6) + ["an appendix on gadgets"], fail=False)
+    result = ingestion.ingest(str(second), "b.pdf")
+
+    assert embedded == ["an appendix on gadgets"]
+    assert result["chunks_created"] == 7
+    store = ingestion.vector_store
+    assert searchable(store) == 13
+    paths = {hit["metadata"]["file_path"] for hit in store.search("topic3 widget3", top_k=2)}
+    assert paths == {"a.pdf", "b.pdf"}
+
+
+def test_purge_renumbers_content_index(tmp_path, pipeline, make_store):
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"%PDF-1.4 first")
+    second.write_bytes(b"%PDF-1.4 second")
+    ingestion = pipeline(FailingPDFAgent(pages(6), fail=False))
+    ingestion.ingest(str(first), "a.pdf")
+    ingestion.orchestrator.agent = FailingPDFAgent([f"appendix {i} on gadget{i}" for i in range(4)], fail=False)
+    ingestion.ingest(str(second), "b.pdf")
+
+    ingestion.remove("a.pdf")  # past purge_ratio: the background purge renumbers b.pdf's chunks
+    store = ingestion.vector_store
+    assert searchable(store) == 4
+    assert store.generation == 1 and len(store.docs) == 4
+    for index in [ingestion.content_index, ContentIndex(db_path=store.db_path)]:
+        assert sorted(position for _, position in index.get_file("b.pdf")["chunks"]) == [0, 1, 2, 3]
+    hit = store.search("appendix 2 gadget2", top_k=1)[0]
+    assert hit["metadata"]["file_path"] == "b.pdf" and "gadget2" in hit["document"]
+
+    reopened = make_store()
+    assert reopened.search("appendix 2 gadget2", top_k=1)[0]["position"] == hit["position"]
+    ingestion.remove("b.pdf")
+    assert searchable(store) == 0
+
+
+def test_stream_reports_progress_per_indexed_batch(tmp_path, pipeline):
+    upload = tmp_path / "report.pdf"
+    upload.write_bytes(b"%PDF-1.4 report")
+    events = []
+
+    class RecordingAgent(FailingPDFAgent):
+        def iter_pages(self, file_path):
+            for page in super().iter_pages(file_path):
+                events.append(("page", page["page"]))
+                yield page
+
+    ingestion = pipeline(RecordingAgent(pages(10), fail=False))
+    ingestion.ingest(str(upload), "report.pdf",
+                     progress=lambda stage, details=None: events.append((stage, details)))
+
+    embedded = [details for stage, details in events if stage == "embedded"]
+    assert [details["chunks"] for details in embedded] == [4, 8, 10]
+    assert embedded[-1]["chunks_created"] == 10
+    # The first batch is reported while later pages are still being extracted
+    assert events.index(("embedded", embedded[0])) < events.index(("page", 10))
+    assert [stage for stage, _ in events if stage != "page"][:2] == ["extracted", "chunked"]
+    assert events[-1] == ("indexed", None)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from utils.job_queue import IngestionJobQueue, QueueFullError
+
+
+def test_paused_cancels_queued_jobs_and_waits_for_running_ones():
+    queue = IngestionJobQueue(max_workers=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow(job):
+        started.set()
+        release.wait(5)
+        return {"status": "success"}
+
+    running = queue.submit("a.pdf", "pdf", slow)
+    started.wait(5)
+    queued = queue.submit("b.pdf", "pdf", lambda job: {"status": "success"})
+
+    entered = threading.Event()
+
+    def reset():
+        with queue.paused(timeout=5):
+            # Nothing runs or waits while the block executes
+            assert running.done.is_set() and queued.done.is_set()
+            entered.set()
+
+    thread = threading.Thread(target=reset)
+    thread.start()
+    assert not entered.wait(0.2)  # still waiting for the running job
+    release.set()
+    thread.join(5)
+
+    assert entered.is_set()
+    assert running.status == "completed"
+    assert queued.status == "cancelled"
+    assert queue.get_stats()["pending"] == 0
+
+
+def test_paused_refuses_new_jobs_and_times_out():
+    queue = IngestionJobQueue(max_workers=1)
+    release = threading.Event()
+    queue.submit("a.pdf", "pdf", lambda job: release.wait(5))
+
+    with pytest.raises(TimeoutError):
+        with queue.paused(timeout=0.1):
+            pass
+    release.set()
+
+    with queue.paused(timeout=5):
+        with pytest.raises(QueueFullError):
+            queue.submit("b.pdf", "pdf", lambda job: {})
+    job = queue.submit("c.pdf", "pdf", lambda job: {"status": "success"})
+    job.done.wait(5)
+    assert job.status == "completed"
+
+
+def test_timed_out_pause_keeps_queued_jobs():
+    queue = IngestionJobQueue(max_workers=1)
+    release = threading.Event()
+    started = threading.Event()
+    cancelled = []
+
+    def slow(job):
+        started.set()
+        release.wait(5)
+        return {"status": "success"}
+
+    queue.submit("a.pdf", "pdf", slow)
+    started.wait(5)
+    queued = queue.submit("b.pdf", "pdf", lambda job: {"status": "success"},
+                          on_cancel=lambda: cancelled.append("b.pdf"))
+
+    with pytest.raises(TimeoutError):
+        with queue.paused(timeout=0.1):
+            pass
+    release.set()
+    queued.done.wait(5)
+    assert queued.status == "completed"
+    assert not cancelled
+
+
+def test_cancelled_jobs_run_their_cleanup(tmp_path):
+    queue = IngestionJobQueue(max_workers=1)
+    release = threading.Event()
+    started = threading.Event()
+    staged = tmp_path / ".1234-b.pdf"
+    staged.write_bytes(b"%PDF-1.4")
+
+    def slow(job):
+        started.set()
+        release.wait(5)
+        return {"status": "success"}
+
+    queue.submit("a.pdf", "pdf", slow)
+    started.wait(5)
+    queued = queue.submit("b.pdf", "pdf", lambda job: {"status": "success"}, on_cancel=staged.unlink)
+    seen = {}
+
+    def reset():
+        with queue.paused(timeout=5):
+            seen.update(status=queued.status, staged=staged.exists())
+
+    thread = threading.Thread(target=reset)
+    thread.start()
+    while not queue.get_stats()["paused"]:
+        time.sleep(0.01)
+    release.set()  # the running job finishes while the pause waits for it
+    thread.join(5)
+
+    assert seen == {"status": "cancelled", "staged": False}
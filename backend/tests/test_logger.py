@@ -0,0 +1,91 @@
+import os
+import shutil
+
+from utils import logger as logger_module
+from utils.logger import QueryLogger
+
+
+def open_logger(tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval_ms", 1)
+    return QueryLogger(log_dir=str(tmp_path), **kwargs)
+
+
+def log(history, count, start=0):
+    for i in range(start, start + count):
+        history.log_query(f"question {i}", f"answer {i}", [], processing_time=float(i))
+
+
+def test_rotation_keeps_newest_files_and_pages_across_them(tmp_path):
+    history = open_logger(tmp_path, max_bytes=1, max_files=2)
+    # Every write rotates the previous entry's file away
+    for i in range(6):
+        log(history, 1, start=i)
+        history.flush()
+    history.close()
+
+    rotated = sorted(name for name in os.listdir(tmp_path) if name.startswith("query_history.0"))
+    assert rotated == ["query_history.00000004.jsonl", "query_history.00000005.jsonl"]
+    assert history.oldest_id() == 3
+    stats = history.get_stats()
+    assert stats["total_queries"] == 6 and stats["files"] == 3
+    assert stats["avg_processing_time_seconds"] == 2.5
+
+    reopened = open_logger(tmp_path, max_bytes=1, max_files=2)
+    assert [entry["id"] for entry in reopened.get_history(limit=2)] == [4, 5]
+    # Expired files are gone: paging stops at the oldest retained entry
+    assert [entry["id"] for entry in reopened.get_history(limit=2, before=4)] == [3]
+    assert reopened.get_history(limit=2, before=3) == []
+    assert reopened.get_stats()["total_queries"] == 6
+    reopened.close()
+
+
+def test_entries_appended_after_the_last_state_update_are_recovered(tmp_path):
+    history = open_logger(tmp_path)
+    log(history, 3)
+    history.flush()
+    state_file = os.path.join(tmp_path, QueryLogger.STATE_FILE)
+    shutil.copy(state_file, str(state_file) + ".saved")
+    log(history, 2, start=3)
+    history.close()
+
+    # Crash after the second batch was appended but before its state update, mid-way through a third
+    os.replace(str(state_file) + ".saved", state_file)
+    with open(history.log_file, "a", encoding="utf-8") as f:
+        f.write('{"id": 5, "question": "torn')
+
+    reopened = open_logger(tmp_path)
+    stats = reopened.get_stats()
+    assert stats["total_queries"] == 5
+    assert stats["avg_processing_time_seconds"] == 2.0
+    assert [entry["id"] for entry in reopened.get_history(limit=10)] == [0, 1, 2, 3, 4]
+    log(reopened, 1, start=5)
+    assert reopened.get_history(limit=1)[0]["id"] == 5
+    reopened.close()
+
+
+def test_rotation_interrupted_before_the_move_is_finished(tmp_path, monkeypatch):
+    history = open_logger(tmp_path, max_bytes=1)
+    log(history, 1)
+    history.flush()
+
+    real_replace = os.replace
+
+    def replace(src, dst):
+        if os.path.basename(dst).startswith("query_history.0"):
+            raise OSError("simulated crash")
+        return real_replace(src, dst)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(logger_module.os, "replace", replace)
+        log(history, 1, start=1)
+        history.flush()
+    history.close()
+    assert not os.path.exists(os.path.join(tmp_path, "query_history.00000001.jsonl"))
+
+    reopened = open_logger(tmp_path, max_bytes=1)
+    assert os.path.exists(os.path.join(tmp_path, "query_history.00000001.jsonl"))
+    # The interrupted batch never reached the disk
+    assert reopened.get_stats()["total_queries"] == 1
+    assert [entry["question"] for entry in reopened.get_history(limit=10)] == ["question 0"]
+    reopened.close()
+
@@ -0,0 +1,71 @@
+import threading
+
+from utils.generation_scheduler import GenerationScheduler
+from utils.metrics import metrics, Trace
+from utils.micro_batcher import MicroBatcher
+
+
+def timed_batch(items):
+    with metrics.stage("batch_work"):
+        return [item * 2 for item in items]
+
+
+def run_traced(call, items):
+    """call(item) from one thread per item, each under its own trace"""
+    traces = [Trace() for _ in items]
+    results = [None] * len(items)
+
+    def worker(i):
+        with metrics.activate(traces[i]):
+            results[i] = call(items[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return traces, results
+
+
+def test_micro_batcher_stages_reach_every_callers_trace():
+    batcher = MicroBatcher(timed_batch, max_batch_size=8, max_wait_ms=50)
+    traces, results = run_traced(batcher, [1, 2, 3, 4])
+    assert results == [2, 4, 6, 8]
+    assert all("batch_work" in trace.stages for trace in traces)
+
+
+class FakeGenerator:
+    def generate(self, prompt, params):
+        with metrics.stage("llm_generate"):
+            return f"answer to {prompt}"
+
+    def generate_batch(self, prompts, params):
+        with metrics.stage("llm_generate"):
+            return [f"answer to {prompt}" for prompt in prompts]
+
+
+def test_generation_scheduler_stages_reach_every_callers_trace():
+    generator = FakeGenerator()
+    scheduler = GenerationScheduler(lambda: generator, lambda: {}, max_batch_size=4, max_wait_ms=50)
+    traces, results = run_traced(scheduler.generate, ["a", "b", "c"])
+    assert results == ["answer to a", "answer to b", "answer to c"]
+    assert all("llm_generate" in trace.stages for trace in traces)
+
+
+def test_batched_search_trace_has_embedding_and_faiss_stages(make_store):
+    store = make_store(search_batch_size=8)
+    store.add_documents(["alpha beta gamma", "delta epsilon zeta"], [{}, {}])
+    trace = Trace()
+    with metrics.activate(trace):
+        store.search("alpha", top_k=1, lexical_weight=0.0)
+    assert {"dense_search", "embed_query", "faiss_search"} <= set(trace.stages)
+
+
+def test_batch_stats_count_every_request():
+    generator = FakeGenerator()
+    scheduler = GenerationScheduler(lambda: generator, lambda: {}, max_batch_size=4, max_wait_ms=50)
+    run_traced(scheduler.generate, [str(i) for i in range(12)])
+    stats = scheduler.get_stats()
+    assert stats["requests"] == 12 and 3 <= stats["batches"] <= 12
+    assert stats["max_batch"] <= 4 and stats["generate_seconds"] >= 0
+    assert stats["max_batch_size"] == 4
@@ -0,0 +1,22 @@
+import numpy as np
+from PIL import Image
+
+from utils.ocr import OCREngine, preprocess
+
+
+def test_cache_key_covers_output_settings(tmp_path):
+    base = {"tile_size": 2000, "tile_overlap": 64, "target_dpi": 300, "lang": "eng", "binarize": True}
+    paths = {OCREngine(cache_dir=str(tmp_path), **base)._cache_path("abc")}
+    for name, value in [("tile_size", 1000), ("tile_overlap", 0), ("target_dpi", 200),
+                        ("lang", "deu"), ("binarize", False)]:
+        paths.add(OCREngine(cache_dir=str(tmp_path), **{**base, name: value})._cache_path("abc"))
+    assert len(paths) == 6
+    assert OCREngine(cache_dir=str(tmp_path), **base)._cache_path("abc") in paths
+
+
+def test_binarization_is_optional():
+    gradient = Image.fromarray(np.tile(np.arange(256, dtype=np.uint8), (8, 1)))
+    binarized, _ = preprocess(gradient, binarize=True)
+    grey, _ = preprocess(gradient, binarize=False)
+    assert set(np.unique(np.asarray(binarized))) == {0, 255}
+    assert len(np.unique(np.asarray(grey))) == 256
@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import settle
+from utils import segment_store as segment_store_module
+from utils.segment_store import SegmentStore, lock_directory
+
+
+def crash_on(monkeypatch, suffix):
+    """Make atomic_write die partway through writing a file ending in suffix"""
+    real_write = segment_store_module.atomic_write
+
+    def atomic_write(path, write, mode="wb"):
+        if not path.endswith(suffix):
+            return real_write(path, write, mode)
+        with open(path + ".tmp", mode) as f:
+            f.write(b"\x93NUMPY" if "b" in mode else "{")
+        raise OSError("simulated crash")
+
+    monkeypatch.setattr(segment_store_module, "atomic_write", atomic_write)
+
+
+def vectors(count, seed):
+    return np.random.default_rng(seed).random((count, 4), dtype=np.float32)
+
+
+@pytest.mark.parametrize("suffix", [".ids.npy", "manifest.json"])
+def test_partial_append_is_discarded_on_reopen(tmp_path, monkeypatch, suffix):
+    store = SegmentStore(str(tmp_path))
+    store.append(vectors(3, 0), 3, np.arange(3))
+    store.append(vectors(2, 1), 5, np.arange(3, 5))
+
+    with monkeypatch.context() as patch, pytest.raises(OSError):
+        crash_on(patch, suffix)
+        store.append(vectors(4, 2), 9, np.arange(5, 9))
+
+    reopened = SegmentStore(str(tmp_path))
+    assert reopened.doc_count == 5
+    _, segments, _, _ = reopened.load()
+    assert [len(vecs) for vecs, _ in segments] == [3, 2]
+    assert np.array_equal(segments[1][1], np.arange(3, 5))
+    # Files of the uncommitted segment are cleaned up
+    assert sorted(os.listdir(reopened.segments_dir)) == sorted(
+        os.path.basename(path) for segment_id in reopened.manifest["segments"]
+        for path in reopened._segment_paths(segment_id)[:2]
+    )
+
+    reopened.append(vectors(1, 3), 6, np.arange(5, 6))
+    assert SegmentStore(str(tmp_path)).doc_count == 6
+
+
+def test_vector_store_recovers_committed_batches_after_partial_write(make_store, monkeypatch):
+    store = make_store()
+    store.add_documents(["alpha committed chunk", "beta committed chunk"], [{"chunk_id": 0}, {"chunk_id": 1}])
+
+    with monkeypatch.context() as patch, pytest.raises(OSError):
+        crash_on(patch, ".ids.npy")
+        store.add_documents(["gamma lost chunk"], [{"chunk_id": 2}])
+    settle(store)
+
+    reopened = make_store()
+    assert reopened.index.ntotal == 2
+    assert reopened.get_stats()["total_documents"] == 2
+    assert all("gamma" not in hit["document"] for hit in reopened.search("gamma lost chunk", top_k=5))
+
+    # The store keeps appending after recovery
+    positions = reopened.add_documents(["delta new chunk"], [{"chunk_id": 3}])
+    settle(reopened)
+    again = make_store()
+    assert again.index.ntotal == 3
+    assert again.search("delta new chunk", top_k=1, lexical_weight=1.0)[0]["position"] == positions[0]
+
+
+def test_directory_lock_is_exclusive(tmp_path):
+    held = lock_directory(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        lock_directory(str(tmp_path))
+    held.close()
+    lock_directory(str(tmp_path)).close()
+
+
+def purge_interrupted(make_store, monkeypatch, committed):
+    """Store with 6 of 10 chunks deleted whose purge died before or after its commit"""
+    store = make_store(purge_ratio=1.0)
+    store.add_documents([f"chunk{i} about topic{i}" for i in range(10)], [{"chunk_id": i} for i in range(10)])
+    store.delete_positions(list(range(6)))
+
+    def crash(db_path):
+        raise OSError("simulated crash")
+
+    with monkeypatch.context() as patch, pytest.raises(OSError):
+        if committed:
+            patch.setattr(segment_store_module, "finish_compaction", crash)
+        else:
+            crash_on(patch, "manifest.json")
+        store.purge()
+    settle(store)
+    return make_store(purge_ratio=1.0)
+
+
+def test_uncommitted_purge_is_discarded_on_reopen(make_store, monkeypatch):
+    reopened = purge_interrupted(make_store, monkeypatch, committed=False)
+    assert not os.path.exists(os.path.join(reopened.db_path, segment_store_module.COMPACTION_DIR))
+    assert len(reopened.docs) == reopened.index.ntotal == 10
+    assert reopened.tombstones == set(range(6))
+    hit = reopened.search("chunk8 topic8", top_k=1)[0]
+    assert hit["position"] == 8 and hit["metadata"]["chunk_id"] == 8
+
+
+def test_committed_purge_is_finished_on_reopen(make_store, monkeypatch):
+    reopened = purge_interrupted(make_store, monkeypatch, committed=True)
+    assert not os.path.exists(os.path.join(reopened.db_path, segment_store_module.COMPACTION_DIR))
+    assert len(reopened.docs) == reopened.index.ntotal == 4
+    assert not reopened.tombstones
+    for weight in [0.0, 1.0]:
+        hit = reopened.search("chunk8 topic8", top_k=1, lexical_weight=weight)[0]
+        assert hit["position"] == 2 and hit["metadata"]["chunk_id"] == 8
+    assert reopened.search("chunk1 topic1", top_k=4, filters={"type": "unknown"})[0]["metadata"]["chunk_id"] >= 6
@@ -0,0 +1,179 @@
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import settle
+
+
+def documents(count):
+    return [f"chunk{i} mentions keyword{i} and shared words" for i in range(count)]
+
+
+def positions_found(store, query, **kwargs):
+    return {hit["position"] for hit in store.search(query, top_k=50, **kwargs)}
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_delete_purge_search_consistency(make_store, index_type):
+    options = {"purge_ratio": 1.0, "index_type": index_type, "index_params": {"train_size": 20}}
+    store = make_store(**options)
+    added = store.add_documents(documents(20), [{"chunk_id": i} for i in range(20)],
+                                file_metadata={"file_path": "a.txt", "type": "text"})
+    settle(store)
+    assert store.get_stats()["index_type"] == index_type
+    deleted = added[:10]
+    store.delete_positions(deleted)
+
+    for kwargs in [{}, {"lexical_weight": 0.0}, {"lexical_weight": 1.0}, {"filters": {"type": "text"}}]:
+        found = positions_found(store, "shared words", **kwargs)
+        assert found and not found & set(deleted), kwargs
+
+    store.purge()
+    assert store.index.ntotal == len(store.docs) == 10
+    assert not store.tombstones
+    assert positions_found(store, "chunk3 keyword3") <= set(range(10))
+    # Surviving chunks are renumbered in order and keep their text and vectors
+    for weight in [0.0, 1.0]:
+        hit = store.search("chunk15 keyword15", top_k=1, lexical_weight=weight)[0]
+        assert hit["position"] == 5 and "chunk15" in hit["document"]
+
+    settle(store)
+    reopened = make_store(**options)
+    assert reopened.get_stats()["total_documents"] == 10
+    assert reopened.get_stats()["index_type"] == index_type
+    hits = reopened.search("shared words", top_k=50)
+    assert {hit["position"] for hit in hits} == set(range(10))
+    assert all(hit["metadata"]["chunk_id"] >= 10 for hit in hits)
+
+
+def test_delete_everything_then_search(make_store):
+    store = make_store()
+    added = store.add_documents(documents(5), [{} for _ in range(5)])
+    store.delete_positions(added)
+    settle(store)
+    assert store.search("shared words", top_k=5) == []
+    assert store.search("shared words", top_k=5, lexical_weight=0.0) == []
+
+
+def test_search_during_delete_and_purge(make_store):
+    store = make_store(purge_ratio=0.05)
+    store.add_documents(documents(400), [{"chunk_id": i} for i in range(400)],
+                        file_metadata={"type": "text"})
+    errors = []
+
+    def search_loop():
+        try:
+            for i in range(200):
+                kwargs = [{}, {"filters": {"type": "text"}}][i % 2]
+                for hit in store.search("shared words keyword7", top_k=20, **kwargs):
+                    assert hit["document"]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search_loop) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for batch in np.array_split(np.arange(300), 30):
+        # Purges renumber positions; look the chunks up while holding them
+        with store.hold_positions():
+            chunk_ids = set(batch.tolist())
+            store.delete_positions([p for p in range(len(store.docs))
+                                    if store.docs.get_metadata(p)["chunk_id"] in chunk_ids])
+    for thread in threads:
+        thread.join()
+    settle(store)
+
+    assert not errors
+    assert store.generation > 0
+    hits = store.search("shared words", top_k=50)
+    assert hits and all(hit["metadata"]["chunk_id"] >= 300 for hit in hits)
+
+
+def test_precomputed_query_embedding_skips_encoding(make_store, embedder, monkeypatch):
+    store = make_store(search_batch_size=4)
+    store.add_documents(documents(10), [{"chunk_id": i} for i in range(10)],
+                        file_metadata={"file_path": "a.txt", "type": "text"})
+    embedding = store.embed_query("chunk4 keyword4")
+    expected = store.search("chunk4 keyword4", top_k=1, lexical_weight=0.0)[0]["position"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("query encoded twice")
+
+    monkeypatch.setattr(embedder, "encode", fail)
+    for kwargs in [{"lexical_weight": 0.0}, {"lexical_weight": 0.0, "filters": {"type": "text"}}]:
+        hits = store.search("chunk4 keyword4", top_k=3, query_embedding=embedding, **kwargs)
+        assert hits[0]["position"] == expected, kwargs
+
+
+def test_dense_search_fills_top_k_past_tombstones(make_store):
+    store = make_store(purge_ratio=1.0)
+    added = store.add_documents(documents(50), [{"chunk_id": i} for i in range(50)])
+    # Delete the nearest neighbours of the query, leaving far fewer live hits than tombstones
+    nearest = [hit["position"] for hit in store.search("chunk7 keyword7 shared words", top_k=40, lexical_weight=0.0)]
+    store.delete_positions(nearest)
+
+    hits = store.search("chunk7 keyword7 shared words", top_k=5, lexical_weight=0.0)
+    assert len(hits) == 5
+    assert not {hit["position"] for hit in hits} & set(nearest)
+    assert {hit["position"] for hit in hits} <= set(added)
+    assert [hit["rank"] for hit in hits] == [1, 2, 3, 4, 5]
+
+
+def test_fusion_ranks_by_both_retrievers(make_store):
+    store = make_store(fusion_depth=3)
+    store.add_documents(["apple banana cherry", "apple banana grape", "apple banana melon",
+                         "zebra kiwi lemon orange peach plum"], [{} for _ in range(4)])
+    query = "apple banana zebra"
+
+    dense = [hit["position"] for hit in store.search(query, top_k=3, lexical_weight=0.0)]
+    lexical = [hit["position"] for hit in store.search(query, top_k=3, lexical_weight=1.0)]
+    # The rare term only reaches the lexical retriever
+    assert 3 not in dense and lexical[0] == 3
+
+    hits = store.search(query, top_k=3, lexical_weight=0.5)
+    assert [hit["rank"] for hit in hits] == [1, 2, 3]
+    for hit in hits:
+        position = hit["position"]
+        expected = sum(0.5 / (60 + ranks.index(position) + 1)
+                       for ranks in [dense, lexical] if position in ranks)
+        assert hit["fusion_score"] == pytest.approx(expected)
+        assert (hit["similarity_score"] > 0) == (position in dense)
+        assert (hit["lexical_score"] > 0) == (position in lexical)
+    assert [hit["fusion_score"] for hit in hits] == sorted((hit["fusion_score"] for hit in hits), reverse=True)
+    lexical_only = next(hit for hit in hits if hit["position"] == 3)
+    assert lexical_only["similarity_score"] == 0.0
+    assert "zebra" in lexical_only["document"]
+    # Found by both retrievers outranks found by one
+    assert hits[0]["position"] in set(dense) & set(lexical)
+
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "hnsw"])
+def test_filtered_search_through_id_selector(make_store, index_type):
+    # exact_filter_limit=0 sends every filtered search through the FAISS ID selector
+    store = make_store(index_type=index_type, index_params={"train_size": 40}, exact_filter_limit=0,
+                       purge_ratio=1.0)
+    text = store.add_documents(documents(30), [{"chunk_id": i} for i in range(30)],
+                               file_metadata={"file_path": "a.txt", "type": "text"})
+    audio = store.add_documents(documents(30), [{"chunk_id": i} for i in range(30)],
+                                file_metadata={"file_path": "b.mp3", "type": "audio"})
+    removed = store.add_documents(documents(5), [{"chunk_id": i} for i in range(5)],
+                                  file_metadata={"file_path": "c.txt", "type": "text"})
+    settle(store)
+    assert store.get_stats()["index_type"] == index_type
+    store.delete_positions(audio[:10] + removed)
+
+    for filters, allowed in [({"type": "audio"}, set(audio[10:])),
+                             ({"file_path": {"in": ["a.txt"]}}, set(text)),
+                             ({"type": {"ne": "text"}}, set(audio[10:]))]:
+        hits = store.search("chunk5 keyword5 shared words", top_k=10, lexical_weight=0.0, filters=filters)
+        assert len(hits) == 10, filters
+        assert {hit["position"] for hit in hits} <= allowed, filters
+
+    # The exact chunk is still the nearest hit within its filter
+    assert store.search("chunk5 keyword5", top_k=1, lexical_weight=0.0,
+                        filters={"type": "text"})[0]["position"] == text[5]
+    assert store.search("chunk15 keyword15", top_k=1, lexical_weight=0.0,
+                        filters={"type": "audio"})[0]["position"] == audio[15]
+    # Only tombstoned chunks match: nothing is returned
+    assert store.search("chunk3 keyword3", top_k=5, lexical_weight=0.0, filters={"file_path": "c.txt"}) == []
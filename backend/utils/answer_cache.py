@@ -0,0 +1,120 @@
+import numpy as np
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?.!").strip()
+
+
+class AnswerCache:
+    """LRU/TTL cache of RAG answers keyed by question text and question embedding
+
+    A lookup tries the exact normalized question. With a positive
+    `similarity_threshold` it then falls back to the closest cached question
+    by cosine similarity above it; this is off by default, since similar
+    questions can still want different answers. Entries are only valid for
+    the corpus version they were computed against; the cache empties itself
+    when the corpus changes.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 similarity_threshold: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                      "evictions": 0, "invalidations": 0}
+
+    def _check_version(self, version: Any):
+        if version != self._version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._version = version
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl_seconds > 0 and time.time() - entry["created"] > self.ttl_seconds
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold > 0
+
+    @staticmethod
+    def _unit(embedding: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if embedding is None:
+            return None
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def get(self, question: str, params: Tuple, version: Any,
+            embed: Callable[[str], np.ndarray]) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """Return (cached_result, question_embedding)
+
+        The embedding is computed only for semantic lookups after the exact
+        lookup misses (otherwise it is None), and is returned so the caller
+        can reuse it for retrieval and in put().
+        """
+        key = (normalize_question(question), params)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry["result"], None
+            if not self.semantic:
+                self.stats["misses"] += 1
+                return None, None
+
+        embedding = embed(question)
+        unit = self._unit(embedding)
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for entry_key, entry in self._entries.items():
+                if entry_key[1] != params or entry["embedding"] is None or self._expired(entry):
+                    continue
+                score = float(np.dot(unit, entry["embedding"]))
+                if score >= best_score:
+                    best_key, best_score = entry_key, score
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                self.stats["semantic_hits"] += 1
+                return self._entries[best_key]["result"], embedding
+            self.stats["misses"] += 1
+        return None, embedding
+
+    def put(self, question: str, params: Tuple, version: Any,
+            embedding: Optional[np.ndarray], result: Dict[str, Any]):
+        key = (normalize_question(question), params)
+        with self._lock:
+            # The corpus changed while this answer was being computed
+            if version != self._version:
+                return
+            self._entries[key] = {"result": result, "embedding": self._unit(embedding), "created": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "semantic": self.semantic,
+            "hit_rate": round(hits / total, 3) if total else 0,
+        }
@@ -0,0 +1,421 @@
+import json
+import os
+import platform
+import subprocess
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import numpy as np
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, Any]:
+    """Count, mean and p50/p95/p99/max of latencies, in milliseconds"""
+    if not seconds:
+        return {"count": 0}
+    ms = np.array(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _timed(function: Callable, *args, **kwargs) -> Tuple[Any, float]:
+    start_time = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start_time
+
+
+def _concurrent(function: Callable[[Any], Any], items: List[Any], clients: int) -> Dict[str, Any]:
+    """Run function over items with `clients` threads; throughput and latency summary"""
+    latencies, errors = [], []
+
+    def run(item):
+        start_time = time.perf_counter()
+        try:
+            function(item)
+            latencies.append(time.perf_counter() - start_time)
+        except Exception as e:
+            errors.append(str(e))
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(run, items))
+    wall = time.perf_counter() - start_time
+    return {
+        "clients": clients,
+        "requests": len(items),
+        "errors": len(errors),
+        "seconds": round(wall, 3),
+        "requests_per_second": round(len(latencies) / wall, 3) if wall else None,
+        **latency_summary(latencies),
+        **({"first_error": errors[0]} if errors else {}),
+    }
+
+
+def bench_vector_store(store, chunks: List[Dict[str, Any]], queries: List[str],
+                       add_batch_size: int = 64, top_k: int = 5,
+                       concurrency: Tuple[int, ...] = (1, 8)) -> Dict[str, Any]:
+    """Embedding, VectorStore.add_documents and search throughput on an empty store"""
+    texts = [chunk["text"] for chunk in chunks]
+    store.embed(texts[:add_batch_size])  # warm up (loads the model)
+    embeddings, embed_seconds = _timed(store.embed, texts)
+
+    add_latencies = []
+    for start in range(0, len(texts), add_batch_size):
+        _, seconds = _timed(store.add_documents, texts[start:start + add_batch_size],
+                            [chunk["metadata"] for chunk in chunks[start:start + add_batch_size]],
+                            embeddings=embeddings[start:start + add_batch_size])
+        add_latencies.append(seconds)
+
+    store.search(queries[0], top_k=top_k)  # warm up
+    search = {}
+    for name, kwargs in [("hybrid", {}), ("dense", {"lexical_weight": 0.0}),
+                         ("filtered", {"filters": {"type": "pdf"}})]:
+        search[name] = [_concurrent(lambda query: store.search(query, top_k=top_k, **kwargs), queries, clients)
+                        for clients in concurrency]
+    return {
+        "chunks": len(texts),
+        "embed": {"seconds": round(embed_seconds, 3),
+                  "chunks_per_second": round(len(texts) / embed_seconds, 2) if embed_seconds else None},
+        "add_documents": {"batch_size": add_batch_size,
+                          "chunks_per_second": round(len(texts) / sum(add_latencies), 2) if add_latencies else None,
+                          **latency_summary(add_latencies)},
+        "search": search,
+    }
+
+
+def bench_build_context(pipeline, store, queries: List[str], top_k: int = 5,
+                        repeat: int = 20) -> Dict[str, Any]:
+    """RAGPipeline._build_context latency and context size over real search hits"""
+    retrieved = [(query, hits) for query, hits in ((query, store.search(query, top_k=top_k)) for query in queries)
+                 if hits]
+    if not retrieved:
+        return {"count": 0}
+    pipeline._build_context(*retrieved[0])  # warm up (loads the LLM tokenizer)
+    latencies, sizes = [], []
+    for _ in range(repeat):
+        for query, hits in retrieved:
+            context, seconds = _timed(pipeline._build_context, query, hits)
+            latencies.append(seconds)
+            sizes.append(store.count_tokens(context))
+    return {**latency_summary(latencies), "mean_context_tokens": round(float(np.mean(sizes)), 1)}
+
+
+def bench_agents(orchestrator, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Extraction time of each agent over the corpus files of its type"""
+    results = {}
+    for file_type in sorted({f["type"] for f in files}):
+        paths = [f["path"] for f in files if f["type"] == file_type]
+        latencies, errors = [], []
+        for path in paths:
+            try:
+                _, seconds = _timed(orchestrator.process_file, path)
+                latencies.append(seconds)
+            except Exception as e:
+                errors.append(str(e))
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+        seconds = sum(latencies)
+        results[file_type] = {
+            "files": len(paths),
+            "errors": len(errors),
+            "files_per_second": round(len(latencies) / seconds, 3) if seconds else None,
+            "mb_per_second": round(total_bytes / 1e6 / seconds, 3) if seconds else None,
+            **latency_summary(latencies),
+            **({"first_error": errors[0]} if errors else {}),
+        }
+    return results
+
+
+def bench_generation(generate: Callable[[str], str], prompts: List[str],
+                     concurrency: Tuple[int, ...] = (1, 8, 32)) -> List[Dict[str, Any]]:
+    """Throughput and latency of generate() (e.g. a GenerationScheduler) at several client concurrencies"""
+    return [_concurrent(generate, [prompts[i % len(prompts)] for i in range(clients * 2)], clients)
+            for clients in concurrency]
+
+
+def bench_prefix_cache(generator, prompts: List[List[str]], max_new_tokens: int = 1) -> Dict[str, Any]:
+    """Prefill latency of prompt segment lists without, then with, the generator's prefix cache
+
+    With max_new_tokens=1 the timing is almost all prefill, i.e. time to
+    first token.
+    """
+    params = {"max_new_tokens": max_new_tokens, "do_sample": False}
+    cache, results = generator.prefix_cache, {}
+    generator.generate(prompts[0], params)  # warm up
+    for name, use_cache in [("uncached", False), ("cached", True)]:
+        generator.prefix_cache = cache if use_cache else None
+        if cache is not None:
+            cache.clear()
+        latencies = [_timed(generator.generate, segments, params)[1] for segments in prompts]
+        results[name] = latency_summary(latencies)
+    generator.prefix_cache = cache
+    results["cache"] = cache.get_stats() if cache is not None else None
+    return results
+
+
+def _bench_llm(backend: str, model_name: str, model_path: str, prompts: List[str],
+               max_new_tokens: int) -> Dict[str, Any]:
+    from .inference_backends import load_generator
+    from .model_registry import _current_rss
+
+    rss_before = _current_rss()
+    generator, load_seconds = _timed(load_generator, backend, model_name, model_path)
+
+    params = {"max_new_tokens": max_new_tokens, "do_sample": False}
+    generator.generate(prompts[0], params)  # warm up
+    tokens = 0
+    start_time = time.perf_counter()
+    for prompt in prompts:
+        tokens += generator.count_tokens(generator.generate(prompt, params))
+    seconds = time.perf_counter() - start_time
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "tokens_per_second": round(tokens / seconds, 2) if seconds else None,
+        "rss_bytes": _current_rss(),
+        "model_rss_bytes": max(_current_rss() - rss_before, 0),
+    }
+
+
+def _bench_embedder(backend: str, model_name: str, texts: List[str]) -> Dict[str, Any]:
+    from .model_registry import get_embedding_model, _current_rss
+
+    rss_before = _current_rss()
+    model, load_seconds = _timed(get_embedding_model, model_name, backend=backend)
+
+    model.encode(texts[:32], batch_size=32)  # warm up
+    _, seconds = _timed(model.encode, texts, batch_size=32, show_progress_bar=False)
+    return {
+        "load_seconds": round(load_seconds, 2),
+        "embeddings_per_second": round(len(texts) / seconds, 2) if seconds else None,
+        "rss_bytes": _current_rss(),
+        "model_rss_bytes": max(_current_rss() - rss_before, 0),
+    }
+
+
+def bench_backend(kind: str, backend: str, **kwargs) -> Dict[str, Any]:
+    """Tokens/s (kind "llm") or embeddings/s and RSS of one inference backend
+
+    Runs in a fresh process so RSS is not shared with other models.
+    """
+    import multiprocessing
+
+    target = _bench_llm if kind == "llm" else _bench_embedder
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        try:
+            return {"backend": backend, **pool.apply(target, (backend,), kwargs)}
+        except Exception as e:
+            return {"backend": backend, "error": str(e)}
+
+
+def bench_ocr(engine, paths: List[str]) -> Dict[str, Any]:
+    """Whole-image image_to_string against the OCREngine, cold and cached"""
+    import pytesseract
+    from PIL import Image
+
+    def baseline(path: str):
+        with Image.open(path) as image:
+            pytesseract.image_to_string(image)
+
+    def timed(run) -> float:
+        return _timed(lambda: [run(path) for path in paths])[1]
+
+    cache_dir, engine.cache_dir = engine.cache_dir, None
+    timings = {"baseline": timed(baseline), "engine": timed(engine.recognize)}
+    engine.cache_dir = cache_dir
+    if cache_dir:
+        timed(engine.recognize)  # warm the cache
+        timings["engine_cached"] = timed(engine.recognize)
+
+    return {
+        name: {
+            "seconds": round(seconds, 3),
+            "images_per_second": round(len(paths) / max(seconds, 1e-9), 3),
+        }
+        for name, seconds in timings.items()
+    }
+
+
+def bench_rerank_context(vector_store, reranker, examples: List[Dict[str, str]],
+                         ks: Tuple[int, ...] = (1, 2, 4, 8)) -> Dict[str, Any]:
+    """How much context is needed to include the evidence, with and without reranking
+
+    examples are {"question", "evidence"} pairs, where evidence is a string
+    that a chunk answering the question contains. For retrieval order and
+    reranked order, reports evidence recall@k and the mean number of chunks
+    and embedding tokens a context must hold to include the evidence.
+    Reranking runs without a budget so the comparison shows its full effect.
+    """
+    def needed(hits: List[Dict[str, Any]], evidence: str) -> Optional[Tuple[int, int]]:
+        tokens = 0
+        for rank, hit in enumerate(hits, 1):
+            tokens += vector_store.count_tokens(hit["document"])
+            if evidence.lower() in hit["document"].lower():
+                return rank, tokens
+        return None
+
+    found = {"retrieval": [], "reranked": []}
+    rerank_latencies = []
+    for example in examples:
+        hits = vector_store.search(example["question"], top_k=reranker.candidates)
+        reranked, seconds = _timed(reranker.rerank, example["question"], hits, top_k=len(hits), budget_ms=0)
+        rerank_latencies.append(seconds)
+        found["retrieval"].append(needed(hits, example["evidence"]))
+        found["reranked"].append(needed(reranked, example["evidence"]))
+
+    def summarize(results: List[Optional[Tuple[int, int]]]) -> Dict[str, Any]:
+        hits = [r for r in results if r is not None]
+        return {
+            **{f"recall_at_{k}": round(sum(1 for r in hits if r[0] <= k) / max(len(results), 1), 4)
+               for k in ks},
+            "mean_chunks_needed": round(float(np.mean([r[0] for r in hits])), 2) if hits else None,
+            "mean_tokens_needed": round(float(np.mean([r[1] for r in hits])), 1) if hits else None,
+        }
+
+    return {
+        "queries": len(examples),
+        "candidates": reranker.candidates,
+        "retrieval": summarize(found["retrieval"]),
+        "reranked": summarize(found["reranked"]),
+        "rerank": latency_summary(rerank_latencies),
+    }
+
+
+def _request(url: str, data: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None,
+             method: str = "GET", timeout: float = 600) -> Dict[str, Any]:
+    request = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def _multipart(field: str, path: str) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as f:
+        content = f.read()
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+            f"filename=\"{os.path.basename(path)}\"\r\nContent-Type: application/octet-stream\r\n\r\n"
+            ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def load_test(url: str, files: List[Dict[str, Any]], queries: List[Dict[str, Any]],
+              concurrency: Tuple[int, ...] = (1, 8), query_requests: int = 100,
+              top_k: int = 5, reset: bool = False) -> Dict[str, Any]:
+    """Concurrent /upload and /query load against a running server
+
+    Files are uploaded with wait=true, so upload latency covers the whole
+    ingestion; re-uploading unchanged files only measures deduplication, so
+    pass reset=True (DELETE /reset first) to compare runs. Queries cycle
+    through the corpus questions; evidence_recall is the share of answered
+    queries whose sources include the file holding the answer.
+    """
+    url = url.rstrip("/")
+    if reset:
+        _request(f"{url}/reset", method="DELETE")
+
+    def upload(path: str):
+        body, content_type = _multipart("file", path)
+        _request(f"{url}/upload?wait=true", body, {"Content-Type": content_type}, "POST")
+
+    found = []
+
+    def query(item: Dict[str, Any]):
+        payload = json.dumps({"question": item["question"], "top_k": top_k}).encode("utf-8")
+        result = _request(f"{url}/query", payload, {"Content-Type": "application/json"}, "POST")
+        found.append(any(source.get("file") == item["file"] for source in result.get("sources", [])))
+
+    paths = [f["path"] for f in files]
+    results = {"upload": _concurrent(upload, paths, max(concurrency))}
+    seconds = results["upload"]["seconds"]
+    results["upload"]["mb_per_second"] = round(sum(f["bytes"] for f in files) / 1e6 / seconds, 3) \
+        if seconds else None
+
+    results["query"] = []
+    if queries:
+        items = [queries[i % len(queries)] for i in range(query_requests)]
+        for clients in concurrency:
+            found.clear()
+            report = _concurrent(query, items, clients)
+            report["evidence_recall"] = round(sum(found) / len(found), 4) if found else None
+            results["query"].append(report)
+    return results
+
+
+def environment(extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Where and on what a benchmark ran, stored next to its results"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        **(extra or {}),
+    }
+
+
+def _flatten(results: Any, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of nested results, keyed by dotted path (list items by their clients count)"""
+    flat = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            flat.update(_flatten(value, f"{prefix}{key}."))
+    elif isinstance(results, list):
+        for i, value in enumerate(results):
+            label = f"clients_{value['clients']}" if isinstance(value, dict) and "clients" in value else str(i)
+            flat.update(_flatten(value, f"{prefix}{label}."))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        flat[prefix[:-1]] = float(results)
+    return flat
+
+
+def _direction(key: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if the metric is not compared"""
+    name = key.rsplit(".", 1)[-1]
+    if "per_second" in name or "recall" in name:
+        return 1
+    if name.endswith("_ms") or name == "seconds" or name == "errors":
+        return -1
+    return 0
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2,
+            floor_ms: float = 0.5) -> Dict[str, Any]:
+    """Metrics of current results that moved more than `tolerance` against a baseline
+
+    Latencies, durations and error counts regress when they rise; throughput
+    and recall regress when they fall. Latency changes smaller than floor_ms
+    are treated as noise.
+    """
+    now, before = _flatten(current.get("results", current)), _flatten(baseline.get("results", baseline))
+    regressions, improvements = [], []
+    compared = 0
+    for key in sorted(set(now) & set(before)):
+        direction = _direction(key)
+        if direction == 0:
+            continue
+        compared += 1
+        old, new = before[key], now[key]
+        if key.endswith("_ms") and abs(new - old) < floor_ms:
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf") * np.sign(new - old))
+        entry = {"metric": key, "baseline": old, "current": new,
+                 "change": round(change, 4) if np.isfinite(change) else None}
+        if direction * change < -tolerance:
+            regressions.append(entry)
+        elif direction * change > tolerance:
+            improvements.append(entry)
+    return {"tolerance": tolerance, "compared": compared,
+            "regressions": regressions, "improvements": improvements}
@@ -0,0 +1,271 @@
+import numpy as np
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; compound identifiers (AB-1234, v2.1) are kept whole and split"""
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+class BM25Index:
+    """Incremental BM25 inverted index over vector store positions
+
+    Postings are kept as a compact CSR snapshot (vocabulary, offsets,
+    positions and term frequencies in one .npz) plus an in-memory tail of
+    documents added since the last snapshot. The tail is rebuilt from the
+    document store on load, so only save() needs to touch the disk.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        os.makedirs(path, exist_ok=True)
+        self.snapshot_file = os.path.join(path, "postings.npz")
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._vocab: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.zeros(0, dtype=np.int64)
+        self._freqs = np.zeros(0, dtype=np.int32)
+        self._base_count = 0
+        self._tail: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._lengths: List[int] = []
+        self._length_array = None
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def load(self, documents) -> None:
+        """Load the snapshot and index documents added after it
+
+        documents is the vector store's DocStore; the snapshot is discarded if
+        it covers more documents than survived recovery.
+        """
+        with self._lock:
+            self._reset()
+            if os.path.exists(self.snapshot_file):
+                try:
+                    with np.load(self.snapshot_file) as snapshot:
+                        base_count = int(snapshot["doc_count"])
+                        if base_count <= len(documents):
+                            vocab = json.loads(snapshot["vocab"].tobytes().decode("utf-8"))
+                            self._vocab = {term: i for i, term in enumerate(vocab)}
+                            self._offsets = snapshot["offsets"]
+                            self._postings = snapshot["postings"]
+                            self._freqs = snapshot["freqs"]
+                            self._lengths = snapshot["lengths"].tolist()
+                            self._total_length = int(sum(self._lengths))
+                            self._base_count = base_count
+                except Exception as e:
+                    print(f"Warning: ignoring unreadable BM25 snapshot: {e}")
+                    self._reset()
+
+            missing = len(documents) - len(self._lengths)
+            if missing:
+                print(f"Indexing {missing} documents for BM25...")
+                for position in range(len(self._lengths), len(documents)):
+                    self._add_one(position, documents.get_document(position))
+
+    def add(self, first: int, documents: List[str]):
+        """Index documents stored at positions first, first + 1, ..."""
+        with self._lock:
+            if first != len(self._lengths):
+                raise ValueError(f"BM25 index has {len(self._lengths)} documents, cannot add at {first}")
+            for offset, text in enumerate(documents):
+                self._add_one(first + offset, text)
+
+    def _add_one(self, position: int, text: str):
+        counts = Counter(tokenize(text))
+        for term, count in counts.items():
+            positions, freqs = self._tail.setdefault(term, ([], []))
+            positions.append(position)
+            freqs.append(count)
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+        self._length_array = None
+
+    def remove(self, positions: np.ndarray):
+        """Drop the postings of deleted documents (their lengths become 0)"""
+        positions = np.asarray(positions, dtype=np.int64)
+        with self._lock:
+            positions = positions[positions < len(self._lengths)]
+            if len(positions) == 0:
+                return
+            keep = ~np.isin(self._postings, positions)
+            terms = np.repeat(np.arange(len(self._vocab)), np.diff(self._offsets))
+            self._offsets = np.concatenate([[0], np.cumsum(np.bincount(terms[keep], minlength=len(self._vocab)))])
+            self._postings = self._postings[keep]
+            self._freqs = self._freqs[keep]
+
+            doomed = set(positions.tolist())
+            for term in list(self._tail):
+                tail_positions, freqs = self._tail[term]
+                kept = [(p, f) for p, f in zip(tail_positions, freqs) if p not in doomed]
+                if kept:
+                    self._tail[term] = ([p for p, _ in kept], [f for _, f in kept])
+                else:
+                    del self._tail[term]
+
+            for position in doomed:
+                self._total_length -= self._lengths[position]
+                self._lengths[position] = 0
+            self._length_array = None
+
+    def _term_postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        parts_positions, parts_freqs = [], []
+        term_id = self._vocab.get(term)
+        if term_id is not None:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            parts_positions.append(self._postings[start:end])
+            parts_freqs.append(self._freqs[start:end])
+        if term in self._tail:
+            positions, freqs = self._tail[term]
+            parts_positions.append(np.array(positions, dtype=np.int64))
+            parts_freqs.append(np.array(freqs, dtype=np.int32))
+        if not parts_positions:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        return np.concatenate(parts_positions), np.concatenate(parts_freqs)
+
+    def search(self, query: str, top_k: int = 10, exclude: Optional[Iterable[int]] = None,
+               allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top (position, BM25 score) pairs for a query
+
+        Excluded positions are skipped; if `allowed` (a boolean mask over
+        positions) is given, only positions it marks are scored.
+        """
+        terms = set(tokenize(query))
+        exclude = exclude if exclude is not None else ()
+        with self._lock:
+            num_docs = len(self._lengths)
+            if not terms or num_docs == 0:
+                return []
+            if self._length_array is None:
+                self._length_array = np.array(self._lengths, dtype=np.float32)
+            lengths = self._length_array
+            avg_length = max(self._total_length / num_docs, 1e-9)
+
+            all_positions, all_scores = [], []
+            for term in terms:
+                positions, freqs = self._term_postings(term)
+                if len(positions) == 0:
+                    continue
+                df = len(positions)
+                if allowed is not None:
+                    keep = allowed[positions[positions < len(allowed)]]
+                    positions, freqs = positions[:len(keep)][keep], freqs[:len(keep)][keep]
+                    if len(positions) == 0:
+                        continue
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                tf = freqs.astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * lengths[positions] / avg_length)
+                all_positions.append(positions)
+                all_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        if not all_positions:
+            return []
+        positions, inverse = np.unique(np.concatenate(all_positions), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+
+        # Over-fetch so excluded positions can be dropped without losing top_k
+        k = min(len(scores), top_k + len(exclude))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        results = []
+        for i in best:
+            position = int(positions[i])
+            if position in exclude:
+                continue
+            results.append((position, float(scores[i])))
+            if len(results) >= top_k:
+                break
+        return results
+
+    def compact_into(self, path: str, remap: np.ndarray):
+        """Write a snapshot to path with positions renumbered through remap (-1 drops a document)"""
+        from .segment_store import atomic_write
+
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            terms = list(self._vocab) + [term for term in self._tail if term not in self._vocab]
+            kept_terms, postings, freqs = [], [], []
+            offsets = [0]
+            for term in terms:
+                positions, term_freqs = self._term_postings(term)
+                positions = remap[positions]
+                keep = positions >= 0
+                if not keep.any():
+                    continue
+                kept_terms.append(term)
+                postings.append(positions[keep])
+                freqs.append(term_freqs[keep])
+                offsets.append(offsets[-1] + int(keep.sum()))
+            lengths = np.array(self._lengths, dtype=np.int32)[remap[:len(self._lengths)] >= 0]
+
+        snapshot = {
+            "doc_count": np.array(len(lengths)),
+            "vocab": np.frombuffer(json.dumps(kept_terms).encode("utf-8"), dtype=np.uint8),
+            "offsets": np.array(offsets, dtype=np.int64),
+            "postings": np.concatenate(postings) if postings else np.zeros(0, dtype=np.int64),
+            "freqs": np.concatenate(freqs) if freqs else np.zeros(0, dtype=np.int32),
+            "lengths": lengths,
+        }
+        atomic_write(os.path.join(path, os.path.basename(self.snapshot_file)),
+                     lambda f: np.savez(f, **snapshot))
+
+    def save(self):
+        """Merge the tail into a new CSR snapshot and write it atomically"""
+        from .segment_store import atomic_write
+
+        with self._lock:
+            terms = list(self._vocab) + [term for term in self._tail if term not in self._vocab]
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            postings, freqs = [], []
+            for i, term in enumerate(terms):
+                positions, term_freqs = self._term_postings(term)
+                postings.append(positions)
+                freqs.append(term_freqs)
+                offsets[i + 1] = offsets[i] + len(positions)
+            self._vocab = {term: i for i, term in enumerate(terms)}
+            self._offsets = offsets
+            self._postings = np.concatenate(postings) if postings else np.zeros(0, dtype=np.int64)
+            self._freqs = np.concatenate(freqs) if freqs else np.zeros(0, dtype=np.int32)
+            self._tail = {}
+            self._base_count = len(self._lengths)
+            snapshot = {
+                "doc_count": np.array(self._base_count),
+                "vocab": np.frombuffer(json.dumps(terms).encode("utf-8"), dtype=np.uint8),
+                "offsets": self._offsets,
+                "postings": self._postings,
+                "freqs": self._freqs,
+                "lengths": np.array(self._lengths, dtype=np.int32),
+            }
+
+        atomic_write(self.snapshot_file, lambda f: np.savez(f, **snapshot))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": len(self._lengths),
+                "terms": len(set(self._vocab) | set(self._tail)),
+                "snapshot_documents": self._base_count,
+                "snapshot_bytes": os.path.getsize(self.snapshot_file) if os.path.exists(self.snapshot_file) else 0,
+            }
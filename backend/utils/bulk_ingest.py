@@ -0,0 +1,173 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+import json
+import os
+import time
+
+
+def discover_files(source: str, extensions: Iterable[str]) -> List[Tuple[str, str]]:
+    """(path, filename) pairs to ingest from a directory or a manifest file
+
+    A directory is walked recursively and files are named by their path
+    relative to it. A manifest lists one path per line (relative paths are
+    resolved against the manifest's directory).
+    """
+    extensions = {ext.lower() for ext in extensions}
+    if os.path.isdir(source):
+        files = []
+        for root, _, names in os.walk(source):
+            for name in sorted(names):
+                if os.path.splitext(name)[1].lower() in extensions:
+                    path = os.path.join(root, name)
+                    files.append((path, os.path.relpath(path, source)))
+        return sorted(files, key=lambda item: item[1])
+
+    base = os.path.dirname(os.path.abspath(source))
+    files = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = line if os.path.isabs(line) else os.path.join(base, line)
+            files.append((path, line))
+    return files
+
+
+class BulkIngestor:
+    """Pipelined ingestion of many files
+
+    Files are extracted and chunked by `workers` threads while earlier
+    files are embedded. Every `group_size` files (or `group_chunks` chunks)
+    the group is embedded in large batches and committed to the index as a
+    single segment. Finished files are appended to a JSONL checkpoint, so an
+    interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, ingestion, workers: int = 4, group_size: int = 64,
+                 group_chunks: int = 4096, embed_batch_size: int = 256,
+                 checkpoint_path: Optional[str] = None):
+        self.ingestion = ingestion
+        self.workers = workers
+        self.group_size = group_size
+        self.group_chunks = group_chunks
+        self.embed_batch_size = embed_batch_size
+        self.checkpoint_path = checkpoint_path
+
+    def _load_checkpoint(self) -> set:
+        """Filenames finished successfully in a previous run"""
+        done = set()
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return done
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final line from an interrupted write
+                if entry.get("status") == "success":
+                    done.add(entry["filename"])
+        return done
+
+    def _checkpoint(self, results: List[Dict[str, Any]]):
+        if not self.checkpoint_path:
+            return
+        with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps({key: result.get(key) for key in
+                                    ["filename", "status", "change", "chunks_created", "error"]}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, files: List[Tuple[str, str]],
+            progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Ingest (path, filename) pairs and return a throughput report
+
+        progress(report) is called after each committed group.
+        """
+        progress = progress or (lambda report: None)
+        done = self._load_checkpoint()
+        todo = [(path, filename) for path, filename in files if filename not in done]
+        report = {
+            "files": len(files),
+            "skipped": len(files) - len(todo),
+            "processed": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "changes": {},
+            "chunks_created": 0,
+            "total_chunks": 0,
+            "errors": [],
+        }
+        start_time = time.time()
+
+        def prepare(item: Tuple[str, str]) -> Dict[str, Any]:
+            path, filename = item
+            try:
+                return self.ingestion.prepare(path, filename)
+            except Exception as e:
+                return {"filename": filename, "error": str(e)}
+
+        def commit(group: List[Dict[str, Any]]):
+            failed = [entry for entry in group if "error" in entry]
+            ready = [entry for entry in group if "error" not in entry]
+            try:
+                results = self.ingestion.ingest_many(ready, embed_batch_size=self.embed_batch_size)
+            except Exception as e:
+                failed += ready
+                results = []
+                for entry in ready:
+                    entry["error"] = str(e)
+            failures = [{"filename": entry["filename"], "status": "failed", "error": entry["error"]}
+                        for entry in failed]
+
+            for result in results:
+                report["succeeded"] += 1
+                report["changes"][result["change"]] = report["changes"].get(result["change"], 0) + 1
+                report["chunks_created"] += result["chunks_created"]
+                report["total_chunks"] += result["total_chunks"]
+            for failure in failures:
+                report["failed"] += 1
+                print(f"[BulkIngestor] {failure['filename']} failed: {failure['error']}")
+                if len(report["errors"]) < 100:
+                    report["errors"].append(failure)
+            report["processed"] += len(group)
+            self._checkpoint(results + failures)
+            progress(self._throughput(report, start_time))
+
+        # The next group is extracted while the current one is embedded; the
+        # bounded window keeps memory flat however many files there are
+        window = self.group_size + self.workers
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-extract") as pool:
+            pending = deque()
+            items = iter(todo)
+            group, group_chunks = [], 0
+            while True:
+                while len(pending) < window:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    pending.append(pool.submit(prepare, item))
+                if not pending:
+                    break
+                entry = pending.popleft().result()
+                group.append(entry)
+                group_chunks += len(entry.get("chunks", []))
+                if len(group) >= self.group_size or group_chunks >= self.group_chunks:
+                    commit(group)
+                    group, group_chunks = [], 0
+            if group:
+                commit(group)
+
+        return self._throughput(report, start_time)
+
+    @staticmethod
+    def _throughput(report: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        elapsed = time.time() - start_time
+        return {
+            **report,
+            "elapsed_seconds": round(elapsed, 2),
+            "files_per_second": round(report["processed"] / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_second": round(report["chunks_created"] / elapsed, 2) if elapsed else 0.0,
+        }
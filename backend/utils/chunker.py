@@ -0,0 +1,194 @@
+import re
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def approximate_tokens(text: str) -> int:
+    """Rough token count for when no tokenizer is available"""
+    return int(len(text.split()) * 1.3) + 1
+
+
+class Chunker:
+    """Token-budgeted chunker that respects document structure
+
+    Chunks never span a page (or whatever unit the caller passes in), break
+    at paragraph ends when the next paragraph would overflow the budget,
+    fall back to sentence and then word boundaries for oversized paragraphs,
+    and start each chunk with up to `overlap_tokens` of the previous one.
+    Audio segments are packed whole into time windows.
+    """
+
+    def __init__(self, count_tokens: Optional[Callable[[str], int]] = None,
+                 max_tokens: int = 200, overlap_tokens: int = 30):
+        self.count_tokens = count_tokens or approximate_tokens
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def chunk_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Split one structural unit (a page, a document) into chunks
+
+        Returns [{"text", "metadata"}]; every chunk carries `metadata`.
+        """
+        metadata = metadata or {}
+        chunks = []
+        current = []  # (text, tokens, starts_paragraph)
+        current_tokens = 0
+        fresh = 0  # pieces in `current` that are not overlap from the previous chunk
+
+        def add(piece: str, tokens: int, starts_paragraph: bool):
+            nonlocal current_tokens, fresh
+            current.append((piece, tokens, starts_paragraph))
+            current_tokens += tokens
+            fresh += 1
+
+        def emit():
+            nonlocal current, current_tokens, fresh
+            if fresh:
+                chunks.append({"text": self._join(current), "metadata": dict(metadata)})
+                current = self._overlap(current)
+                current_tokens = sum(t for _, t, _ in current)
+                fresh = 0
+
+        def make_room(tokens: int):
+            nonlocal current, current_tokens
+            if current_tokens + tokens > self.max_tokens:
+                emit()
+            # Drop the overlap rather than overflow the budget
+            if current_tokens + tokens > self.max_tokens and not fresh:
+                current, current_tokens = [], 0
+
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            tokens = self.count_tokens(paragraph)
+
+            # Prefer to break at the paragraph boundary once the chunk is reasonably full
+            if current_tokens + tokens > self.max_tokens and current_tokens >= self.max_tokens // 2:
+                make_room(tokens)
+
+            if current_tokens + tokens <= self.max_tokens:
+                add(paragraph, tokens, True)
+                continue
+
+            for i, piece in enumerate(self._split_paragraph(paragraph)):
+                piece_tokens = self.count_tokens(piece)
+                make_room(piece_tokens)
+                add(piece, piece_tokens, i == 0)
+
+        emit()
+        return chunks
+
+    def chunk_segments(self, segments: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Pack timestamped audio segments ({"start", "end", "text"}) into chunks"""
+        return list(self.iter_segment_chunks(segments))
+
+    def iter_segment_chunks(self, segments: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield chunks as soon as enough segments have arrived to fill one
+
+        Segments are never split; each chunk's metadata holds the start of its
+        first segment and the end of its last.
+        """
+        current = []
+        current_tokens = 0
+        last_end = None
+
+        def make_chunk():
+            return {
+                "text": " ".join(seg["text"].strip() for seg in current),
+                "metadata": {"start": current[0]["start"], "end": current[-1]["end"]}
+            }
+
+        for segment in segments:
+            if not segment["text"].strip():
+                continue
+            tokens = self.count_tokens(segment["text"])
+            if current and current_tokens + tokens > self.max_tokens:
+                yield make_chunk()
+                last_end = current[-1]["end"]
+                # Carry the last segments over as overlap
+                overlap, overlap_tokens = [], 0
+                for seg in reversed(current):
+                    seg_tokens = self.count_tokens(seg["text"])
+                    if overlap_tokens + seg_tokens > self.overlap_tokens:
+                        break
+                    overlap.insert(0, seg)
+                    overlap_tokens += seg_tokens
+                current, current_tokens = overlap, overlap_tokens
+            current.append(segment)
+            current_tokens += tokens
+
+        # Skip a tail that is only overlap from the previous chunk
+        if current and current[-1]["end"] != last_end:
+            yield make_chunk()
+
+    def chunk_blocks(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Pack OCR text blocks ({"text", "bbox"}) into chunks
+
+        Blocks are kept whole where they fit; each chunk's metadata lists
+        the bounding boxes of the blocks it contains. Blocks are separate
+        regions of the image, so chunks do not overlap.
+        """
+        chunks = []
+        current = []
+        current_tokens = 0
+
+        def emit():
+            if current:
+                chunks.append({
+                    "text": "\n\n".join(block["text"] for block in current),
+                    "metadata": {"bboxes": [block["bbox"] for block in current]}
+                })
+
+        for block in blocks:
+            if not block["text"].strip():
+                continue
+            tokens = self.count_tokens(block["text"])
+            if tokens > self.max_tokens:
+                emit()
+                current, current_tokens = [], 0
+                chunks.extend(self.chunk_text(block["text"], {"bboxes": [block["bbox"]]}))
+                continue
+            if current_tokens + tokens > self.max_tokens:
+                emit()
+                current, current_tokens = [], 0
+            current.append(block)
+            current_tokens += tokens
+        emit()
+        return chunks
+
+    def _split_paragraph(self, paragraph: str) -> List[str]:
+        """Sentences of a paragraph, with over-long sentences cut into word windows"""
+        pieces = []
+        for sentence in _SENTENCE_END.split(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            tokens = self.count_tokens(sentence)
+            if tokens <= self.max_tokens:
+                pieces.append(sentence)
+                continue
+            words = sentence.split()
+            step = max(1, int(self.max_tokens * len(words) / tokens * 0.9))
+            pieces.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+        return pieces
+
+    def _overlap(self, pieces: List[tuple]) -> List[tuple]:
+        """Trailing pieces of a chunk that fit in the overlap budget"""
+        overlap, tokens = [], 0
+        for piece in reversed(pieces[1:]):
+            if tokens + piece[1] > self.overlap_tokens:
+                break
+            overlap.insert(0, piece)
+            tokens += piece[1]
+        return overlap
+
+    @staticmethod
+    def _join(pieces: List[tuple]) -> str:
+        text = ""
+        for piece, _, starts_paragraph in pieces:
+            if text:
+                text += "\n\n" if starts_paragraph else " "
+            text += piece
+        return text
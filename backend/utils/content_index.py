@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_chunk(text: str) -> str:
+    """Hash of a chunk's text, insensitive to whitespace differences"""
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class ContentIndex:
+    """Content-addressed record of ingested files and their chunks
+
+    Maps each uploaded filename to its file hash and the (chunk hash,
+    vector store position) pairs it owns. Positions belong to one file, so
+    every stored chunk carries its own file's metadata; a new version of a
+    file keeps the positions of chunks it still contains. Stored positions
+    are also indexed by chunk hash and files by their bytes' hash, so
+    identical content elsewhere can reuse its embeddings instead of being
+    re-embedded. Changes are appended to files.jsonl and replayed on load.
+    The vector store renumbers positions when it purges deleted chunks
+    (stage_renumber, apply_renumber).
+    """
+
+    def __init__(self, db_path: str):
+        self.log_file = os.path.join(db_path, "files.jsonl")
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.chunks: Dict[str, Set[int]] = {}
+        self.by_hash: Dict[str, Set[str]] = {}
+        self._refs: Dict[int, int] = {}
+        self._log_entries = 0
+        self._renumbered = None
+        # Held by ingest jobs across dedup lookup, insert and commit
+        self.lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        from .segment_store import finish_compaction
+
+        # A purge interrupted after its commit also replaced this log
+        finish_compaction(os.path.dirname(self.log_file))
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final line from an interrupted write
+                self._log_entries += 1
+                if entry.get("deleted"):
+                    self.files.pop(entry["filename"], None)
+                else:
+                    self.files[entry["filename"]] = entry
+        self._rebuild()
+        if self._log_entries > 2 * len(self.files) + 100:
+            self._rewrite_log()
+
+    def _rebuild(self):
+        self.chunks, self.by_hash, self._refs = {}, {}, {}
+        for record in self.files.values():
+            self._reference(record)
+
+    def _reference(self, record: Dict[str, Any]):
+        self.by_hash.setdefault(record["sha256"], set()).add(record["filename"])
+        for chunk_hash, position in record["chunks"]:
+            self.chunks.setdefault(chunk_hash, set()).add(position)
+            self._refs[position] = self._refs.get(position, 0) + 1
+
+    def _append_log(self, entry: Dict[str, Any]):
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_entries += 1
+
+    def _rewrite_log(self):
+        from .segment_store import atomic_write
+        atomic_write(self.log_file, lambda f: f.writelines(
+            json.dumps(record) + '\n' for record in self.files.values()), mode="w")
+        self._log_entries = len(self.files)
+
+    def get_file(self, filename: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(filename)
+
+    def find_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Any ingested file with identical bytes"""
+        filenames = self.by_hash.get(file_hash)
+        return self.files[next(iter(filenames))] if filenames else None
+
+    def lookup_chunk(self, chunk_hash: str) -> Optional[int]:
+        """A vector store position (of any file) holding this chunk, if any"""
+        positions = self.chunks.get(chunk_hash)
+        return next(iter(positions)) if positions else None
+
+    def commit_file(self, filename: str, file_hash: str, file_type: str,
+                    chunks: List[Tuple[str, int]]) -> List[int]:
+        """Record the chunks a file now owns
+
+        Returns positions that no file references any more (the file's
+        previous version's chunks that did not survive), for tombstoning.
+        """
+        previous = self.files.get(filename)
+        record = {"filename": filename, "sha256": file_hash, "type": file_type,
+                  "chunks": [list(chunk) for chunk in chunks]}
+        self._append_log(record)
+        self.files[filename] = record
+        self._reference(record)
+        return self._release(previous)
+
+    def remove_file(self, filename: str) -> List[int]:
+        """Forget a file; returns positions no longer referenced by any file"""
+        previous = self.files.pop(filename, None)
+        if previous is None:
+            return []
+        self._append_log({"filename": filename, "deleted": True})
+        return self._release(previous)
+
+    def _release(self, record: Optional[Dict[str, Any]]) -> List[int]:
+        released = []
+        if record is None:
+            return released
+        filename = record["filename"]
+        if self.files.get(filename, {}).get("sha256") != record["sha256"]:
+            filenames = self.by_hash.get(record["sha256"], set())
+            filenames.discard(filename)
+            if not filenames:
+                self.by_hash.pop(record["sha256"], None)
+        for chunk_hash, position in record["chunks"]:
+            self._refs[position] -= 1
+            if self._refs[position] == 0:
+                del self._refs[position]
+                positions = self.chunks[chunk_hash]
+                positions.discard(position)
+                if not positions:
+                    del self.chunks[chunk_hash]
+                released.append(position)
+        return released
+
+    def stage_renumber(self, remap: np.ndarray, directory: str):
+        """Write the log with positions renumbered through remap into a purge's staging directory
+
+        The in-memory records change only in apply_renumber(), once the
+        purge has committed. Both run while no positions are held (see
+        VectorStore.hold_positions), so no ingest or removal is changing
+        the index; the lock is not taken, as reset() holds it while it
+        waits for a running purge.
+        """
+        from .segment_store import atomic_write
+
+        self._renumbered = {
+            filename: {**record, "chunks": [[chunk_hash, int(remap[position])]
+                                            for chunk_hash, position in record["chunks"]
+                                            if position < len(remap) and remap[position] >= 0]}
+            for filename, record in self.files.items()
+        }
+        records = list(self._renumbered.values())
+        atomic_write(os.path.join(directory, os.path.basename(self.log_file)), lambda f: f.writelines(
+            json.dumps(record) + '\n' for record in records), mode="w")
+
+    def apply_renumber(self):
+        """Switch to the records written by stage_renumber()"""
+        if self._renumbered is None:
+            return
+        self.files, self._renumbered = self._renumbered, None
+        self._rebuild()
+        self._log_entries = len(self.files)
+
+    def reset(self):
+        """Forget every file"""
+        with self.lock:
+            self.files = {}
+            self._rebuild()
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
+            self._log_entries = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "files": len(self.files),
+            "unique_chunks": len(self.chunks),
+        }
@@ -0,0 +1,169 @@
+import re
+import threading
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+from .metrics import metrics
+
+_WORD = re.compile(r"\w+")
+_TOKEN = re.compile(r"\S+")
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _overlap(earlier: List[str], later: List[str]) -> int:
+    """Length of the longest run of words that ends `earlier` and starts `later`"""
+    if not earlier or not later:
+        return 0
+    limit = min(len(earlier), len(later))
+    for start in range(len(earlier) - limit, len(earlier)):
+        if earlier[start] == later[0] and earlier[start:] == later[:len(earlier) - start]:
+            return len(earlier) - start
+    return 0
+
+
+def _drop_words(text: str, head: int = 0, tail: int = 0) -> str:
+    """text without its first `head` and last `tail` whitespace-separated words, formatting kept"""
+    spans = [match.span() for match in _TOKEN.finditer(text)]
+    if head + tail >= len(spans):
+        return ""
+    start = spans[head][0]
+    end = spans[len(spans) - tail - 1][1]
+    return text[start:end]
+
+
+class ContextPacker:
+    """Token-budgeted, redundancy-aware selection of retrieved chunks
+
+    Hits arrive in relevance order (retrieval, fusion or reranking), so
+    relevance is taken from rank. Chunks are picked by maximal marginal
+    relevance, mmr_lambda * relevance - (1 - mmr_lambda) * similarity to the
+    chunks already picked, where similarity is the cosine of the stored
+    embeddings or, without them, the Jaccard overlap of word 5-grams.
+
+    A picked chunk whose 5-grams are mostly (duplicate_threshold) contained
+    in an already packed chunk is dropped; the overlap the chunker repeats
+    between neighbouring chunks of a file is trimmed. Formatted segments are
+    counted with the caller's tokenizer and added while they fit the budget,
+    so the context is never cut mid-chunk.
+    """
+
+    def __init__(self, token_budget: int = 800, max_chunks: int = 8, mmr_lambda: float = 0.7,
+                 duplicate_threshold: float = 0.8, min_overlap_words: int = 5):
+        self.token_budget = token_budget
+        self.max_chunks = max_chunks
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.min_overlap_words = min_overlap_words
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "candidates": 0, "packed": 0, "duplicates": 0,
+                      "trimmed": 0, "over_budget": 0, "context_tokens": 0}
+
+    @staticmethod
+    def _similarities(shingles: List[set], vectors: Optional[np.ndarray]) -> np.ndarray:
+        if vectors is not None:
+            return vectors @ vectors.T
+        n = len(shingles)
+        similarity = np.eye(n)
+        for i in range(n):
+            for j in range(i + 1, n):
+                union = len(shingles[i] | shingles[j])
+                similarity[i, j] = similarity[j, i] = len(shingles[i] & shingles[j]) / union if union else 0.0
+        return similarity
+
+    def _dedupe(self, text: str, source: Any, packed: List[Dict[str, Any]]) -> Optional[str]:
+        """text minus what packed chunks already carry, or None if it adds nothing"""
+        shingles = _shingles(text)
+        for other in packed:
+            if shingles and len(shingles & other["shingles"]) / len(shingles) >= self.duplicate_threshold:
+                return None
+        trimmed = text
+        for other in packed:
+            if other["source"] != source:
+                continue
+            words, other_words = trimmed.split(), other["text"].split()
+            head = _overlap(other_words, words)
+            tail = _overlap(words, other_words)
+            head = head if head >= self.min_overlap_words else 0
+            tail = tail if tail >= self.min_overlap_words else 0
+            if head or tail:
+                trimmed = _drop_words(trimmed, head, tail)
+                if not trimmed:
+                    return None
+        return trimmed
+
+    def pack(self, hits: List[Dict[str, Any]], budget: int, count_tokens: Callable[[str], int],
+             segment: Callable[[int, Dict[str, Any], str], str],
+             vectors: Optional[np.ndarray] = None) -> List[str]:
+        """Prompt segments for the chunks that best cover hits within `budget` tokens
+
+        segment(number, hit, text) formats a chunk; its tokens (header
+        included) are what counts against the budget. vectors, if given,
+        are unit-length embeddings of the hits, row for row.
+        """
+        budget = min(budget, self.token_budget)
+        n = len(hits)
+        if n == 0 or budget <= 0:
+            return []
+        shingles = [_shingles(hit["document"]) for hit in hits]
+        similarity = self._similarities(shingles, vectors if vectors is not None and len(vectors) == n else None)
+        relevance = 1.0 - np.arange(n) / n
+
+        packed, segments = [], []
+        used = duplicates = trimmed = over_budget = 0
+        remaining = list(range(n))
+        while remaining and len(segments) < self.max_chunks:
+            picked = [entry["index"] for entry in packed]
+            redundancy = similarity[np.ix_(remaining, picked)].max(axis=1) if picked else np.zeros(len(remaining))
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            index = remaining.pop(int(np.argmax(scores)))
+
+            hit = hits[index]
+            source = hit["metadata"].get("file_path")
+            text = self._dedupe(hit["document"], source, packed)
+            if text is None:
+                duplicates += 1
+                continue
+            if text != hit["document"]:
+                trimmed += 1
+            formatted = segment(len(segments) + 1, hit, text)
+            tokens = count_tokens(formatted)
+            if used + tokens > budget:
+                # A shorter chunk further down may still fit
+                over_budget += 1
+                continue
+            used += tokens
+            segments.append(formatted)
+            packed.append({"index": index, "source": source, "text": text, "shingles": _shingles(text)})
+
+        metrics.observe("context_tokens", used)
+        for outcome, count in [("packed", len(segments)), ("duplicate", duplicates), ("over_budget", over_budget)]:
+            if count:
+                metrics.inc("context_chunks_total", count, outcome=outcome)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["candidates"] += n
+            self.stats["packed"] += len(segments)
+            self.stats["duplicates"] += duplicates
+            self.stats["trimmed"] += trimmed
+            self.stats["over_budget"] += over_budget
+            self.stats["context_tokens"] += used
+        return segments
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.stats["requests"]
+            return {
+                "token_budget": self.token_budget,
+                "max_chunks": self.max_chunks,
+                "mmr_lambda": self.mmr_lambda,
+                "avg_context_tokens": round(self.stats["context_tokens"] / requests, 1) if requests else None,
+                "avg_chunks": round(self.stats["packed"] / requests, 2) if requests else None,
+                **{key: value for key, value in self.stats.items() if key != "context_tokens"},
+            }
@@ -0,0 +1,200 @@
+import numpy as np
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+
+def _encode(meta: Dict[str, Any]) -> bytes:
+    return json.dumps(meta, ensure_ascii=False, default=str).encode("utf-8")
+
+
+class BlobColumn:
+    """Append-only column of variable-length byte records backed by mmap
+
+    Records live back to back in <name>.bin; <name>.idx holds the int64 end
+    offset of each record. Reads slice the memory-mapped files, so nothing
+    is deserialized up front and resident memory stays flat as the column grows.
+    """
+
+    def __init__(self, path: str):
+        self.data_file = path + ".bin"
+        self.index_file = path + ".idx"
+        for file in [self.data_file, self.index_file]:
+            if not os.path.exists(file):
+                open(file, "wb").close()
+        self._data = None
+        self._ends = np.zeros(0, dtype=np.int64)
+        self._lock = threading.Lock()
+        self._recover()
+        self._remap()
+
+    def _recover(self):
+        """Drop bytes written after the last complete record (interrupted append)"""
+        index_size = os.path.getsize(self.index_file)
+        if index_size % 8:
+            with open(self.index_file, "r+b") as f:
+                f.truncate(index_size - index_size % 8)
+        ends = np.fromfile(self.index_file, dtype=np.int64)
+        data_size = int(ends[-1]) if len(ends) else 0
+        if os.path.getsize(self.data_file) > data_size:
+            with open(self.data_file, "r+b") as f:
+                f.truncate(data_size)
+
+    def _close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        self._ends = np.zeros(0, dtype=np.int64)
+
+    def _remap(self):
+        self._close()
+        if os.path.getsize(self.data_file) > 0:
+            with open(self.data_file, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if os.path.getsize(self.index_file) > 0:
+            self._ends = np.memmap(self.index_file, dtype=np.int64, mode="r")
+        else:
+            self._ends = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def append(self, records: List[bytes]) -> int:
+        """Append records durably; returns the position of the first one"""
+        with self._lock:
+            first = len(self._ends)
+            start = int(self._ends[-1]) if first else 0
+            ends = start + np.cumsum([len(r) for r in records], dtype=np.int64)
+
+            # Data before offsets: a crash in between leaves only unreferenced bytes
+            with open(self.data_file, "ab") as f:
+                f.write(b"".join(records))
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.index_file, "ab") as f:
+                f.write(ends.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._remap()
+            return first
+
+    def get(self, position: int) -> bytes:
+        with self._lock:
+            end = int(self._ends[position])
+            start = int(self._ends[position - 1]) if position > 0 else 0
+            return self._data[start:end] if end > start else b""
+
+    def truncate(self, length: int):
+        """Discard every record from position `length` onwards"""
+        with self._lock:
+            if length >= len(self._ends):
+                return
+            data_size = int(self._ends[length - 1]) if length > 0 else 0
+            self._close()
+            with open(self.index_file, "r+b") as f:
+                f.truncate(length * 8)
+            with open(self.data_file, "r+b") as f:
+                f.truncate(data_size)
+            self._remap()
+
+    def size_bytes(self) -> int:
+        return os.path.getsize(self.data_file) + os.path.getsize(self.index_file)
+
+
+class DocStore:
+    """On-disk chunk text and metadata for the vector store
+
+    Chunk text and per-chunk metadata are stored as mmap-backed columns.
+    Metadata shared by every chunk of a file (page contents, audio
+    timestamps, ...) is interned once per file and merged back on read.
+    """
+
+    def __init__(self, path: str, file_cache_size: int = 256):
+        os.makedirs(path, exist_ok=True)
+        self.texts = BlobColumn(os.path.join(path, "texts"))
+        self.chunk_meta = BlobColumn(os.path.join(path, "chunk_meta"))
+        self.file_meta = BlobColumn(os.path.join(path, "file_meta"))
+        self._file_cache = OrderedDict()
+        self._file_cache_size = file_cache_size
+
+        # Texts are written first; realign the columns after an interrupted append
+        self.truncate(min(len(self.texts), len(self.chunk_meta)))
+
+    def __len__(self) -> int:
+        return len(self.chunk_meta)
+
+    def append(self, documents: List[str], metadata: List[Dict[str, Any]],
+               file_metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Append chunks (and their shared file metadata); returns the first position"""
+        chunk_meta = [dict(m) for m in metadata]
+        if file_metadata is not None:
+            file_id = self.file_meta.append([_encode(file_metadata)])
+            for meta in chunk_meta:
+                meta["_file"] = file_id
+
+        self.texts.append([doc.encode("utf-8") for doc in documents])
+        return self.chunk_meta.append([_encode(meta) for meta in chunk_meta])
+
+    def get_document(self, position: int) -> str:
+        return self.texts.get(position).decode("utf-8")
+
+    def get_metadata(self, position: int) -> Dict[str, Any]:
+        chunk_meta, file_meta = self.get_parts(position)
+        return {**file_meta, **chunk_meta}
+
+    def get_parts(self, position: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """(own metadata, shared file metadata) of a chunk, as they were appended"""
+        meta = json.loads(self.chunk_meta.get(position))
+        file_id = meta.pop("_file", None)
+        return meta, (dict(self._get_file_metadata(file_id)) if file_id is not None else {})
+
+    def _get_file_metadata(self, file_id: int) -> Dict[str, Any]:
+        if file_id in self._file_cache:
+            self._file_cache.move_to_end(file_id)
+            return self._file_cache[file_id]
+        meta = json.loads(self.file_meta.get(file_id))
+        self._file_cache[file_id] = meta
+        if len(self._file_cache) > self._file_cache_size:
+            self._file_cache.popitem(last=False)
+        return meta
+
+    def compact_into(self, path: str, positions: np.ndarray, batch_size: int = 4096):
+        """Write the chunks at positions, in order, as a new store at path numbered from 0
+
+        File metadata still referenced by those chunks is carried over once
+        per file; records of deleted chunks are left behind.
+        """
+        target = DocStore(path)
+        file_ids = {}
+        for start in range(0, len(positions), batch_size):
+            texts, metas = [], []
+            for position in positions[start:start + batch_size]:
+                texts.append(self.texts.get(int(position)))
+                meta = json.loads(self.chunk_meta.get(int(position)))
+                file_id = meta.get("_file")
+                if file_id is not None:
+                    if file_id not in file_ids:
+                        file_ids[file_id] = target.file_meta.append([self.file_meta.get(file_id)])
+                    meta["_file"] = file_ids[file_id]
+                metas.append(_encode(meta))
+            target.texts.append(texts)
+            target.chunk_meta.append(metas)
+        target.close()
+
+    def truncate(self, length: int):
+        """Drop chunks beyond `length` (e.g. ones never committed to the index)"""
+        self.texts.truncate(length)
+        self.chunk_meta.truncate(length)
+
+    def close(self):
+        """Release the memory maps (before the files are deleted)"""
+        for column in [self.texts, self.chunk_meta, self.file_meta]:
+            with column._lock:
+                column._close()
+        self._file_cache.clear()
+
+    def size_bytes(self) -> int:
+        return self.texts.size_bytes() + self.chunk_meta.size_bytes() + self.file_meta.size_bytes()
@@ -0,0 +1,173 @@
+import faiss
+import numpy as np
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+INDEX_TYPES = ["flat", "ivf_flat", "ivf_pq", "hnsw"]
+
+
+def build_index(index_type: str, dimension: int, ntotal: int,
+                nlist: int = 1024, pq_m: int = 48, hnsw_m: int = 32):
+    """Create an empty FAISS index of the configured type, sized for ntotal vectors"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected one of {INDEX_TYPES})")
+
+    # IVF needs ~39 training points per list; shrink nlist for small corpora
+    nlist = max(1, min(nlist, ntotal // 39))
+    factory = {
+        "flat": "Flat",
+        "ivf_flat": f"IVF{nlist},Flat",
+        "ivf_pq": f"IVF{nlist},PQ{pq_m}",
+        "hnsw": f"HNSW{hnsw_m}",
+    }[index_type]
+    return with_ids(faiss.index_factory(dimension, factory, faiss.METRIC_L2))
+
+
+def with_ids(index):
+    """Make an index address vectors by explicit int64 ids (vector store positions)
+
+    IVF indexes store ids natively and get a hashtable direct map, so vectors
+    can be reconstructed and removed by id. Flat and HNSW indexes are wrapped
+    in an IndexIDMap2. Vectors of an older index built without ids are re-added
+    under ids 0..ntotal-1, their positions at the time.
+    """
+    if isinstance(faiss.downcast_index(index), faiss.IndexIDMap2):
+        return index
+    if get_index_type(index).startswith("ivf"):
+        ivf = faiss.extract_index_ivf(index)
+        if ivf.direct_map.type != faiss.DirectMap.Hashtable:
+            ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index
+
+    vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else None
+    inner = faiss.clone_index(index)
+    inner.reset()
+    wrapped = faiss.IndexIDMap2(inner)
+    if vectors is not None:
+        wrapped.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+    return wrapped
+
+
+def index_contents(index, start: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """(ids, vectors) stored in an IndexIDMap2 index, from its start-th vector on"""
+    index = faiss.downcast_index(index)
+    ids = faiss.vector_to_array(index.id_map)[start:]
+    return ids, index.index.reconstruct_n(start, len(ids))
+
+
+def remove_ids(index, ids: np.ndarray) -> int:
+    """Remove vectors by id; returns how many were removed"""
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    if get_index_type(index).startswith("ivf"):
+        # The IVF hashtable direct map only supports removal by explicit id list
+        selector = faiss.IDSelectorArray(len(ids), faiss.swig_ptr(ids))
+    else:
+        selector = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+    return index.remove_ids(selector)
+
+
+def renumber_ids(index, remap: np.ndarray):
+    """Replace every stored id with remap[id] in place; vectors and codes are untouched"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        ids = remap[faiss.vector_to_array(index.id_map)].astype(np.int64)
+        faiss.copy_array_to_vector(ids, index.id_map)
+        index.construct_rev_map()
+        return
+
+    ivf = faiss.extract_index_ivf(index)
+    invlists = ivf.invlists
+    for list_no in range(ivf.nlist):
+        size = invlists.list_size(list_no)
+        if size == 0:
+            continue
+        ids = remap[faiss.rev_swig_ptr(invlists.get_ids(list_no), size)].astype(np.int64)
+        codes = faiss.rev_swig_ptr(invlists.get_codes(list_no), size * invlists.code_size).copy()
+        invlists.update_entries(list_no, 0, size, faiss.swig_ptr(ids), faiss.swig_ptr(codes))
+    # Rebuild the id -> (list, offset) hashtable for the new ids
+    ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+    ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+
+def get_index_type(index) -> str:
+    """Return which of INDEX_TYPES an index instance is"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                  sel=None):
+    """Per-query FAISS search parameters for IVF (nprobe) or HNSW (efSearch) indexes
+
+    sel is an optional faiss.IDSelector restricting the search to some ids.
+    """
+    index_type = get_index_type(index)
+    if index_type in ("ivf_flat", "ivf_pq") and (nprobe or sel is not None):
+        params = faiss.SearchParametersIVF(sel=sel) if sel is not None else faiss.SearchParametersIVF()
+        if nprobe:
+            params.nprobe = nprobe
+        return params
+    if index_type == "hnsw" and (ef_search or sel is not None):
+        params = faiss.SearchParametersHNSW(sel=sel) if sel is not None else faiss.SearchParametersHNSW()
+        if ef_search:
+            params.efSearch = ef_search
+        return params
+    if sel is not None:
+        return faiss.SearchParameters(sel=sel)
+    return None
+
+
+def recall_vs_latency(vectors: np.ndarray, ann_index, k: int = 10,
+                      num_queries: int = 100, sweep: Optional[List[int]] = None,
+                      ids: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Compare an ANN index against an exact flat search over the same vectors
+
+    Sampled stored vectors are used as queries. For each nprobe/efSearch value
+    in the sweep, reports recall@k and mean per-query latency next to the
+    flat baseline. ids are the ANN index ids of vectors (default: their rows).
+    """
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)]
+    k = min(k, len(vectors))
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    start_time = time.time()
+    _, truth = flat.search(queries, k)
+    if ids is not None:
+        truth = ids[truth]
+    flat_ms = (time.time() - start_time) * 1000 / len(queries)
+
+    index_type = get_index_type(ann_index)
+    if sweep is None:
+        sweep = [1, 4, 16, 64] if index_type.startswith("ivf") else [16, 32, 64, 128]
+
+    results = []
+    for value in sweep:
+        params = search_params(ann_index, nprobe=value, ef_search=value)
+        start_time = time.time()
+        _, found = ann_index.search(queries, k, params=params)
+        ann_ms = (time.time() - start_time) * 1000 / len(queries)
+        hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+        results.append({
+            "nprobe" if index_type.startswith("ivf") else "ef_search": value,
+            "recall_at_k": round(hits / (len(queries) * k), 4),
+            "latency_ms": round(ann_ms, 3),
+        })
+
+    return {
+        "index_type": index_type,
+        "vectors": len(vectors),
+        "queries": len(queries),
+        "k": k,
+        "flat_latency_ms": round(flat_ms, 3),
+        "sweep": results,
+    }
@@ -0,0 +1,48 @@
+from typing import Any, Callable, Dict, List
+import time
+
+from .inference_backends import Prompt
+from .micro_batcher import MicroBatcher
+
+
+class GenerationScheduler(MicroBatcher):
+    """Dynamic batching of concurrent LLM generations
+
+    Prompts submitted within max_wait_ms of each other (up to max_batch_size)
+    are left-padded into one batch and run through a single generate() call,
+    so concurrent queries share the CPU model instead of serializing on it.
+    A prompt that ends up alone in its batch is generated on its own, so it
+    can reuse cached prefix KV state.
+    """
+
+    def __init__(self, load_llm: Callable[[], Any],
+                 generation_kwargs: Callable[[], Dict[str, Any]],
+                 max_batch_size: int = 8, max_wait_ms: float = 20):
+        super().__init__(self._generate_batch, max_batch_size=max_batch_size,
+                         max_wait_ms=max_wait_ms, name="generation-scheduler")
+        self.load_llm = load_llm
+        self.generation_kwargs = generation_kwargs
+        self.stats["generate_seconds"] = 0.0
+
+    def generate(self, prompt: Prompt) -> str:
+        """Queue a prompt and block until its completion is ready"""
+        return self(prompt)
+
+    def _generate_batch(self, prompts: List[Prompt]) -> List[str]:
+        # Backends without batching (llama.cpp) run the prompts one after another
+        generator = self.load_llm()
+        start_time = time.time()
+        if len(prompts) == 1:
+            answers = [generator.generate(prompts[0], self.generation_kwargs())]
+        else:
+            answers = generator.generate_batch(prompts, self.generation_kwargs())
+        with self._stats_lock:
+            self.stats["generate_seconds"] += time.time() - start_time
+        return answers
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **super().get_stats(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
@@ -0,0 +1,318 @@
+import json
+import os
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Optional, Union
+
+import numpy as np
+
+from .metrics import metrics
+from .prefix_cache import PrefixKVCache, to_legacy, from_legacy
+
+LLM_BACKENDS = ["torch", "int8", "onnx", "gguf"]
+EMBEDDING_BACKENDS = ["torch", "int8", "onnx"]
+
+# A prompt is either plain text or a list of segments (constant prefix first) joined in order
+Prompt = Union[str, List[str]]
+
+
+def prompt_text(prompt: Prompt) -> str:
+    return prompt if isinstance(prompt, str) else "".join(prompt)
+
+
+def _record_generation(prompt_tokens: int, generated_tokens: int, seconds: float):
+    """Token counters and decoding speed of one generate call"""
+    metrics.inc("prompt_tokens_total", prompt_tokens)
+    metrics.inc("generated_tokens_total", generated_tokens)
+    if generated_tokens and seconds > 0:
+        metrics.observe("generation_tokens_per_second", generated_tokens / seconds)
+
+
+class HFGenerator:
+    """Text generation through a Hugging Face causal LM
+
+    Covers the PyTorch fp32 and dynamically quantized int8 models and ONNX
+    Runtime models from optimum, which all implement generate().
+
+    Segmented prompts are tokenized segment by segment; when over-long, the
+    context before the last segment (the question) is trimmed. With a
+    prefix_cache (PyTorch models only), the KV state of the longest cached
+    prompt prefix is reused and only the rest of the prompt is prefilled.
+    """
+
+    supports_batching = True
+
+    def __init__(self, tokenizer, model, max_length: int = 2048,
+                 prefix_cache: Optional[PrefixKVCache] = None):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_length = max_length
+        self.prefix_cache = prefix_cache
+
+    def _kwargs(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {**params, "pad_token_id": self.tokenizer.eos_token_id}
+
+    def generate_batch(self, prompts: List[Prompt], params: Dict[str, Any]) -> List[str]:
+        """Generate completions for several prompts in one padded batch"""
+        # Decoder-only models need left padding so every row ends at the prompt
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        with metrics.stage("tokenize"):
+            if all(isinstance(prompt, str) for prompt in prompts):
+                inputs = self.tokenizer(prompts, return_tensors="pt", padding=True,
+                                        max_length=self.max_length, truncation=True)
+            else:
+                # Segmented prompts are trimmed before their question, never through it
+                ids = [self.tokenizer(prompt, max_length=self.max_length, truncation=True)["input_ids"]
+                       if isinstance(prompt, str) else self._prompt_ids(prompt).tolist()
+                       for prompt in prompts]
+                inputs = self.tokenizer.pad({"input_ids": ids}, padding=True, return_tensors="pt")
+        start_time = time.perf_counter()
+        with metrics.stage("llm_generate"):
+            outputs = self.model.generate(**inputs, **self._kwargs(params))
+        prompt_length = inputs["input_ids"].shape[1]
+        # Padding uses the EOS token, so this counts the tokens before each row stopped
+        generated = int((outputs[:, prompt_length:] != self.tokenizer.pad_token_id).sum())
+        _record_generation(int(inputs["attention_mask"].sum()), generated, time.perf_counter() - start_time)
+        with metrics.stage("decode"):
+            return [
+                self.tokenizer.decode(output[prompt_length:], skip_special_tokens=True).strip()
+                for output in outputs
+            ]
+
+    def _segment_ids(self, segment: str, first: bool) -> List[int]:
+        def tokenize():
+            return self.tokenizer(segment, add_special_tokens=first)["input_ids"]
+
+        if self.prefix_cache is None:
+            return tokenize()
+        return self.prefix_cache.tokens((segment, first), tokenize)
+
+    def _prompt_ids(self, segments: List[str]) -> np.ndarray:
+        ids = [token for i, segment in enumerate(segments) for token in self._segment_ids(segment, i == 0)]
+        if len(ids) > self.max_length:
+            # Keep the question whole and trim the end of the context before it
+            tail = self._segment_ids(segments[-1], len(segments) == 1)
+            ids = ids[:max(self.max_length - len(tail), 0)] + tail
+        return np.array(ids, dtype=np.int64)
+
+    def _inputs(self, prompt: Prompt) -> Dict[str, Any]:
+        """generate() inputs for one prompt, starting from cached prefix KV where possible"""
+        if isinstance(prompt, str):
+            with metrics.stage("tokenize"):
+                return dict(self.tokenizer(prompt, return_tensors="pt", max_length=self.max_length,
+                                           truncation=True))
+        import torch
+
+        with metrics.stage("tokenize"):
+            ids = self._prompt_ids(prompt)
+        past = None
+        if self.prefix_cache is not None and len(ids) > 1:
+            # The cache covers all but the last prompt token, which generate() feeds itself
+            reused, past = self.prefix_cache.lookup(ids[:-1])
+            start_time = time.perf_counter()
+            if reused < len(ids) - 1:
+                with metrics.stage("prefill"), torch.no_grad():
+                    output = self.model(input_ids=torch.from_numpy(ids[reused:-1])[None],
+                                        past_key_values=from_legacy(past) if past is not None else None,
+                                        use_cache=True)
+                past = to_legacy(output.past_key_values)
+                self.prefix_cache.store(ids[:-1], past)
+            self.prefix_cache.record(reused, len(ids) - 1 - reused, time.perf_counter() - start_time)
+
+        input_ids = torch.from_numpy(ids)[None]
+        inputs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+        if past is not None:
+            inputs["past_key_values"] = from_legacy(past)
+        return inputs
+
+    def generate(self, prompt: Prompt, params: Dict[str, Any]) -> str:
+        if isinstance(prompt, str):
+            return self.generate_batch([prompt], params)[0]
+        inputs = self._inputs(prompt)
+        start_time = time.perf_counter()
+        with metrics.stage("llm_generate"):
+            outputs = self.model.generate(**inputs, **self._kwargs(params))
+        prompt_length = inputs["input_ids"].shape[1]
+        output = outputs[0][prompt_length:]
+        _record_generation(prompt_length, int((output != self.tokenizer.eos_token_id).sum()),
+                           time.perf_counter() - start_time)
+        with metrics.stage("decode"):
+            return self.tokenizer.decode(output, skip_special_tokens=True).strip()
+
+    def stream(self, prompt: Prompt, params: Dict[str, Any]) -> Iterator[str]:
+        """Yield text pieces as the model produces them"""
+        import transformers
+
+        inputs = self._inputs(prompt)
+        streamer = transformers.TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        # generate() blocks, so run it in a thread and drain the streamer here
+        thread = threading.Thread(
+            target=self.model.generate,
+            kwargs={**inputs, **self._kwargs(params), "streamer": streamer},
+            daemon=True
+        )
+        start_time = time.perf_counter()
+        thread.start()
+        pieces = []
+        try:
+            for text in streamer:
+                if text:
+                    pieces.append(text)
+                    yield text
+        finally:
+            thread.join()
+            _record_generation(int(inputs["attention_mask"].sum()), self.count_tokens("".join(pieces)),
+                               time.perf_counter() - start_time)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+
+class LlamaCppGenerator:
+    """Text generation through llama.cpp on a GGUF model
+
+    A llama.cpp context runs one sequence at a time, so batches are
+    generated one prompt after another under a lock. llama.cpp reuses the
+    KV state of the prefix shared with the previous prompt by itself; a RAM
+    cache (see load_generator) extends that to earlier prompts.
+    """
+
+    supports_batching = False
+
+    def __init__(self, llm, max_length: int = 2048):
+        self.llm = llm
+        self.max_length = max_length
+        self._lock = threading.Lock()
+
+    def _complete(self, prompt: Prompt, params: Dict[str, Any], stream: bool = False):
+        """(prompt tokens, llama.cpp completion or chunk iterator)"""
+        max_new_tokens = params.get("max_new_tokens", 200)
+        limit = max(1, min(self.max_length, self.llm.n_ctx()) - max_new_tokens)
+        # Over-long prompts keep their start; segmented ones also keep their last segment (the question)
+        segmented = not isinstance(prompt, str) and len(prompt) > 1
+        head = "".join(prompt[:-1]) if segmented else prompt_text(prompt)
+        tail = prompt[-1] if segmented else ""
+        tokens = self.llm.tokenize(head.encode("utf-8"))
+        tail_tokens = len(self.llm.tokenize(tail.encode("utf-8"), add_bos=False)) if tail else 0
+        prompt = head + tail
+        if len(tokens) + tail_tokens > limit:
+            kept = tokens[:max(limit - tail_tokens, 1)]
+            prompt = self.llm.detokenize(kept).decode("utf-8", errors="ignore") + tail
+        return min(len(tokens) + tail_tokens, limit), self.llm.create_completion(
+            prompt,
+            max_tokens=max_new_tokens,
+            temperature=params.get("temperature", 0.7) if params.get("do_sample", True) else 0.0,
+            top_p=params.get("top_p", 1.0),
+            repeat_penalty=params.get("repetition_penalty", 1.0),
+            stream=stream
+        )
+
+    def generate(self, prompt: Prompt, params: Dict[str, Any]) -> str:
+        with self._lock:
+            start_time = time.perf_counter()
+            with metrics.stage("llm_generate"):
+                prompt_tokens, completion = self._complete(prompt, params)
+            generated = completion.get("usage", {}).get("completion_tokens", 0)
+            _record_generation(prompt_tokens, generated, time.perf_counter() - start_time)
+            return completion["choices"][0]["text"].strip()
+
+    def generate_batch(self, prompts: List[Prompt], params: Dict[str, Any]) -> List[str]:
+        return [self.generate(prompt, params) for prompt in prompts]
+
+    def stream(self, prompt: Prompt, params: Dict[str, Any]) -> Iterator[str]:
+        with self._lock:
+            start_time = time.perf_counter()
+            prompt_tokens, chunks = self._complete(prompt, params, stream=True)
+            generated = 0
+            try:
+                # llama.cpp streams one chunk per generated token
+                for chunk in chunks:
+                    generated += 1
+                    text = chunk["choices"][0]["text"]
+                    if text:
+                        yield text
+            finally:
+                _record_generation(prompt_tokens, generated, time.perf_counter() - start_time)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+
+def load_generator(backend: str, model_name: str, model_path: Optional[str] = None,
+                   max_length: int = 2048, prefix_cache: Optional[PrefixKVCache] = None):
+    """Generator for the configured LLM backend
+
+    torch, int8 and onnx load the Hugging Face model `model_name`; gguf
+    loads the llama.cpp model file at `model_path`. prefix_cache enables
+    prompt-prefix KV reuse on the PyTorch backends; for gguf its byte budget
+    sizes a llama.cpp RAM cache instead. ONNX Runtime models are not cached.
+    """
+    from .model_registry import get_llm, get_gguf_model
+
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {backend} (expected one of {LLM_BACKENDS})")
+    if backend == "gguf":
+        if not model_path or not os.path.exists(model_path):
+            raise FileNotFoundError(f"GGUF model not found: {model_path}")
+        llm = get_gguf_model(model_path, n_ctx=max_length)
+        if prefix_cache is not None and getattr(llm, "cache", None) is None:
+            from llama_cpp import LlamaRAMCache
+            llm.set_cache(LlamaRAMCache(capacity_bytes=prefix_cache.max_bytes))
+        return LlamaCppGenerator(llm, max_length=max_length)
+    tokenizer, model = get_llm(model_name, backend=backend)
+    return HFGenerator(tokenizer, model, max_length=max_length,
+                       prefix_cache=prefix_cache if backend in ("torch", "int8") else None)
+
+
+class OnnxEmbedder:
+    """Sentence embeddings from an ONNX Runtime export of a SentenceTransformer model
+
+    Mirrors the SentenceTransformer pipeline (mean pooling, optional
+    normalization, max_seq_length truncation) and exposes the parts of its
+    API the vector store uses: encode() and tokenizer.
+    """
+
+    def __init__(self, model_name: str):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        repo = model_name if "/" in model_name or os.path.isdir(model_name) \
+            else f"sentence-transformers/{model_name}"
+        self.tokenizer = AutoTokenizer.from_pretrained(repo)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(repo, export=True)
+        modules = _st_config(repo, "modules.json") or []
+        self.normalize = any(m.get("type", "").endswith("Normalize") for m in modules)
+        self.max_seq_length = (_st_config(repo, "sentence_bert_config.json") or {}).get(
+            "max_seq_length", min(self.tokenizer.model_max_length, 512))
+
+    def encode(self, sentences: List[str], batch_size: int = 32,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        embeddings = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors="np")
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.normalize:
+                pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            embeddings.append(pooled.astype(np.float32))
+        return np.concatenate(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+
+
+def _st_config(repo: str, filename: str) -> Optional[Any]:
+    """A SentenceTransformer config file from a local directory or the Hub, if present"""
+    try:
+        if os.path.isdir(repo):
+            path = os.path.join(repo, filename)
+        else:
+            from huggingface_hub import hf_hub_download
+            path = hf_hub_download(repo, filename)
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
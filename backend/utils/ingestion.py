@@ -0,0 +1,420 @@
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+import numpy as np
+from datetime import datetime
+from .content_index import ContentIndex, hash_file, hash_chunk
+from .chunker import Chunker
+from .metrics import metrics
+
+
+class IngestionPipeline:
+    """Extract -> chunk -> embed -> index for one file, with content-hash deduplication
+
+    Unchanged re-uploads are skipped after hashing the file bytes, and a
+    changed file only adds its new chunks and tombstones the ones that
+    disappeared. Every file owns its own rows, so sources and filters always
+    see the right file; chunks identical to ones stored for other files
+    reuse their embeddings instead of being re-embedded, and a byte-identical
+    copy under a new name copies the original's rows without extraction.
+    Agents that can stream pages (PDFAgent.iter_pages) or transcript
+    segments (AudioAgent.iter_segments) are chunked and embedded batch by
+    batch while extraction continues, so memory stays bounded for very
+    large files.
+    """
+
+    def __init__(self, orchestrator, vector_store, content_index: ContentIndex,
+                 chunker: Optional[Chunker] = None, batch_size: int = 64):
+        self.orchestrator = orchestrator
+        self.chunker = chunker or Chunker()
+        # Chunks embedded per batch when a file is ingested as a page stream
+        self.batch_size = batch_size
+        self.vector_store = vector_store
+        self.content_index = content_index
+        # Purges renumber the positions the content index records
+        vector_store.track_positions(content_index)
+
+    def ingest(self, file_path: str, filename: str,
+               progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """Ingest a saved file; progress(stage) is called after each pipeline stage
+
+        Streamed files also report progress(stage, details) after every
+        batch they index, with the chunk counts so far.
+        """
+        progress = progress or (lambda stage, details=None: None)
+        with metrics.stage("hash", metric="ingest_stage_seconds"):
+            file_hash = hash_file(file_path)
+        # The positions read from the content index must survive until the commit
+        with self.vector_store.hold_positions():
+            existing = self.content_index.get_file(filename)
+
+            shortcut = self._shortcut(filename, file_hash, existing)
+            if shortcut is not None:
+                for stage in ["extracted", "chunked", "embedded", "indexed"]:
+                    progress(stage)
+                return shortcut
+
+            agent = self.orchestrator.get_agent(file_path)
+            with metrics.stage("total", metric="ingest_stage_seconds", type=agent.file_type):
+                if hasattr(agent, "iter_pages") or hasattr(agent, "iter_segments"):
+                    return self._ingest_stream(agent, file_path, filename, file_hash, existing, progress)
+                return self._ingest_whole(file_path, filename, file_hash, existing, progress)
+
+    def _ingest_whole(self, file_path: str, filename: str, file_hash: str,
+                      existing: Optional[Dict[str, Any]],
+                      progress: Callable[..., None]) -> Dict[str, Any]:
+        """Extract the whole file, then chunk, embed and index it"""
+        # Process file with appropriate agent
+        result = self.orchestrator.process_file(file_path)
+        progress("extracted")
+        with metrics.stage("chunk", metric="ingest_stage_seconds", type=result["type"]):
+            chunks, chunk_metadata = self._chunk_result(result)
+        progress("chunked")
+
+        # File-level metadata is stored once and shared by every chunk
+        file_metadata = {
+            "file_path": filename,
+            "type": result["type"],
+            "timestamp": datetime.now().isoformat(),
+            **result.get("metadata", {})
+        }
+
+        stored = {}
+        added = []
+        try:
+            created = self._store_chunks(chunks, chunk_metadata, file_metadata, stored, added,
+                                         reuse=self._previous_chunks(existing))
+            progress("embedded")
+            self._commit(filename, file_hash, result["type"], stored)
+        except BaseException:
+            self._discard(added)
+            raise
+        progress("indexed")
+
+        return self._result(filename, result["type"], created, len(stored),
+                            "updated" if existing is not None else "created")
+
+    def prepare(self, file_path: str, filename: str) -> Dict[str, Any]:
+        """Extract and chunk a file without embedding it, for ingest_many()
+
+        Unchanged and duplicate files are settled immediately; their entry
+        carries the final "result" and no chunks.
+        """
+        file_hash = hash_file(file_path)
+        existing = self.content_index.get_file(filename)
+        shortcut = self._shortcut(filename, file_hash, existing)
+        if shortcut is not None:
+            return {"filename": filename, "result": shortcut}
+
+        agent = self.orchestrator.get_agent(file_path)
+        file_metadata = {"file_path": filename, "type": agent.file_type,
+                         "timestamp": datetime.now().isoformat()}
+        if hasattr(agent, "iter_pages") or hasattr(agent, "iter_segments"):
+            chunk_list = list(self._stream_chunks(agent, file_path))
+            chunks = [chunk["text"] for chunk in chunk_list]
+            chunk_metadata = [{"chunk_id": i, **chunk["metadata"]} for i, chunk in enumerate(chunk_list)]
+            if not chunks:
+                raise ValueError("No content extracted from file")
+        else:
+            result = self.orchestrator.process_file(file_path)
+            chunks, chunk_metadata = self._chunk_result(result)
+            file_metadata.update(result.get("metadata", {}))
+
+        return {
+            "filename": filename,
+            "file_hash": file_hash,
+            "type": agent.file_type,
+            "chunks": chunks,
+            "chunk_metadata": chunk_metadata,
+            "file_metadata": file_metadata,
+            "change": "updated" if existing is not None else "created",
+        }
+
+    def ingest_many(self, prepared: List[Dict[str, Any]], embed_batch_size: int = 256) -> List[Dict[str, Any]]:
+        """Embed and index a group of prepared files with one index commit
+
+        New chunks across the whole group are deduplicated, embedded in
+        large batches and appended to the vector store as a single segment;
+        the files are then committed to the content index together.
+        """
+        with self.vector_store.hold_positions():
+            return self._ingest_prepared(prepared, embed_batch_size)
+
+    def _ingest_prepared(self, prepared: List[Dict[str, Any]], embed_batch_size: int) -> List[Dict[str, Any]]:
+        pending = [entry for entry in prepared if "result" not in entry]
+        hashes = [[hash_chunk(chunk) for chunk in entry["chunks"]] for entry in pending]
+
+        # Rows each file must insert: chunks not repeated within it nor kept from its previous version
+        new, reuse = [], []
+        for entry, chunk_hashes in zip(pending, hashes):
+            kept = self._previous_chunks(self.content_index.get_file(entry["filename"]))
+            seen, indices = set(), []
+            for i, chunk_hash in enumerate(chunk_hashes):
+                if chunk_hash in seen or chunk_hash in kept:
+                    continue
+                seen.add(chunk_hash)
+                indices.append(i)
+            new.append(indices)
+            reuse.append(kept)
+
+        # Each distinct chunk is embedded once for the group, unless the index already holds its vector
+        texts = {}
+        for f, indices in enumerate(new):
+            for i in indices:
+                texts.setdefault(hashes[f][i], pending[f]["chunks"][i])
+        embedded = self._known_embeddings(list(texts))
+        missing = [chunk_hash for chunk_hash in texts if chunk_hash not in embedded]
+        if missing:
+            with metrics.stage("embed", metric="ingest_stage_seconds", type="batch"):
+                embeddings = self.vector_store.embed([texts[chunk_hash] for chunk_hash in missing],
+                                                     batch_size=embed_batch_size)
+            embedded.update(zip(missing, embeddings))
+
+        with self.content_index.lock:
+            batches = [(
+                [entry["chunks"][i] for i in indices],
+                [entry["chunk_metadata"][i] for i in indices],
+                entry["file_metadata"]
+            ) for entry, indices in zip(pending, new)]
+            vectors = [embedded[hashes[f][i]] for f, indices in enumerate(new) for i in indices]
+            positions = [[] for _ in pending]
+            if vectors:
+                with metrics.stage("index", metric="ingest_stage_seconds", type="batch"):
+                    positions = self.vector_store.add_many(batches, np.array(vectors, dtype='float32'))
+
+            for f, entry in enumerate(pending):
+                stored = {hashes[f][i]: position for i, position in zip(new[f], positions[f])}
+                for chunk_hash in hashes[f]:
+                    if chunk_hash not in stored:
+                        stored[chunk_hash] = reuse[f][chunk_hash]
+                self._commit(entry["filename"], entry["file_hash"], entry["type"], stored)
+                entry["result"] = self._result(entry["filename"], entry["type"], len(new[f]),
+                                               len(stored), entry["change"])
+
+        return [entry["result"] for entry in prepared]
+
+    def remove(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Delete a file's chunks from the index; returns None for unknown files"""
+        with self.vector_store.hold_positions(), self.content_index.lock:
+            record = self.content_index.get_file(filename)
+            if record is None:
+                return None
+            released = self.content_index.remove_file(filename)
+            self.vector_store.delete_positions(released)
+        return {
+            "filename": filename,
+            "type": record["type"],
+            "chunks_removed": len(released),
+            "chunks_shared": len(record["chunks"]) - len(released),
+        }
+
+    def reset(self):
+        """Delete every file, chunk and vector"""
+        with self.content_index.lock:
+            self.vector_store.reset()
+            self.content_index.reset()
+
+    def _shortcut(self, filename: str, file_hash: str,
+                  existing: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Result for files that need no processing: unchanged re-uploads and byte-identical copies"""
+        # Same name, same bytes: nothing to do
+        if existing is not None and existing["sha256"] == file_hash:
+            return self._result(filename, existing["type"], 0, len(existing["chunks"]), "unchanged")
+
+        # Same bytes under another name: copy its rows (text, metadata and vectors) under this name
+        with self.vector_store.hold_positions(), self.content_index.lock:
+            duplicate = self.content_index.find_by_hash(file_hash)
+            if duplicate is None:
+                return None
+            chunk_hashes = [chunk_hash for chunk_hash, _ in duplicate["chunks"]]
+            positions = [position for _, position in duplicate["chunks"]]
+            documents, chunk_metadata, file_metadata = self.vector_store.get_chunks(positions)
+            embeddings = self.vector_store.get_embeddings(positions)
+            if embeddings is None:
+                embeddings = self.vector_store.embed(documents)
+            file_metadata = {**file_metadata, "file_path": filename, "timestamp": datetime.now().isoformat()}
+            added = []
+            try:
+                added = self.vector_store.add_documents(documents, chunk_metadata, embeddings=embeddings,
+                                                        file_metadata=file_metadata)
+                self._commit(filename, file_hash, duplicate["type"], dict(zip(chunk_hashes, added)))
+            except BaseException:
+                self._discard(added)
+                raise
+        return self._result(filename, duplicate["type"], len(added), len(added), "duplicate")
+
+    def _chunk_result(self, result: Dict[str, Any]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Chunk the output of a non-streaming agent"""
+        # Extract content for embedding
+        content = result["content"]
+        if not content or not content.strip():
+            raise ValueError("No content extracted from file")
+
+        # Token-budgeted chunks along paragraph / audio segment / OCR block boundaries
+        segments = result.get("metadata", {}).get("timestamps")
+        if result["type"] == "audio" and segments:
+            chunk_list = self.chunker.chunk_segments(segments)
+        elif result.get("blocks"):
+            chunk_list = self.chunker.chunk_blocks(result["blocks"])
+        else:
+            chunk_list = self.chunker.chunk_text(content)
+        if not chunk_list:
+            chunk_list = [{"text": content.strip(), "metadata": {}}]
+        chunks = [chunk["text"] for chunk in chunk_list]
+        chunk_metadata = [{"chunk_id": i, **chunk["metadata"]} for i, chunk in enumerate(chunk_list)]
+        return chunks, chunk_metadata
+
+    def _stream_chunks(self, agent, file_path: str) -> Iterator[Dict[str, Any]]:
+        """Chunks of a streaming agent's output, produced as extraction proceeds"""
+        if hasattr(agent, "iter_pages"):
+            return (chunk for page in agent.iter_pages(file_path)
+                    for chunk in self.chunker.chunk_text(page["text"], {"page": page["page"]}))
+        return self.chunker.iter_segment_chunks(agent.iter_segments(file_path))
+
+    def _ingest_stream(self, agent, file_path: str, filename: str, file_hash: str,
+                       existing: Optional[Dict[str, Any]],
+                       progress: Callable[..., None]) -> Dict[str, Any]:
+        """Chunk, embed and index while the agent is still extracting the rest of the file"""
+        file_type = agent.file_type
+        file_metadata = {
+            "file_path": filename,
+            "type": file_type,
+            "timestamp": datetime.now().isoformat()
+        }
+
+        stored = {}
+        added = []
+        reuse = self._previous_chunks(existing)
+        chunks, chunk_metadata = [], []
+        created = chunk_id = batches = 0
+
+        def store_batch():
+            nonlocal created, batches
+            created += self._store_chunks(chunks, chunk_metadata, file_metadata, stored, added, reuse)
+            batches += 1
+            details = {"chunks": chunk_id, "chunks_created": created, "batches": batches}
+            # Extraction and chunking are under way once the first batch is indexed
+            for stage in (["extracted", "chunked"] if batches == 1 else []) + ["embedded"]:
+                progress(stage, details)
+
+        try:
+            for chunk in self._stream_chunks(agent, file_path):
+                chunk_metadata.append({"chunk_id": chunk_id, **chunk["metadata"]})
+                chunks.append(chunk["text"])
+                chunk_id += 1
+                if len(chunks) >= self.batch_size:
+                    store_batch()
+                    chunks, chunk_metadata = [], []
+            if chunks:
+                store_batch()
+            agent.log(f"Streamed {chunk_id} chunks from {filename}")
+
+            if not stored:
+                raise ValueError("No content extracted from file")
+            self._commit(filename, file_hash, file_type, stored)
+        except BaseException:
+            # Batches already indexed belong to no file yet; don't leave them searchable
+            self._discard(added)
+            raise
+        progress("indexed")
+
+        return self._result(filename, file_type, created, len(stored),
+                            "updated" if existing is not None else "created")
+
+    def _store_chunks(self, chunks: List[str], chunk_metadata: List[Dict[str, Any]],
+                      file_metadata: Dict[str, Any], stored: Dict[str, int],
+                      added: Optional[List[int]] = None,
+                      reuse: Optional[Dict[str, int]] = None) -> int:
+        """Add the chunks this file has not stored yet; records hash -> position in `stored`
+
+        reuse maps the chunk hashes of the file's previous version to their
+        positions, which are kept. Other chunks get rows of their own, with
+        embeddings copied from identical chunks of other files where the
+        index can return them. Positions inserted here are appended to
+        `added`, so a failed ingest can discard them. Returns the number of
+        chunks inserted.
+        """
+        if not chunks:
+            return 0
+        chunk_hashes = [hash_chunk(chunk) for chunk in chunks]
+        reuse = reuse or {}
+
+        new = []
+        for i, chunk_hash in enumerate(chunk_hashes):
+            if chunk_hash in stored:
+                continue
+            if chunk_hash in reuse:
+                stored[chunk_hash] = reuse[chunk_hash]
+                continue
+            stored[chunk_hash] = None  # claimed by its first occurrence in the file
+            new.append(i)
+        if not new:
+            return 0
+
+        embedded = self._known_embeddings([chunk_hashes[i] for i in new])
+        missing = [i for i in new if chunk_hashes[i] not in embedded]
+        if missing:
+            with metrics.stage("embed", metric="ingest_stage_seconds", type=file_metadata["type"]):
+                embeddings = self.vector_store.embed([chunks[i] for i in missing])
+            embedded.update((chunk_hashes[i], embedding) for i, embedding in zip(missing, embeddings))
+
+        with self.content_index.lock:
+            with metrics.stage("index", metric="ingest_stage_seconds", type=file_metadata["type"]):
+                positions = self.vector_store.add_documents(
+                    [chunks[i] for i in new],
+                    [chunk_metadata[i] for i in new],
+                    embeddings=np.array([embedded[chunk_hashes[i]] for i in new], dtype='float32'),
+                    file_metadata=file_metadata
+                )
+        for i, position in zip(new, positions):
+            stored[chunk_hashes[i]] = position
+        if added is not None:
+            added.extend(positions)
+        return len(new)
+
+    def _known_embeddings(self, chunk_hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Stored embeddings of chunks some file already holds (empty if the index cannot return them)"""
+        with self.vector_store.hold_positions(), self.content_index.lock:
+            known = {}
+            for chunk_hash in chunk_hashes:
+                position = self.content_index.lookup_chunk(chunk_hash)
+                if position is not None:
+                    known[chunk_hash] = position
+            if not known:
+                return {}
+            vectors = self.vector_store.get_embeddings(list(known.values()))
+        if vectors is None:
+            return {}
+        metrics.inc("ingest_embeddings_reused_total", len(known))
+        return dict(zip(known, vectors))
+
+    @staticmethod
+    def _previous_chunks(existing: Optional[Dict[str, Any]]) -> Dict[str, int]:
+        """hash -> position of the chunks a file's indexed version holds"""
+        return {chunk_hash: position for chunk_hash, position in existing["chunks"]} if existing else {}
+
+    def _commit(self, filename: str, file_hash: str, file_type: str, stored: Dict[str, int]):
+        """Point the file at its chunks and tombstone chunks nothing references any more"""
+        with self.content_index.lock:
+            owned = [(chunk_hash, position) for chunk_hash, position in stored.items()
+                     if position is not None]
+            released = self.content_index.commit_file(filename, file_hash, file_type, owned)
+            self.vector_store.delete_positions(released)
+
+    def _discard(self, positions: List[int]):
+        """Tombstone positions inserted by an ingest that never committed"""
+        if not positions:
+            return
+        with self.content_index.lock:
+            self.vector_store.delete_positions(positions)
+
+    @staticmethod
+    def _result(filename: str, file_type: str, chunks_created: int,
+                total_chunks: int, change: str) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "filename": filename,
+            "type": file_type,
+            "chunks_created": chunks_created,
+            "total_chunks": total_chunks,
+            "change": change,
+            "message": f"✅ Successfully processed {filename} ({chunks_created} new of {total_chunks} chunks)"
+        }
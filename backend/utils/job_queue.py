@@ -0,0 +1,189 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+from datetime import datetime
+import threading
+import uuid
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept more jobs"""
+    pass
+
+
+class Job:
+    """A single ingestion job and its progress"""
+
+    STAGES = ["queued", "extracted", "chunked", "embedded", "indexed"]
+
+    def __init__(self, filename: str, modality: str,
+                 on_cancel: Optional[Callable[[], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.modality = modality
+        self.status = "queued"
+        self.stage = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # Free-form progress details (e.g. per-file counts for batch jobs)
+        self.details: Optional[Dict[str, Any]] = None
+        self.created_at = datetime.now().isoformat()
+        self.updated_at = self.created_at
+        self.done = threading.Event()
+        # Set by IngestionJobQueue.paused() for jobs that had not started yet
+        self.cancelled = False
+        # Called instead of the job's function when it is cancelled (e.g. to delete its upload)
+        self.on_cancel = on_cancel
+
+    def update(self, stage: str, details: Optional[Dict[str, Any]] = None):
+        """Advance the job to a pipeline stage"""
+        self.stage = stage
+        if details is not None:
+            self.details = details
+        self.updated_at = datetime.now().isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "type": self.modality,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.STAGES.index(self.stage) / (len(self.STAGES) - 1), 2),
+            "details": self.details,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class IngestionJobQueue:
+    """Bounded worker pool for ingestion jobs with per-modality concurrency limits"""
+
+    def __init__(self, max_workers: int = 4, max_queued: int = 100,
+                 modality_limits: Optional[Dict[str, int]] = None,
+                 max_finished: int = 1000):
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.modality_limits = modality_limits or {}
+        # Each limited modality gets its own pool so a backlog of slow audio
+        # jobs cannot occupy the workers that PDFs and images need
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._executors = {
+            modality: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"ingest-{modality}")
+            for modality, limit in self.modality_limits.items()
+        }
+        self._jobs: Dict[str, Job] = {}
+        self._finished = []
+        self._pending = 0
+        self._pending_by_type: Dict[str, int] = {}
+        self._running = 0
+        self._lock = threading.Lock()
+        # Signalled whenever a job finishes or a pause ends, for paused() and held jobs
+        self._idle = threading.Condition(self._lock)
+        self._paused = 0
+
+    def submit(self, filename: str, modality: str,
+               func: Callable[[Job], Dict[str, Any]],
+               on_cancel: Optional[Callable[[], None]] = None) -> Job:
+        """Queue func(job) for execution; raises QueueFullError when saturated
+
+        on_cancel() runs instead of func if paused() cancels the job before it starts.
+        """
+        with self._lock:
+            if self._paused:
+                raise QueueFullError("Ingestion is paused while the index is being reset")
+            if self._pending >= self.max_queued:
+                raise QueueFullError(f"Ingestion queue is full ({self.max_queued} pending jobs)")
+            job = Job(filename, modality, on_cancel=on_cancel)
+            self._jobs[job.id] = job
+            self._pending += 1
+            self._pending_by_type[modality] = self._pending_by_type.get(modality, 0) + 1
+
+        executor = self._executors.get(modality, self._executor)
+        executor.submit(self._run, job, func)
+        return job
+
+    def _run(self, job: Job, func: Callable[[Job], Dict[str, Any]]):
+        started = False
+        try:
+            with self._lock:
+                # Jobs do not start while paused: they run after it, or are cancelled
+                self._idle.wait_for(lambda: not self._paused or job.cancelled)
+                started = not job.cancelled
+                if started:
+                    job.status = "running"
+                    self._running += 1
+            if not started:
+                job.status = "cancelled"
+                job.error = "Cancelled before it started"
+                if job.on_cancel is not None:
+                    job.on_cancel()
+                return
+            job.result = func(job)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"[IngestionJobQueue] Job {job.id} ({job.filename}) failed: {e}")
+        finally:
+            job.updated_at = datetime.now().isoformat()
+            with self._lock:
+                if started:
+                    self._running -= 1
+                self._pending -= 1
+                self._pending_by_type[job.modality] -= 1
+                self._finished.append(job.id)
+                # Forget the oldest finished jobs so the table stays bounded
+                while len(self._finished) > self.max_finished:
+                    self._jobs.pop(self._finished.pop(0), None)
+                self._idle.notify_all()
+            job.done.set()
+
+    @contextmanager
+    def paused(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """Run the enclosed block with no ingestion job queued or running
+
+        New submissions are refused, queued jobs are held back and running
+        jobs are waited for. Once none is running, the queued jobs are
+        cancelled (running their on_cancel); if the running jobs do not
+        finish within timeout seconds, TimeoutError is raised and the queued
+        jobs run as if nothing happened. Submissions are accepted again on exit.
+        """
+        with self._lock:
+            self._paused += 1
+            drained = self._idle.wait_for(lambda: self._running == 0, timeout)
+            if drained:
+                for job in self._jobs.values():
+                    if job.status == "queued":
+                        job.cancelled = True
+                self._idle.notify_all()
+                # Cancelled jobs finish as soon as a worker picks them up
+                self._idle.wait_for(lambda: self._pending == 0)
+            running = self._running
+        try:
+            if not drained:
+                raise TimeoutError(f"{running} ingestion jobs still running after {timeout}s")
+            yield
+        finally:
+            with self._lock:
+                self._paused -= 1
+                self._idle.notify_all()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "paused": self._paused > 0,
+                "pending_by_type": dict(self._pending_by_type),
+                "max_queued": self.max_queued,
+                "tracked_jobs": len(self._jobs),
+            }
+
+    def shutdown(self, wait: bool = True):
+        for executor in [self._executor, *self._executors.values()]:
+            executor.shutdown(wait=wait)
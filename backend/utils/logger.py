@@ -1,19 +1,103 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+import atexit
 import json
 import os
+import queue
+import threading
+import time
+from collections import deque
 from datetime import datetime
 
 class QueryLogger:
-    """Logger for queries and responses"""
-    
-    def __init__(self, log_dir: str = "./logs"):
+    """Logger for queries and responses
+
+    Entries get increasing ids and are appended by a background writer in
+    batches (every flush_interval_ms), so log_query never touches the disk.
+    query_history.jsonl rotates to numbered files once it exceeds max_bytes
+    or max_age_seconds; only the newest max_files rotated files are kept.
+    history_state.json records each file's id range and running totals, so
+    counting queries reads no log lines and history pages are tail-read
+    from the newest file backwards.
+    """
+
+    STATE_FILE = "history_state.json"
+
+    def __init__(self, log_dir: str = "./logs", max_bytes: int = 50 * 1024 * 1024,
+                 max_age_seconds: float = 86400, max_files: int = 30,
+                 flush_interval_ms: float = 500, recent_size: int = 1000):
         self.log_dir = log_dir
         self.log_file = os.path.join(log_dir, "query_history.jsonl")
+        self.state_file = os.path.join(log_dir, self.STATE_FILE)
         os.makedirs(log_dir, exist_ok=True)
-    
-    def log_query(self, query: str, response: str, retrieved_docs: List[Dict[str, Any]], 
-                   processing_time: float):
-        """Log a query and its response"""
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_files = max_files
+        self.flush_interval = flush_interval_ms / 1000
+        # Newest entries (flushed or not) serve most /history requests from memory
+        self._recent = deque(maxlen=recent_size)
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._state = self._load_state()
+        self._next_id = self._state["next_id"]
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _load_state(self) -> Dict[str, Any]:
+        """Load the file index and totals, recovering entries written after the last state update"""
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state["files"]:
+                rotated = os.path.join(self.log_dir, state["files"][-1]["name"])
+                if not os.path.exists(rotated) and os.path.exists(self.log_file):
+                    # Crash between indexing a rotated file and moving it: finish the move
+                    os.replace(self.log_file, rotated)
+            # Crash between a batch append and its state update: the totals miss that batch
+            missed = []
+            for entry in self._entries_backwards(self.log_file):
+                if entry["id"] < state["next_id"]:
+                    break
+                missed.append(entry)
+            if missed:
+                state["total_queries"] += len(missed)
+                state["total_processing_time"] += sum(e.get("processing_time_seconds", 0) for e in missed)
+                state["next_id"] = missed[0]["id"] + 1
+            return state
+
+        state = {
+            "next_id": 0,
+            "total_queries": 0,
+            "total_processing_time": 0.0,
+            "files": [],
+            "active": {"first_id": 0, "created": time.time()},
+            "next_file": 1,
+        }
+        if os.path.exists(self.log_file):
+            # One-time upgrade of a log written before entries had ids
+            entries = []
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entries.append(json.loads(line))
+            for i, entry in enumerate(entries):
+                entry["id"] = i
+                state["total_processing_time"] += entry.get("processing_time_seconds", 0)
+            state["next_id"] = state["total_queries"] = len(entries)
+            self._atomic_write(self.log_file, "".join(
+                json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+        self._atomic_write(self.state_file, json.dumps(state))
+        return state
+
+    @staticmethod
+    def _atomic_write(path: str, text: str):
+        from .segment_store import atomic_write
+        atomic_write(path, lambda f: f.write(text), mode="w")
+
+    def log_query(self, query: str, response: str, retrieved_docs: List[Dict[str, Any]],
+                   processing_time: float, timings: Optional[Dict[str, Any]] = None):
+        """Log a query and its response (timings: optional per-stage/per-token timing)"""
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "question": query,  # Frontend expects 'question'
@@ -29,19 +113,177 @@ class QueryLogger:
                 for doc in retrieved_docs
             ]
         }
-        
-        with open(self.log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
-    
-    def get_history(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Retrieve query history"""
-        if not os.path.exists(self.log_file):
+        if timings:
+            log_entry["timings"] = timings
+
+        with self._lock:
+            log_entry["id"] = self._next_id
+            self._next_id += 1
+            self._recent.append(log_entry)
+            self._queue.put(log_entry)
+
+    def _run(self):
+        """Writer thread: append queued entries in batches"""
+        while True:
+            item = self._queue.get()
+            batch, waiters, stop = [], [], False
+            deadline = time.time() + self.flush_interval
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if waiters or stop:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.time(), 0))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    print(f"Warning: could not write query history: {e}")
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        with self._file_lock:
+            self._maybe_rotate()
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in batch)
+                f.flush()
+                os.fsync(f.fileno())
+
+            state = self._state
+            state["next_id"] = batch[-1]["id"] + 1
+            state["total_queries"] += len(batch)
+            state["total_processing_time"] += sum(e.get("processing_time_seconds", 0) for e in batch)
+            self._atomic_write(self.state_file, json.dumps(state))
+
+    def _maybe_rotate(self):
+        """Move the active file aside once it is too large or too old"""
+        if not os.path.exists(self.log_file) or os.path.getsize(self.log_file) == 0:
+            return
+        active = self._state["active"]
+        too_big = self.max_bytes > 0 and os.path.getsize(self.log_file) >= self.max_bytes
+        too_old = self.max_age_seconds > 0 and time.time() - active["created"] >= self.max_age_seconds
+        if not (too_big or too_old):
+            return
+
+        name = f"query_history.{self._state['next_file']:08d}.jsonl"
+        self._state["files"].append({
+            "name": name,
+            "first_id": active["first_id"],
+            "last_id": self._state["next_id"] - 1,
+            "created": active["created"],
+        })
+        self._state["next_file"] += 1
+        self._state["active"] = {"first_id": self._state["next_id"], "created": time.time()}
+        expired = self._state["files"][:-self.max_files] if self.max_files > 0 else []
+        self._state["files"] = self._state["files"][len(expired):]
+        # Index the rotated file before moving it, so a crash never leaves an unindexed file
+        self._atomic_write(self.state_file, json.dumps(self._state))
+        os.replace(self.log_file, os.path.join(self.log_dir, name))
+        for entry in expired:
+            path = os.path.join(self.log_dir, entry["name"])
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _lines_backwards(path: str, block_size: int = 64 * 1024) -> Iterator[str]:
+        """Lines of a file from last to first, read in blocks from the end"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            remainder = b""
+            while position > 0:
+                read = min(block_size, position)
+                position -= read
+                f.seek(position)
+                lines = (f.read(read) + remainder).split(b"\n")
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line.strip():
+                        yield line.decode("utf-8")
+            if remainder.strip():
+                yield remainder.decode("utf-8")
+
+    def _entries_backwards(self, path: str) -> Iterator[Dict[str, Any]]:
+        for line in self._lines_backwards(path):
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn final line from an interrupted write
+
+    def get_history(self, limit: int = 50, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Retrieve the newest `limit` entries with id below `before`, oldest first
+
+        Pass the id of the first entry of a page as `before` to get the page
+        preceding it.
+        """
+        if limit <= 0:
             return []
-        
-        history = []
-        with open(self.log_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    history.append(json.loads(line))
-        
-        return history[-limit:]
+        with self._lock:
+            recent = [entry for entry in self._recent if before is None or entry["id"] < before]
+        page = recent[-limit:]
+        if len(page) == limit:
+            return page
+
+        # Older entries come from disk, starting below the oldest one already found
+        below = page[0]["id"] if page else before
+        older = []
+        with self._file_lock:
+            sources = [(self.log_file, self._state["active"]["first_id"])] + [
+                (os.path.join(self.log_dir, f["name"]), f["first_id"])
+                for f in reversed(self._state["files"])
+            ]
+            for path, first_id in sources:
+                if below is not None and first_id >= below:
+                    continue
+                for entry in self._entries_backwards(path):
+                    if below is not None and entry["id"] >= below:
+                        continue
+                    older.append(entry)
+                    if len(older) + len(page) >= limit:
+                        break
+                if len(older) + len(page) >= limit:
+                    break
+        return list(reversed(older)) + page
+
+    def oldest_id(self) -> int:
+        """Id of the oldest entry still retained"""
+        files = self._state["files"]
+        return files[0]["first_id"] if files else self._state["active"]["first_id"]
+
+    def flush(self, timeout: Optional[float] = None):
+        """Block until every entry logged so far is on disk"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """Flush pending entries and stop the writer"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Running totals, without reading the log"""
+        with self._file_lock:
+            state = self._state
+            files = [self.log_file] + [os.path.join(self.log_dir, f["name"]) for f in state["files"]]
+            total = state["total_queries"]
+            return {
+                "total_queries": max(total, self._next_id),
+                "avg_processing_time_seconds": round(state["total_processing_time"] / total, 4) if total else None,
+                "pending_writes": self._queue.qsize(),
+                "files": len(files),
+                "bytes": sum(os.path.getsize(path) for path in files if os.path.exists(path)),
+            }
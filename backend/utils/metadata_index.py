@@ -0,0 +1,207 @@
+import numpy as np
+import json
+import os
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Union
+
+_RECORD = np.dtype([("file_path", "<i4"), ("type", "<i4"), ("timestamp", "<f8")])
+_CATEGORICAL = ["file_path", "type"]
+_OPERATORS = {"eq", "ne", "in", "gt", "gte", "lt", "lte"}
+
+
+def _to_epoch(value: Union[str, int, float]) -> float:
+    """Accept ISO-8601 strings or epoch seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+
+
+class MetadataIndex:
+    """Columnar index of filterable chunk metadata (file_path, type, timestamp)
+
+    One fixed-width record per vector store position is appended to
+    columns.bin; string values are interned in values.jsonl. Filters are
+    evaluated as numpy masks over all positions, cheap enough to narrow
+    candidates before the vector scan.
+
+    Filters map a field to a value (equality) or to {operator: value} with
+    operators eq, ne, in, gt, gte, lt, lte, e.g.
+    {"type": "audio", "file_path": {"in": ["a.pdf"]}, "timestamp": {"gt": "2024-01-01"}}
+    """
+
+    FIELDS = list(_RECORD.names)
+
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.columns_file = os.path.join(path, "columns.bin")
+        self.values_file = os.path.join(path, "values.jsonl")
+        self._lock = threading.RLock()
+        self._values: Dict[str, List[str]] = {field: [] for field in _CATEGORICAL}
+        self._ids: Dict[str, Dict[str, int]] = {field: {} for field in _CATEGORICAL}
+        self._data = np.zeros(0, dtype=_RECORD)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def load(self, documents):
+        """Load the columns, realigned with the document store
+
+        Records beyond the document store are dropped; documents without a
+        record (older stores, interrupted writes) are indexed from their
+        stored metadata.
+        """
+        with self._lock:
+            if os.path.exists(self.values_file):
+                with open(self.values_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            break  # torn final line from an interrupted write
+                        self._ids[entry["field"]][entry["value"]] = len(self._values[entry["field"]])
+                        self._values[entry["field"]].append(entry["value"])
+
+            records = np.zeros(0, dtype=_RECORD)
+            if os.path.exists(self.columns_file):
+                count = min(os.path.getsize(self.columns_file) // _RECORD.itemsize, len(documents))
+                records = np.fromfile(self.columns_file, dtype=_RECORD, count=count)
+                with open(self.columns_file, "r+b") as f:
+                    f.truncate(count * _RECORD.itemsize)
+            self._data = records.copy()
+            self._size = len(records)
+
+            missing = len(documents) - self._size
+            if missing:
+                print(f"Indexing metadata of {missing} documents...")
+                self.add(self._size, [documents.get_metadata(p) for p in range(self._size, len(documents))])
+
+    def _intern(self, field: str, value: Any, new_values: List[Dict[str, Any]]) -> int:
+        value = str(value)
+        if value not in self._ids[field]:
+            self._ids[field][value] = len(self._values[field])
+            self._values[field].append(value)
+            new_values.append({"field": field, "value": value})
+        return self._ids[field][value]
+
+    def add(self, first: int, metadata: List[Dict[str, Any]]):
+        """Index the (file-merged) metadata of documents at positions first, first + 1, ..."""
+        with self._lock:
+            if first != self._size:
+                raise ValueError(f"Metadata index has {self._size} documents, cannot add at {first}")
+            new_values = []
+            records = np.zeros(len(metadata), dtype=_RECORD)
+            for i, meta in enumerate(metadata):
+                records[i]["file_path"] = self._intern("file_path", meta.get("file_path", ""), new_values)
+                records[i]["type"] = self._intern("type", meta.get("type", "unknown"), new_values)
+                try:
+                    records[i]["timestamp"] = _to_epoch(meta["timestamp"]) if "timestamp" in meta else np.nan
+                except ValueError:
+                    records[i]["timestamp"] = np.nan
+
+            # Values before records: a crash in between leaves only unused values
+            if new_values:
+                with open(self.values_file, 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(value) + '\n' for value in new_values)
+                    f.flush()
+                    os.fsync(f.fileno())
+            with open(self.columns_file, 'ab') as f:
+                f.write(records.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            if self._size + len(records) > len(self._data):
+                grown = np.zeros(max(2 * len(self._data), self._size + len(records), 1024), dtype=_RECORD)
+                grown[:self._size] = self._data[:self._size]
+                self._data = grown
+            self._data[self._size:self._size + len(records)] = records
+            self._size += len(records)
+
+    def remove(self, positions: List[int]):
+        """Mark deleted documents so no filter matches them (file_path -1, rewritten in place)"""
+        positions = sorted(p for p in positions if p < self._size)
+        if not positions:
+            return
+        with self._lock:
+            self._data["file_path"][positions] = -1
+            with open(self.columns_file, "r+b") as f:
+                for position in positions:
+                    f.seek(position * _RECORD.itemsize)
+                    f.write(self._data[position].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def compact_into(self, path: str, positions: np.ndarray):
+        """Write the records of positions, in order, as a new index at path numbered from 0"""
+        from .segment_store import atomic_write
+
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            records = self._data[:self._size][positions].copy()
+            values = [{"field": field, "value": value}
+                      for field in _CATEGORICAL for value in self._values[field]]
+        atomic_write(os.path.join(path, os.path.basename(self.values_file)),
+                     lambda f: f.writelines(json.dumps(value) + '\n' for value in values), mode="w")
+        atomic_write(os.path.join(path, os.path.basename(self.columns_file)),
+                     lambda f: f.write(records.tobytes()))
+
+    def alive(self, positions: np.ndarray) -> np.ndarray:
+        """Which of positions are indexed and not removed"""
+        with self._lock:
+            inside = positions < self._size
+            alive = np.zeros(len(positions), dtype=bool)
+            alive[inside] = self._data["file_path"][positions[inside]] >= 0
+        return alive
+
+    def mask(self, filters: Dict[str, Any], exclude: Optional[set] = None) -> np.ndarray:
+        """Boolean mask over positions matching every filter (and not excluded or removed)"""
+        with self._lock:
+            columns = self._data[:self._size]
+            mask = columns["file_path"] >= 0
+            for field, condition in filters.items():
+                if field not in self.FIELDS:
+                    raise ValueError(f"Unknown filter field: {field} (expected one of {self.FIELDS})")
+                if not isinstance(condition, dict):
+                    condition = {"eq": condition}
+                for op, value in condition.items():
+                    if op not in _OPERATORS:
+                        raise ValueError(f"Unknown filter operator: {op} (expected one of {sorted(_OPERATORS)})")
+                    mask &= self._match(field, op, value, columns[field])
+        if exclude:
+            excluded = np.fromiter((p for p in exclude if p < len(mask)), dtype=np.int64)
+            mask[excluded] = False
+        return mask
+
+    def _match(self, field: str, op: str, value: Any, column: np.ndarray) -> np.ndarray:
+        if field in _CATEGORICAL:
+            if op not in ("eq", "ne", "in"):
+                raise ValueError(f"Operator {op} is not supported for {field}")
+            values = value if op == "in" else [value]
+            if not isinstance(values, list):
+                raise ValueError(f"'in' expects a list for {field}")
+            ids = [self._ids[field][str(v)] for v in values if str(v) in self._ids[field]]
+            matched = np.isin(column, ids)
+            return ~matched if op == "ne" else matched
+
+        if op == "in":
+            return np.isin(column, [_to_epoch(v) for v in value])
+        target = _to_epoch(value)
+        return {
+            "eq": column == target,
+            "ne": column != target,
+            "gt": column > target,
+            "gte": column >= target,
+            "lt": column < target,
+            "lte": column <= target,
+        }[op]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "documents": self._size,
+            "files": len(self._values["file_path"]),
+            "types": list(self._values["type"]),
+        }
@@ -0,0 +1,204 @@
+import contextvars
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Summary:
+    """Count, sum and p50/p95/p99 over the most recent `window` observations"""
+
+    def __init__(self, window: int = 2048):
+        self.count = 0
+        self.sum = 0.0
+        self._recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self._recent.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        if not self._recent:
+            return {}
+        values = np.quantile(np.fromiter(self._recent, dtype=np.float64), QUANTILES)
+        return dict(zip(QUANTILES, values.tolist()))
+
+
+class Trace:
+    """Stage timings of one request, identified by a trace id"""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.id = trace_id or uuid.uuid4().hex[:16]
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        # Repeated stages (e.g. several search batches) accumulate
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"trace_id": self.id,
+                "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}}
+
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("trace", default=None)
+
+
+class Metrics:
+    """Process-wide counters, summaries and scrape-time gauges in Prometheus text format
+
+    Stage timings go to a summary labelled by stage, and to the current
+    trace if one is active in this thread. Gauges are callables evaluated
+    on every scrape, so queue depths and model memory are never stale.
+    """
+
+    def __init__(self, namespace: str = "rag"):
+        self.namespace = namespace
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._summaries: Dict[Tuple[str, Tuple], Summary] = {}
+        self._gauges: Dict[str, Callable[[], Any]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary()
+            summary.observe(value)
+
+    def gauge(self, name: str, read: Callable[[], Any], help_text: str = ""):
+        """Register a gauge; read() returns a number or a {labels tuple: number} dict"""
+        self._gauges[name] = read
+        self.describe(name, "gauge", help_text)
+
+    @contextmanager
+    def stage(self, stage: str, metric: str = "stage_seconds", **labels) -> Iterator[None]:
+        """Time a block into `metric` (labelled stage=...) and the current trace"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            self.observe(metric, seconds, stage=stage, **labels)
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.add(stage, seconds)
+
+    @contextmanager
+    def activate(self, trace: Trace) -> Iterator[Trace]:
+        """Collect the stage timings of the enclosed block (in this thread) into trace
+
+        A trace can be activated repeatedly, e.g. around each step of a
+        generator that is advanced from different threadpool workers.
+        """
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+
+    @contextmanager
+    def on_behalf(self, traces: List[Optional[Trace]]) -> Iterator[None]:
+        """Add the stage timings of the enclosed block to each of several requests' traces
+
+        For work done in one call for many requests, on a thread that does
+        not carry their context (a micro-batcher or scheduler worker).
+        """
+        batch = Trace()
+        try:
+            with self.activate(batch):
+                yield
+        finally:
+            for trace in {id(trace): trace for trace in traces if trace is not None}.values():
+                for stage, seconds in batch.stages.items():
+                    trace.add(stage, seconds)
+
+    def current_trace(self) -> Optional[Trace]:
+        return _current_trace.get()
+
+    def _name(self, name: str) -> str:
+        return f"{self.namespace}_{name}"
+
+    @staticmethod
+    def _labels(labels: Tuple, extra: Tuple = ()) -> str:
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        described = set()
+
+        def header(name: str, kind: str):
+            if name in described:
+                return
+            described.add(name)
+            help_text = self._help.get(name, (kind, ""))[1]
+            if help_text:
+                lines.append(f"# HELP {self._name(name)} {help_text}")
+            lines.append(f"# TYPE {self._name(name)} {kind}")
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted(self._summaries.items(), key=lambda item: item[0])
+            summary_values = [(key, s.count, s.sum, s.quantiles()) for key, s in summaries]
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{self._name(name)}{self._labels(labels)} {value:g}")
+
+        for (name, labels), count, total, quantiles in summary_values:
+            header(name, "summary")
+            for q, value in quantiles.items():
+                lines.append(f"{self._name(name)}{self._labels(labels, (('quantile', q),))} {value:.6g}")
+            lines.append(f"{self._name(name)}_sum{self._labels(labels)} {total:.6g}")
+            lines.append(f"{self._name(name)}_count{self._labels(labels)} {count}")
+
+        for name, read in sorted(self._gauges.items()):
+            try:
+                value = read()
+            except Exception:
+                continue  # a failing gauge must not break the scrape
+            if value is None:
+                continue
+            header(name, "gauge")
+            values = value.items() if isinstance(value, dict) else [((), value)]
+            for labels, number in values:
+                if number is not None:
+                    lines.append(f"{self._name(name)}{self._labels(tuple(labels))} {float(number):g}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("stage_seconds", "summary", "Latency of query pipeline stages")
+metrics.describe("ingest_stage_seconds", "summary", "Latency of ingestion stages per file type")
+metrics.describe("http_request_seconds", "summary", "HTTP request latency by route")
+metrics.describe("generated_tokens_total", "counter", "Tokens generated by the LLM")
+metrics.describe("prompt_tokens_total", "counter", "Prompt tokens sent to the LLM")
+metrics.describe("generation_tokens_per_second", "summary", "LLM decoding speed per answer")
+metrics.describe("time_to_first_token_seconds", "summary", "Time from a streamed query to its first answer token")
+metrics.describe("prefill_tokens_total", "counter", "Prompt tokens prefilled, by source (KV cache or computed)")
+metrics.describe("context_tokens", "summary", "LLM tokens of retrieved context packed into each prompt")
+metrics.describe("context_chunks_total", "counter", "Retrieved chunks by packing outcome (packed, duplicate, over_budget)")
+metrics.describe("embedded_texts_total", "counter", "Texts embedded, by kind (documents or queries)")
+metrics.describe("ingest_embeddings_reused_total", "counter", "Chunk embeddings copied from identical chunks of other files")
@@ -0,0 +1,88 @@
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple
+import queue
+import threading
+import time
+
+from .metrics import metrics
+
+
+class MicroBatcher:
+    """Merge calls arriving within a few milliseconds into one batched call
+
+    process(items) receives up to max_batch_size items and must return one
+    result per item, in order; each submit() caller gets its own result back.
+    Stages timed during a batch are added to the trace of every request in it.
+    """
+
+    def __init__(self, process: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 2, name: str = "micro-batcher"):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue: "queue.Queue[Tuple[Any, Future, Any]]" = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        # Written by the worker, read by get_stats() from request threads
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0}
+
+    def submit(self, item: Any) -> Future:
+        future = Future()
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+        # The worker thread does not see the caller's context, so carry its trace along
+        self._queue.put((item, future, metrics.current_trace()))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        """Submit an item and block until its result is ready"""
+        return self.submit(item).result()
+
+    def _collect_batch(self) -> List[Tuple[Any, Future, Any]]:
+        """Block for one item, then gather more until the batch is full or the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                with metrics.on_behalf([trace for _, _, trace in batch]):
+                    results = self.process([item for item, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            # Counted before callers are released, so their stats reads include this batch
+            self._record(len(batch))
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, batch_size: int):
+        with self._stats_lock:
+            self.stats["requests"] += batch_size
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], batch_size)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        batches = stats["batches"]
+        return {
+            **stats,
+            "queue_depth": self._queue.qsize(),
+            "avg_batch_size": round(stats["requests"] / batches, 2) if batches else 0,
+        }
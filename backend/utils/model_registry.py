@@ -0,0 +1,220 @@
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+from typing import Any, Callable, Dict, Optional, Tuple
+import os
+import threading
+import time
+
+
+def _current_rss() -> int:
+    """Return resident memory of this process in bytes (0 if unknown)"""
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ModelRegistry:
+    """Process-wide registry that loads models lazily and shares one instance per name"""
+
+    def __init__(self, idle_timeout: float = 0):
+        self.idle_timeout = idle_timeout
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register a loader for a model; the first registration wins"""
+        with self._lock:
+            if name not in self._loaders:
+                self._loaders[name] = loader
+                self._locks[name] = threading.Lock()
+                self._stats[name] = {
+                    "loaded": False,
+                    "load_count": 0,
+                    "load_time_seconds": None,
+                    "memory_bytes": None,
+                    "last_used": None,
+                }
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it on first use"""
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        with self._locks[name]:
+            stats = self._stats[name]
+            if name not in self._models:
+                print(f"[ModelRegistry] Loading {name}...")
+                rss_before = _current_rss()
+                start_time = time.time()
+                model = self._loaders[name]()
+                load_time = time.time() - start_time
+
+                self._models[name] = model
+                stats["loaded"] = True
+                stats["load_count"] += 1
+                stats["load_time_seconds"] = round(load_time, 3)
+                stats["memory_bytes"] = max(_current_rss() - rss_before, 0)
+                print(f"[ModelRegistry] Loaded {name} in {load_time:.1f}s")
+                self._start_reaper()
+
+            stats["last_used"] = time.time()
+            return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def unload(self, name: str):
+        """Drop the registry's reference to a model so it can be freed"""
+        with self._locks[name]:
+            if self._models.pop(name, None) is not None:
+                self._stats[name]["loaded"] = False
+                print(f"[ModelRegistry] Unloaded {name}")
+
+    def unload_idle(self):
+        """Unload every model that has not been used within the idle timeout"""
+        if self.idle_timeout <= 0:
+            return
+        now = time.time()
+        for name in list(self._models):
+            last_used = self._stats[name]["last_used"] or now
+            if now - last_used >= self.idle_timeout:
+                self.unload(name)
+
+    def _start_reaper(self):
+        """Start the background idle-unload thread once"""
+        if self.idle_timeout <= 0 or self._reaper is not None:
+            return
+        interval = max(min(self.idle_timeout / 2, 30), 1)
+
+        def reap():
+            while True:
+                time.sleep(interval)
+                self.unload_idle()
+
+        self._reaper = threading.Thread(target=reap, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Load time and resident memory per model"""
+        return {
+            "process_rss_bytes": _current_rss(),
+            "idle_timeout_seconds": self.idle_timeout,
+            "models": {name: dict(stats) for name, stats in self._stats.items()},
+        }
+
+
+registry = ModelRegistry()
+
+
+def get_whisper_model(size: str = "base", compute_type: str = "float32"):
+    """Shared Whisper model
+
+    compute_type "int8" loads on CPU and dynamically quantizes the linear
+    layers, trading a little accuracy for faster, smaller inference.
+    """
+    if compute_type not in ("float32", "int8"):
+        raise ValueError(f"Unsupported Whisper compute type: {compute_type}")
+
+    def load():
+        import whisper
+        if compute_type == "int8":
+            import torch
+            model = whisper.load_model(size, device="cpu")
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return whisper.load_model(size)
+
+    name = f"whisper:{size}" if compute_type == "float32" else f"whisper:{size}:{compute_type}"
+    registry.register(name, load)
+    return registry.get(name)
+
+
+def get_embedding_model(model_name: str = "all-MiniLM-L6-v2", backend: str = "torch"):
+    """Shared SentenceTransformer embedder
+
+    backend "int8" dynamically quantizes the linear layers; "onnx" runs an
+    ONNX Runtime export (requires optimum[onnxruntime]).
+    """
+    if backend not in ("torch", "int8", "onnx"):
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+
+    def load():
+        if backend == "onnx":
+            from .inference_backends import OnnxEmbedder
+            return OnnxEmbedder(model_name)
+        from sentence_transformers import SentenceTransformer
+        if backend == "int8":
+            import torch
+            model = SentenceTransformer(model_name, device="cpu")
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return SentenceTransformer(model_name)
+
+    name = f"embedder:{model_name}" if backend == "torch" else f"embedder:{model_name}:{backend}"
+    registry.register(name, load)
+    return registry.get(name)
+
+
+def get_cross_encoder(model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    """Shared CrossEncoder for reranking (query, passage) pairs"""
+    def load():
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_name, device="cpu")
+
+    name = f"reranker:{model_name}"
+    registry.register(name, load)
+    return registry.get(name)
+
+
+def get_llm(model_name: str, backend: str = "torch") -> Tuple[Any, Any]:
+    """Shared (tokenizer, model) pair for a causal LM
+
+    backend "int8" dynamically quantizes the linear layers of the fp32
+    model; "onnx" exports it to ONNX Runtime (requires optimum[onnxruntime]).
+    """
+    if backend not in ("torch", "int8", "onnx"):
+        raise ValueError(f"Unsupported LLM backend: {backend}")
+
+    def load():
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if backend == "onnx":
+            from optimum.onnxruntime import ORTModelForCausalLM
+            return tokenizer, ORTModelForCausalLM.from_pretrained(model_name, export=True)
+
+        from transformers import AutoModelForCausalLM
+        import torch
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float32,
+            device_map="cpu",
+            low_cpu_mem_usage=True
+        )
+        if backend == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return tokenizer, model
+
+    name = f"llm:{model_name}" if backend == "torch" else f"llm:{model_name}:{backend}"
+    registry.register(name, load)
+    return registry.get(name)
+
+
+def get_gguf_model(model_path: str, n_ctx: int = 2048, n_threads: Optional[int] = None):
+    """Shared llama.cpp model loaded from a GGUF file (requires llama-cpp-python)"""
+    def load():
+        from llama_cpp import Llama
+        return Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+
+    name = f"gguf:{os.path.basename(model_path)}"
+    registry.register(name, load)
+    return registry.get(name)
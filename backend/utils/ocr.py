@@ -0,0 +1,220 @@
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+from PIL import Image, ImageOps
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import hashlib
+import json
+import os
+
+from .content_index import hash_file
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Grey level that best separates ink from background (Otsu's method)"""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * np.arange(256))
+    total, total_mean = weight[-1], mean[-1]
+    background = weight[:-1]
+    foreground = total - background
+    valid = (background > 0) & (foreground > 0)
+    between = np.zeros(255)
+    between[valid] = (total_mean * background[valid] / total - mean[:-1][valid]) ** 2 \
+        * total ** 2 / (background[valid] * foreground[valid])
+    return int(np.argmax(between))
+
+
+def preprocess(image: Image.Image, target_dpi: int = 300, max_pixels: int = 40_000_000,
+               binarize: bool = True) -> Tuple[Image.Image, float]:
+    """Greyscale, resample to the target DPI and binarize an image for OCR
+
+    Returns the processed image and the scale applied, so boxes can be
+    mapped back to original pixel coordinates.
+    """
+    source_dpi = image.info.get("dpi", (0, 0))[0]
+    image = ImageOps.exif_transpose(image).convert("L")
+
+    scale = 1.0
+    if source_dpi and source_dpi > 0:
+        scale = min(2.0, target_dpi / float(source_dpi))
+    pixels = image.width * image.height * scale * scale
+    if pixels > max_pixels:
+        scale *= (max_pixels / pixels) ** 0.5
+    if abs(scale - 1.0) > 0.05:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    else:
+        scale = 1.0
+
+    if binarize:
+        gray = np.asarray(image)
+        image = Image.fromarray(np.where(gray > otsu_threshold(gray), 255, 0).astype(np.uint8))
+    return image, scale
+
+
+def tile_boxes(width: int, height: int, tile_size: int, overlap: int) -> List[Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]]]:
+    """Split an image into overlapping tiles
+
+    Returns (crop box, owned box) pairs. Owned boxes partition the image, so a
+    word seen in two overlapping tiles is kept only by the tile that owns its
+    centre.
+    """
+    def spans(length: int) -> List[Tuple[int, int, int, int]]:
+        if length <= tile_size:
+            return [(0, length, 0, length)]
+        count = -(-length // tile_size)
+        step = -(-length // count)
+        return [(max(0, start - overlap), min(length, start + step + overlap),
+                 start, min(length, start + step))
+                for start in range(0, length, step)]
+
+    return [((x0, y0, x1, y1), (own_x0, own_y0, own_x1, own_y1))
+            for y0, y1, own_y0, own_y1 in spans(height)
+            for x0, x1, own_x0, own_x1 in spans(width)]
+
+
+def _ocr_tile(image: Image.Image, crop: Tuple[int, int, int, int],
+              owned: Tuple[int, int, int, int], lang: str) -> List[Dict[str, Any]]:
+    """OCR one tile; returns its words in image coordinates with block ids"""
+    data = pytesseract.image_to_data(image.crop(crop), lang=lang,
+                                     output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data["text"]):
+        if not text.strip() or float(data["conf"][i]) < 0:
+            continue
+        left = data["left"][i] + crop[0]
+        top = data["top"][i] + crop[1]
+        width, height = data["width"][i], data["height"][i]
+        centre_x, centre_y = left + width / 2, top + height / 2
+        if not (owned[0] <= centre_x < owned[2] and owned[1] <= centre_y < owned[3]):
+            continue
+        words.append({
+            "text": text,
+            "box": (left, top, left + width, top + height),
+            "block": (data["block_num"][i], data["par_num"][i]),
+            "line": data["line_num"][i],
+        })
+    return words
+
+
+def _group_blocks(words: List[Dict[str, Any]], scale: float) -> List[Dict[str, Any]]:
+    """Join words into text blocks with a bounding box in original image pixels"""
+    blocks = []
+    for word in words:
+        if not blocks or blocks[-1]["key"] != word["block"]:
+            blocks.append({"key": word["block"], "lines": [[]], "line": word["line"],
+                           "box": list(word["box"])})
+        block = blocks[-1]
+        if word["line"] != block["line"]:
+            block["lines"].append([])
+            block["line"] = word["line"]
+        block["lines"][-1].append(word["text"])
+        box = block["box"]
+        box[0], box[1] = min(box[0], word["box"][0]), min(box[1], word["box"][1])
+        box[2], box[3] = max(box[2], word["box"][2]), max(box[3], word["box"][3])
+
+    return [{
+        "text": "\n".join(" ".join(line) for line in block["lines"]),
+        "bbox": [round(v / scale) for v in block["box"]],
+    } for block in blocks]
+
+
+class OCREngine:
+    """Tesseract OCR with preprocessing, parallel tiles and a result cache
+
+    Images are greyscaled, resampled to `target_dpi` and, with `binarize`,
+    thresholded with Otsu's method (Tesseract binarizes internally as well).
+    Images larger than `tile_size` pixels on a side are cut into overlapping
+    tiles that are recognised in parallel. Results are cached on disk by image
+    hash and every setting that affects the output, so re-uploads and
+    re-ingestion skip Tesseract entirely.
+    """
+
+    def __init__(self, workers: int = 4, tile_size: int = 2000, tile_overlap: int = 64,
+                 target_dpi: int = 300, lang: str = "eng", cache_dir: Optional[str] = None,
+                 binarize: bool = True, max_pixels: int = 40_000_000):
+        self.workers = workers
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.target_dpi = target_dpi
+        self.lang = lang
+        self.binarize = binarize
+        self.max_pixels = max_pixels
+        self.cache_dir = cache_dir
+        self._tesseract_version = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        # Tesseract runs as a subprocess, so threads are enough to use several cores
+        self._pool = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+        return self._pool
+
+    def _settings(self) -> Dict[str, Any]:
+        """Everything besides the image that changes the OCR result"""
+        if self._tesseract_version is None:
+            self._tesseract_version = "unknown"
+            if TESSERACT_AVAILABLE:
+                try:
+                    self._tesseract_version = str(pytesseract.get_tesseract_version())
+                except Exception:
+                    pass
+        return {
+            "lang": self.lang,
+            "target_dpi": self.target_dpi,
+            "max_pixels": self.max_pixels,
+            "binarize": self.binarize,
+            "tile_size": self.tile_size,
+            "tile_overlap": self.tile_overlap,
+            "tesseract": self._tesseract_version,
+        }
+
+    def _cache_path(self, image_hash: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        settings = hashlib.sha256(json.dumps(self._settings(), sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{image_hash}-{settings}.json")
+
+    def recognize(self, file_path: str) -> Dict[str, Any]:
+        """OCR an image file
+
+        Returns {"text", "blocks": [{"text", "bbox": [x0, y0, x1, y1]}],
+        "tiles", "cached"}.
+        """
+        cache_path = self._cache_path(hash_file(file_path))
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return {**json.load(f), "cached": True}
+
+        with Image.open(file_path) as original:
+            image, scale = preprocess(original, self.target_dpi, max_pixels=self.max_pixels,
+                                      binarize=self.binarize)
+
+        tiles = tile_boxes(image.width, image.height, self.tile_size, self.tile_overlap)
+        if len(tiles) == 1 or self.workers <= 1:
+            tile_words = [_ocr_tile(image, crop, owned, self.lang) for crop, owned in tiles]
+        else:
+            pool = self._get_pool()
+            tile_words = list(pool.map(lambda tile: _ocr_tile(image, tile[0], tile[1], self.lang), tiles))
+
+        blocks = []
+        for words in tile_words:
+            blocks.extend(_group_blocks(words, scale))
+        result = {
+            "text": "\n\n".join(block["text"] for block in blocks),
+            "blocks": blocks,
+            "tiles": len(tiles),
+        }
+
+        if cache_path:
+            from .segment_store import atomic_write
+            atomic_write(cache_path, lambda f: json.dump(result, f), mode="w")
+        return {**result, "cached": False}
@@ -0,0 +1,157 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import metrics
+
+
+def to_legacy(past_key_values) -> Tuple:
+    """KV state as a tuple of per-layer (key, value) tensors, whatever the transformers version returned"""
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return tuple(past_key_values)
+
+
+def from_legacy(past_key_values: Tuple):
+    """KV state in the form model.generate() expects (a DynamicCache where transformers has one)"""
+    try:
+        from transformers import DynamicCache
+    except ImportError:
+        return past_key_values
+    return DynamicCache.from_legacy_cache(past_key_values)
+
+
+def crop(past_key_values: Tuple, length: int) -> Tuple:
+    """KV state of the first `length` tokens (views, no copy)"""
+    return tuple((key[:, :, :length], value[:, :, :length]) for key, value in past_key_values)
+
+
+def kv_bytes(past_key_values: Tuple) -> int:
+    return sum(t.element_size() * t.nelement() for layer in past_key_values for t in layer)
+
+
+class PrefixKVCache:
+    """LRU of prompt-prefix KV states, bounded by memory
+
+    Prompts are token sequences; an entry holds the attention keys/values of
+    one prompt (minus its last token). A new prompt reuses the KV state of
+    the entry sharing its longest token prefix, cropped to that prefix, and
+    only the remaining tokens are prefilled. KV at a position depends only
+    on the tokens up to it, so the reuse is exact: the constant instruction
+    prefix is always shared, and so are leading retrieved chunks that recur
+    in the same order. Entries subsumed by a longer prompt are dropped.
+
+    Savings are measured: prefill cost per token is tracked on computed
+    prefills, and reused tokens are credited at that rate.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, min_reuse_tokens: int = 8,
+                 token_cache_size: int = 4096):
+        self.max_bytes = max_bytes
+        self.min_reuse_tokens = min_reuse_tokens
+        self._entries: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        # Token ids of recurring prompt segments (the instruction prefix, retrieved chunks)
+        self.token_cache_size = token_cache_size
+        self._tokens: "OrderedDict[Any, List[int]]" = OrderedDict()
+        # Moving average of prefill seconds per token, measured on every computed prefill
+        self._token_seconds = None
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "reused_tokens": 0, "computed_tokens": 0,
+                      "prefill_seconds": 0.0, "evictions": 0}
+
+    def tokens(self, key: Any, tokenize: Callable[[], List[int]]) -> List[int]:
+        """Token ids of a prompt segment, tokenized once while it stays in the LRU"""
+        with self._lock:
+            ids = self._tokens.get(key)
+            if ids is not None:
+                self._tokens.move_to_end(key)
+                return ids
+        ids = tokenize()
+        with self._lock:
+            self._tokens[key] = ids
+            while len(self._tokens) > self.token_cache_size:
+                self._tokens.popitem(last=False)
+        return ids
+
+    @staticmethod
+    def _common_prefix(a: np.ndarray, b: np.ndarray) -> int:
+        n = min(len(a), len(b))
+        diff = np.flatnonzero(a[:n] != b[:n])
+        return int(diff[0]) if len(diff) else n
+
+    def lookup(self, ids: np.ndarray) -> Tuple[int, Optional[Tuple]]:
+        """(tokens reused, their KV state) for the longest cached prefix of ids"""
+        best, best_key = 0, None
+        with self._lock:
+            self.stats["lookups"] += 1
+            for key, entry in self._entries.items():
+                length = self._common_prefix(entry["ids"], ids)
+                if length > best:
+                    best, best_key = length, key
+            if best < self.min_reuse_tokens:
+                return 0, None
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            self.stats["hits"] += 1
+        return best, crop(entry["kv"], best)
+
+    def store(self, ids: np.ndarray, past_key_values: Tuple):
+        """Cache the KV state of the tokens ids (one KV position per token)"""
+        size = kv_bytes(past_key_values)
+        if size > self.max_bytes:
+            return
+        key = ids.tobytes()
+        with self._lock:
+            for other_key, entry in list(self._entries.items()):
+                shared = self._common_prefix(entry["ids"], ids)
+                if shared == len(ids):
+                    # Already covered by a longer entry
+                    self._entries.move_to_end(other_key)
+                    return
+                if shared == len(entry["ids"]):
+                    self._bytes -= entry["bytes"]
+                    del self._entries[other_key]
+            self._entries[key] = {"ids": ids.copy(), "kv": past_key_values, "bytes": size}
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted["bytes"]
+                self.stats["evictions"] += 1
+
+    def record(self, reused: int, computed: int, seconds: float):
+        """Account one prefill: reused cached tokens, computed tokens and the time they took"""
+        with self._lock:
+            self.stats["reused_tokens"] += reused
+            self.stats["computed_tokens"] += computed
+            self.stats["prefill_seconds"] += seconds
+            if computed:
+                per_token = seconds / computed
+                self._token_seconds = per_token if self._token_seconds is None \
+                    else 0.8 * self._token_seconds + 0.2 * per_token
+        metrics.inc("prefill_tokens_total", reused, source="cache")
+        metrics.inc("prefill_tokens_total", computed, source="computed")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            total = stats["reused_tokens"] + stats["computed_tokens"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else None,
+                "reused_token_share": round(stats["reused_tokens"] / total, 4) if total else None,
+                "ms_per_prefill_token": round(self._token_seconds * 1000, 4) if self._token_seconds else None,
+                "estimated_saved_seconds": round(stats["reused_tokens"] * self._token_seconds, 3)
+                if self._token_seconds else None,
+                **{key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()},
+            }
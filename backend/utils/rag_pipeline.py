@@ -1,55 +1,137 @@
 try:
-    from transformers import AutoTokenizer, AutoModelForCausalLM
+    import transformers
     import torch
     TRANSFORMERS_AVAILABLE = True
 except ImportError:
     TRANSFORMERS_AVAILABLE = False
     
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+import json
+import numpy as np
 import os
+import time
+from .inference_backends import load_generator
+from .prefix_cache import PrefixKVCache
+from .generation_scheduler import GenerationScheduler
+from .answer_cache import AnswerCache
+from .reranker import Reranker
+from .context_packer import ContextPacker
+from .chunker import approximate_tokens
+from .metrics import metrics
+
+# Constant start of every prompt, so its KV state is computed once and reused
+PROMPT_PREFIX = """Provide a clear and accurate answer to the question based only on the context below. If the context doesn't contain the information, say "I don't have enough information to answer this question."
+
+Context:
+"""
+
+MOCK_RESPONSE = "[Mock Response] Based on the provided context, here's a summary related to your question. Install transformers to get real AI responses: pip install transformers torch"
 
 class RAGPipeline:
     """RAG pipeline for query answering"""
     
     def __init__(self, model_path: str, vector_store, logger, 
-                 max_tokens: int = 512, temperature: float = 0.7):
+                 max_tokens: int = 512, temperature: float = 0.7,
+                 model_name: str = "Qwen/Qwen2.5-0.5B-Instruct",
+                 batch_size: int = 1, batch_wait_ms: float = 20,
+                 answer_cache: Optional[AnswerCache] = None,
+                 reranker: Optional[Reranker] = None,
+                 backend: str = "torch",
+                 prefix_cache: Optional[PrefixKVCache] = None,
+                 context_packer: Optional[ContextPacker] = None):
         self.vector_store = vector_store
         self.logger = logger
         self.max_tokens = max_tokens
         self.temperature = temperature
-        self.llm = None
-        self.tokenizer = None
+        # Qwen2.5-0.5B - Smallest model, ~1GB, fastest on CPU
+        # Loaded lazily from the shared model registry on the first query
+        self.model_name = model_name
+        self.model_path = model_path
+        # Inference backend: torch (fp32), int8, onnx or gguf (llama.cpp on model_path)
+        self.backend = backend
+        # Reuses the prompt prefix's KV state (instruction, recurring leading chunks) across queries
+        self.prefix_cache = prefix_cache
+        self._llm_unavailable = False
+        self.answer_cache = answer_cache
+        # Optional cross-encoder stage reordering over-fetched hits before the context is built
+        self.reranker = reranker
+        # Picks the chunks that go into the prompt within the model's token budget
+        self.context_packer = context_packer or ContextPacker()
+        # Concurrent /query generations are batched when batch_size > 1
+        self.scheduler = None
+        if batch_size > 1:
+            self.scheduler = GenerationScheduler(
+                self._load_llm, self._generation_kwargs,
+                max_batch_size=batch_size, max_wait_ms=batch_wait_ms
+            )
         
-        # Load lightweight model using transformers
-        if TRANSFORMERS_AVAILABLE:
-            print("Loading Qwen2.5-0.5B model (tiny, fast, 1GB)...")
-            try:
-                # Qwen2.5-0.5B - Smallest model, ~1GB, fastest on CPU
-                # Perfect for low-resource systems
-                model_name = "Qwen/Qwen2.5-0.5B-Instruct"
-                
-                self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.llm = AutoModelForCausalLM.from_pretrained(
-                    model_name,
-                    torch_dtype=torch.float32,
-                    device_map="cpu",
-                    low_cpu_mem_usage=True
-                )
-                print("✅ Qwen2.5-0.5B loaded successfully! (~1GB model, very fast)")
-            except Exception as e:
-                print(f"Warning: Could not load model: {e}")
-                print("Using mock responses.")
-        else:
+        if not TRANSFORMERS_AVAILABLE and backend != "gguf":
             print("Warning: transformers not installed.")
             print("Install with: pip install transformers torch")
     
-    def query(self, question: str, top_k: int = 5) -> Dict[str, Any]:
-        """Process a query using RAG"""
-        import time
+    def _load_llm(self):
+        """Return the generator of the configured backend, or None if unavailable"""
+        if self._llm_unavailable or (not TRANSFORMERS_AVAILABLE and self.backend != "gguf"):
+            return None
+        try:
+            return load_generator(self.backend, self.model_name, self.model_path,
+                                  prefix_cache=self.prefix_cache)
+        except Exception as e:
+            print(f"Warning: Could not load model: {e}")
+            print("Using mock responses.")
+            self._llm_unavailable = True
+            return None
+    
+    @property
+    def llm(self):
+        return self._load_llm()
+    
+    def _retrieve(self, question: str, top_k: int, rerank: Optional[bool] = None,
+                  query_embedding: Optional[np.ndarray] = None, **search_kwargs) -> List[Dict[str, Any]]:
+        """Search the vector store, reranking over-fetched hits unless rerank is False"""
+        if self.reranker is None or rerank is False:
+            with metrics.stage("retrieve"):
+                return self.vector_store.search(question, top_k=top_k, query_embedding=query_embedding,
+                                                **search_kwargs)
+        with metrics.stage("retrieve"):
+            hits = self.vector_store.search(question, top_k=max(top_k, self.reranker.candidates),
+                                           query_embedding=query_embedding, **search_kwargs)
+        with metrics.stage("rerank"):
+            return self.reranker.rerank(question, hits, top_k)
+    
+    def query(self, question: str, top_k: int = 5, rerank: Optional[bool] = None,
+              **search_kwargs) -> Dict[str, Any]:
+        """Process a query using RAG
+        
+        Extra keyword arguments (e.g. nprobe, ef_search, filters) are passed to VectorStore.search.
+        rerank=False skips the reranking stage for this query.
+        """
         start_time = time.time()
+        question_embedding = None
         
-        # Retrieve relevant documents
-        retrieved_docs = self.vector_store.search(question, top_k=top_k)
+        # Serve repeated (or near-identical) questions from the answer cache
+        if self.answer_cache is not None:
+            reranked = self.reranker is not None and rerank is not False
+            cache_params = (top_k, reranked, json.dumps(search_kwargs, sort_keys=True, default=str))
+            corpus_version = self.vector_store.corpus_version
+            with metrics.stage("cache_lookup"):
+                cached, question_embedding = self.answer_cache.get(
+                    question, cache_params, corpus_version, self.vector_store.embed_query
+                )
+            if cached is not None:
+                processing_time = time.time() - start_time
+                self.logger.log_query(question, cached["answer"], cached["retrieved_docs"], processing_time)
+                return {
+                    "question": question,
+                    "answer": cached["answer"],
+                    "sources": cached["sources"],
+                    "processing_time": processing_time,
+                    "cached": True
+                }
+        
+        # Retrieve relevant documents, reusing the embedding a semantic cache lookup computed
+        generation = self.vector_store.generation
+        retrieved_docs = self._retrieve(question, top_k, rerank, question_embedding, **search_kwargs)
         
         if not retrieved_docs:
             response = "I don't have any relevant information to answer this question. Please upload some documents first."
@@ -63,75 +145,177 @@ class RAGPipeline:
             }
         
         # Build context from retrieved documents
-        context = self._build_context(retrieved_docs)
+        with metrics.stage("build_context"):
+            context = self._context_segments(question, retrieved_docs, generation)
         
         # Generate answer
-        answer = self._generate_answer(question, context)
+        with metrics.stage("generate"):
+            answer = self._generate_answer(question, context)
         
         processing_time = time.time() - start_time
         
         # Log the query
         self.logger.log_query(question, answer, retrieved_docs, processing_time)
         
+        sources = self._format_sources(retrieved_docs)
+        if self.answer_cache is not None and not answer.startswith("Error generating response"):
+            self.answer_cache.put(question, cache_params, corpus_version, question_embedding, {
+                "answer": answer,
+                "sources": sources,
+                "retrieved_docs": retrieved_docs
+            })
+        
         # Prepare response with evidence
         return {
             "question": question,
             "answer": answer,
-            "sources": self._format_sources(retrieved_docs),
+            "sources": sources,
             "processing_time": processing_time
         }
     
-    def _build_context(self, retrieved_docs: List[Dict[str, Any]]) -> str:
-        """Build context from retrieved documents"""
-        context_parts = []
-        # Use top 4 most relevant documents for better accuracy
-        for i, doc in enumerate(retrieved_docs[:4], 1):
+    def _context_segments(self, question: str, retrieved_docs: List[Dict[str, Any]],
+                          generation: Optional[int] = None) -> List[str]:
+        """Prompt segments of the retrieved documents that fit the model's token budget
+        
+        The budget is what the generator's input length leaves after the
+        instruction, the question and the answer; the question is never cut.
+        generation is the vector store's generation at retrieval, so hits
+        renumbered by a purge since are packed without their vectors.
+        """
+        generator = self._load_llm()
+        count_tokens = generator.count_tokens if generator is not None else approximate_tokens
+        max_length = getattr(generator, "max_length", 2048)
+        room = (max_length - self._generation_kwargs()["max_new_tokens"]
+                - count_tokens(PROMPT_PREFIX) - count_tokens(self._question_segment(question)))
+        
+        vectors = None
+        positions = [doc.get("position") for doc in retrieved_docs]
+        if self.vector_store is not None and None not in positions:
+            vectors = self.vector_store.get_vectors(positions, generation)
+        
+        def segment(number: int, doc: Dict[str, Any], content: str) -> str:
             file_path = doc["metadata"].get("file_path", "unknown")
-            doc_type = doc["metadata"].get("type", "unknown")
-            content = doc["document"][:600]  # Slightly more context for accuracy
-            
-            context_parts.append(f"[Document {i} from {file_path}]\n{content}\n")
+            return f"[Document {number} from {file_path}]\n{content}\n\n"
         
-        return "\n".join(context_parts)
+        return self.context_packer.pack(retrieved_docs, room, count_tokens, segment, vectors)
+    
+    def _build_context(self, question: str, retrieved_docs: List[Dict[str, Any]]) -> str:
+        """Build context from retrieved documents"""
+        return "".join(self._context_segments(question, retrieved_docs))
+    
+    def _question_segment(self, question: str) -> str:
+        return f"Question: {question}\n\nAnswer:"
+    
+    def _build_prompt(self, question: str, context: List[str]) -> List[str]:
+        """Build the LLM prompt as segments: constant instruction prefix, documents, question
+        
+        Segments are joined in order; keeping the instruction first and the
+        question last lets generators reuse the KV state of shared prefixes.
+        """
+        return [PROMPT_PREFIX, *context, self._question_segment(question)]
+    
+    def _generation_kwargs(self) -> Dict[str, Any]:
+        """Generation parameters tuned for accuracy + speed"""
+        return {
+            "max_new_tokens": min(self.max_tokens, 200),  # Limit for speed
+            "temperature": 0.7,
+            "do_sample": True,
+            "top_p": 0.9,
+            "repetition_penalty": 1.1
+        }
     
-    def _generate_answer(self, question: str, context: str) -> str:
+    def _generate_answer(self, question: str, context: List[str]) -> str:
         """Generate answer using LLM"""
-        # Optimized prompt for better accuracy
-        prompt = f"""Context: {context}
-
-Question: {question}
-
-Provide a clear and accurate answer based only on the context above. If the context doesn't contain the information, say "I don't have enough information to answer this question."
-
-Answer:"""
+        prompt = self._build_prompt(question, context)
         
-        if self.llm is None or self.tokenizer is None:
+        generator = self._load_llm()
+        if generator is None:
             # Mock response when model is not available
-            return f"[Mock Response] Based on the provided context, here's a summary related to your question. Install transformers to get real AI responses: pip install transformers torch"
+            return MOCK_RESPONSE
         
         try:
-            # Tokenize input with truncation for speed
-            inputs = self.tokenizer(prompt, return_tensors="pt", max_length=2048, truncation=True)
-            
-            # Generate response with optimized parameters for accuracy + speed
-            outputs = self.llm.generate(
-                **inputs,
-                max_new_tokens=min(self.max_tokens, 200),  # Limit for speed
-                temperature=0.7,
-                do_sample=True,
-                top_p=0.9,
-                repetition_penalty=1.1,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
-            
-            # Decode and extract answer
-            generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            answer = generated_text.replace(prompt, "").strip()
+            if self.scheduler is not None:
+                answer = self.scheduler.generate(prompt)
+            else:
+                answer = generator.generate(prompt, self._generation_kwargs())
             
             return answer if answer else "I cannot provide an answer based on the given context."
         except Exception as e:
             return f"Error generating response: {str(e)}"
     
+    def _stream_answer(self, question: str, context: List[str]) -> Iterator[str]:
+        """Generate an answer, yielding text pieces as the LLM produces them"""
+        prompt = self._build_prompt(question, context)
+        
+        generator = self._load_llm()
+        if generator is None:
+            yield MOCK_RESPONSE
+            return
+        
+        yield from generator.stream(prompt, self._generation_kwargs())
+    
+    def stream_query(self, question: str, top_k: int = 5, rerank: Optional[bool] = None,
+                     **search_kwargs) -> Iterator[Dict[str, Any]]:
+        """Process a query using RAG, yielding events as they become available
+        
+        Yields {"event": "sources"} first, then one {"event": "token"} per
+        generated piece of text, then {"event": "done"} with the full answer
+        and timings (time to first token, tokens/s, total latency).
+        """
+        start_time = time.time()
+        
+        generation = self.vector_store.generation
+        retrieved_docs = self._retrieve(question, top_k, rerank, **search_kwargs)
+        yield {"event": "sources", "data": {
+            "question": question,
+            "sources": self._format_sources(retrieved_docs),
+            "retrieval_time": time.time() - start_time
+        }}
+        
+        pieces = []
+        token_times = []
+        if not retrieved_docs:
+            pieces.append("I don't have any relevant information to answer this question. Please upload some documents first.")
+            token_times.append(time.time() - start_time)
+            yield {"event": "token", "data": {"text": pieces[0]}}
+        else:
+            with metrics.stage("build_context"):
+                context = self._context_segments(question, retrieved_docs, generation)
+            try:
+                with metrics.stage("generate"):
+                    for text in self._stream_answer(question, context):
+                        token_times.append(time.time() - start_time)
+                        pieces.append(text)
+                        yield {"event": "token", "data": {"text": text}}
+            except Exception as e:
+                error = f"Error generating response: {str(e)}"
+                pieces.append(error)
+                yield {"event": "error", "data": {"detail": error}}
+        
+        answer = "".join(pieces).strip()
+        processing_time = time.time() - start_time
+        if token_times:
+            metrics.observe("time_to_first_token_seconds", token_times[0])
+        timings = {
+            "time_to_first_token": token_times[0] if token_times else None,
+            "tokens": len(token_times),
+            "tokens_per_second": (
+                (len(token_times) - 1) / (token_times[-1] - token_times[0])
+                if len(token_times) > 1 and token_times[-1] > token_times[0] else None
+            ),
+            "token_offsets": [round(t, 4) for t in token_times]
+        }
+        
+        self.logger.log_query(question, answer, retrieved_docs, processing_time, timings=timings)
+        
+        yield {"event": "done", "data": {
+            "question": question,
+            "answer": answer,
+            "processing_time": processing_time,
+            "time_to_first_token": timings["time_to_first_token"],
+            "tokens_per_second": timings["tokens_per_second"]
+        }}
+    
     def _format_sources(self, retrieved_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Format source information for response"""
         sources = []
@@ -143,12 +327,19 @@ Answer:"""
                 "similarity": round(doc.get("similarity_score", 0), 3),
                 "excerpt": doc["document"][:200] + "..."
             }
+            if "rerank_score" in doc:
+                source["rerank_score"] = round(doc["rerank_score"], 3)
             
             # Add type-specific metadata
             if metadata.get("type") == "pdf":
                 source["page"] = metadata.get("page", "unknown")
             elif metadata.get("type") == "audio":
-                source["timestamp"] = metadata.get("timestamp", "unknown")
+                if "start" in metadata:
+                    source["timestamp"] = f"{metadata['start']:.1f}s - {metadata['end']:.1f}s"
+                else:
+                    source["timestamp"] = "unknown"
+            elif metadata.get("type") == "image" and "bboxes" in metadata:
+                source["bboxes"] = metadata["bboxes"]
             
             sources.append(source)
         
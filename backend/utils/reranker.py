@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from .model_registry import get_cross_encoder
+from .content_index import hash_chunk
+
+
+class Reranker:
+    """Cross-encoder reranking of retrieved chunks under a latency budget
+
+    The retriever over-fetches `candidates` hits; (query, chunk) pairs are
+    scored by a small cross-encoder in batches of `batch_size` and the hits
+    are reordered by score. Scores are cached per (query, chunk text).
+
+    The budget is enforced two ways: the number of uncached pairs is capped
+    at what the measured per-pair cost allows (so under load reranking
+    shrinks to the top candidates or is skipped), and scoring stops at the
+    deadline. Hits that were not scored keep their retrieval order behind
+    the reranked ones.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 candidates: int = 20, batch_size: int = 16, budget_ms: float = 200,
+                 cache_size: int = 10000):
+        self.model_name = model_name
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        # Moving average of seconds per scored pair, measured on every batch
+        self._pair_seconds = None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "reranked": 0, "shrunk": 0, "skipped": 0,
+                      "pairs_scored": 0, "cache_hits": 0, "total_ms": 0.0}
+
+    @property
+    def model(self):
+        """Cross-encoder, loaded lazily from the shared model registry"""
+        return get_cross_encoder(self.model_name)
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _store(self, key: Tuple[str, str], score: float):
+        with self._lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _affordable(self, budget_ms: Optional[float]) -> Optional[int]:
+        """How many uncached pairs fit in the budget (None = no limit)"""
+        if budget_ms is None or budget_ms <= 0:
+            return None
+        with self._lock:
+            pair_seconds = self._pair_seconds
+        if pair_seconds is None:
+            return None
+        return int(budget_ms / 1000 / pair_seconds)
+
+    def _record(self, pairs: int, seconds: float):
+        with self._lock:
+            per_pair = seconds / pairs
+            self._pair_seconds = per_pair if self._pair_seconds is None \
+                else 0.8 * self._pair_seconds + 0.2 * per_pair
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], top_k: int,
+               budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Reorder hits by cross-encoder score and return the top_k
+
+        budget_ms overrides the default budget; 0 or less disables it.
+        Scored hits get a "rerank_score".
+        """
+        if budget_ms is None:
+            budget_ms = self.budget_ms
+        start_time = time.time()
+        deadline = start_time + budget_ms / 1000 if budget_ms and budget_ms > 0 else None
+
+        keys = [(query, hash_chunk(hit["document"])) for hit in hits]
+        scores: Dict[int, float] = {}
+        uncached = []
+        for i, key in enumerate(keys):
+            score = self._cached(key)
+            if score is None:
+                uncached.append(i)
+            else:
+                scores[i] = score
+        cache_hits = len(scores)
+
+        # Candidates are in retrieval order, so shrinking keeps the most promising ones
+        affordable = self._affordable(budget_ms)
+        if affordable is not None and affordable < len(uncached):
+            uncached = uncached[:affordable]
+
+        for start in range(0, len(uncached), self.batch_size):
+            if deadline is not None and time.time() >= deadline:
+                break
+            batch = uncached[start:start + self.batch_size]
+            batch_start = time.time()
+            batch_scores = self.model.predict([(query, hits[i]["document"]) for i in batch],
+                                              batch_size=self.batch_size, show_progress_bar=False)
+            self._record(len(batch), time.time() - batch_start)
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self._store(keys[i], float(score))
+
+        scored = sorted(scores, key=lambda i: scores[i], reverse=True)
+        unscored = [i for i in range(len(hits)) if i not in scores]
+        results = []
+        for i in (scored + unscored)[:top_k]:
+            hit = dict(hits[i])
+            if i in scores:
+                hit["rerank_score"] = scores[i]
+            results.append(hit)
+        for rank, hit in enumerate(results):
+            hit["rank"] = rank + 1
+
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["cache_hits"] += cache_hits
+            self.stats["pairs_scored"] += len(scores) - cache_hits
+            if not scores:
+                self.stats["skipped"] += 1
+            elif len(scores) < len(hits):
+                self.stats["shrunk"] += 1
+            else:
+                self.stats["reranked"] += 1
+            self.stats["total_ms"] += (time.time() - start_time) * 1000
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.stats["requests"]
+            return {
+                "model": self.model_name,
+                "candidates": self.candidates,
+                "budget_ms": self.budget_ms,
+                "cache_entries": len(self._cache),
+                "ms_per_pair": round(self._pair_seconds * 1000, 3) if self._pair_seconds else None,
+                "avg_ms": round(self.stats["total_ms"] / requests, 2) if requests else None,
+                **{key: value for key, value in self.stats.items() if key != "total_ms"},
+            }
@@ -0,0 +1,300 @@
+import faiss
+import numpy as np
+import pickle
+import json
+import os
+import shutil
+import threading
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+
+def atomic_write(path: str, write: Callable[[Any], None], mode: str = "wb"):
+    """Write a file via a temp file, fsync and rename so readers never see a partial file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, mode) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+def _fsync_dir(path: str):
+    """Persist a rename by syncing its directory (no-op where unsupported)"""
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+COMPACTION_DIR = "compaction"
+_COMMITTED = "COMMITTED"
+
+
+def commit_compaction(db_path: str):
+    """Commit the files staged in <db_path>/compaction/ to replace their live counterparts"""
+    staging = os.path.join(db_path, COMPACTION_DIR)
+    for name in os.listdir(staging):
+        if os.path.isdir(os.path.join(staging, name)):
+            for child in os.listdir(os.path.join(staging, name)):
+                with open(os.path.join(staging, name, child), "rb") as f:
+                    os.fsync(f.fileno())
+            _fsync_dir(os.path.join(staging, name))
+    atomic_write(os.path.join(staging, _COMMITTED), lambda f: None)
+    finish_compaction(db_path)
+
+
+def finish_compaction(db_path: str) -> bool:
+    """Move a committed compaction's files into place; discard an uncommitted one
+
+    A compaction (VectorStore.purge) stages whole replacement files and
+    directories in <db_path>/compaction/ and commits them by writing a
+    marker. Moving them into place is idempotent, so a crash half way is
+    finished on the next open; the manifest moves last. Returns whether
+    files were moved.
+    """
+    staging = os.path.join(db_path, COMPACTION_DIR)
+    if not os.path.isdir(staging):
+        return False
+    if not os.path.exists(os.path.join(staging, _COMMITTED)):
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+
+    names = sorted(os.listdir(staging), key=lambda name: name == SegmentStore.MANIFEST)
+    for name in names:
+        if name == _COMMITTED:
+            continue
+        target = os.path.join(db_path, name)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(os.path.join(staging, name), target)
+    _fsync_dir(db_path)
+    shutil.rmtree(staging, ignore_errors=True)
+    return True
+
+
+def lock_directory(path: str, name: str = ".lock"):
+    """Take an exclusive lock on a data directory for the life of the process
+
+    Returns the open lock file; the lock is held until it is closed. Raises
+    RuntimeError if another process holds it.
+    """
+    os.makedirs(path, exist_ok=True)
+    handle = open(os.path.join(path, name), "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        raise RuntimeError(f"{path} is in use by another process "
+                           f"(only one server or ingest.py may write a vector store)")
+    return handle
+
+
+class SegmentStore:
+    """Append-only on-disk layout for the vector store
+
+    A compacted base snapshot holds the FAISS index; every later
+    add_documents batch is written as a small immutable segment of vectors.
+    manifest.json lists the committed base and segments plus the number of
+    committed documents, and is replaced atomically, so a crash never
+    exposes a half-written batch. Chunk text and metadata live in DocStore.
+    """
+
+    MANIFEST = "manifest.json"
+    LEGACY_BASE = "."
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.segments_dir = os.path.join(db_path, "segments")
+        os.makedirs(self.segments_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        manifest_file = os.path.join(self.db_path, self.MANIFEST)
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        # Adopt an index written by the old full-rewrite format as the base
+        legacy = os.path.exists(os.path.join(self.db_path, "faiss.index"))
+        return {
+            "version": 1,
+            "base": self.LEGACY_BASE if legacy else None,
+            "segments": [],
+            "next_id": 1,
+        }
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        atomic_write(
+            os.path.join(self.db_path, self.MANIFEST),
+            lambda f: json.dump(manifest, f, indent=2),
+            mode="w"
+        )
+        self.manifest = manifest
+
+    def _segment_paths(self, segment_id: int) -> Tuple[str, str, str]:
+        """(vectors, vector ids, legacy records) files of a segment"""
+        name = f"{segment_id:08d}"
+        return (os.path.join(self.segments_dir, name + ".npy"),
+                os.path.join(self.segments_dir, name + ".ids.npy"),
+                os.path.join(self.segments_dir, name + ".pkl"))
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.manifest["segments"])
+
+    @property
+    def doc_count(self) -> Optional[int]:
+        """Number of documents covered by the committed index (None if unknown)"""
+        return self.manifest.get("doc_count")
+
+    def load(self) -> Tuple[Optional[Any], List[Tuple[np.ndarray, Optional[np.ndarray]]],
+                            List[str], List[Dict[str, Any]]]:
+        """Load the base index and the vectors of every committed segment
+
+        Returns (base_index, segments, legacy_documents, legacy_metadata);
+        segments are (vectors, ids) pairs the caller adds to the base index in
+        order (ids is None for segments written before vectors had ids). The
+        legacy lists hold records from stores written before DocStore existed.
+        """
+        index = None
+        documents, metadata = [], []
+        base = self.manifest["base"]
+        if base is not None:
+            base_dir = os.path.join(self.db_path, base)
+            index = faiss.read_index(os.path.join(base_dir, "faiss.index"))
+            if os.path.exists(os.path.join(base_dir, "documents.pkl")):
+                with open(os.path.join(base_dir, "documents.pkl"), 'rb') as f:
+                    documents = pickle.load(f)
+                with open(os.path.join(base_dir, "metadata.pkl"), 'rb') as f:
+                    metadata = pickle.load(f)
+
+        segments = []
+        for segment_id in self.manifest["segments"]:
+            vec_file, ids_file, rec_file = self._segment_paths(segment_id)
+            ids = np.load(ids_file) if os.path.exists(ids_file) else None
+            segments.append((np.load(vec_file), ids))
+            if os.path.exists(rec_file):
+                with open(rec_file, 'rb') as f:
+                    records = pickle.load(f)
+                documents.extend(records["documents"])
+                metadata.extend(records["metadata"])
+
+        self._remove_orphans()
+        return index, segments, documents, metadata
+
+    def append(self, embeddings: np.ndarray, doc_count: int, ids: np.ndarray) -> int:
+        """Durably write one batch of vectors and their ids as a new segment and commit it"""
+        with self._lock:
+            segment_id = self.manifest["next_id"]
+            vec_file, ids_file, _ = self._segment_paths(segment_id)
+            atomic_write(vec_file, lambda f: np.save(f, embeddings))
+            atomic_write(ids_file, lambda f: np.save(f, ids))
+
+            manifest = dict(self.manifest)
+            manifest["segments"] = self.manifest["segments"] + [segment_id]
+            manifest["next_id"] = segment_id + 1
+            manifest["doc_count"] = doc_count
+            self._write_manifest(manifest)
+            return segment_id
+
+    def compact(self, index_bytes: np.ndarray, segments: List[int], doc_count: int):
+        """Replace the base and the given segments with a new base snapshot
+
+        The snapshot must contain exactly the current base plus `segments`;
+        segments committed after it was taken are kept.
+        """
+        with self._lock:
+            base_id = self.manifest["next_id"]
+            manifest = dict(self.manifest)
+            manifest["next_id"] = base_id + 1
+            # Reserve the id so concurrent appends cannot reuse it
+            self.manifest = manifest
+
+        base = f"base_{base_id:08d}"
+        base_dir = os.path.join(self.db_path, base)
+        os.makedirs(base_dir, exist_ok=True)
+        atomic_write(os.path.join(base_dir, "faiss.index"), lambda f: f.write(index_bytes.tobytes()))
+
+        with self._lock:
+            old_base = self.manifest["base"]
+            manifest = dict(self.manifest)
+            manifest["base"] = base
+            manifest["segments"] = [s for s in self.manifest["segments"] if s not in segments]
+            if manifest.get("doc_count") is None:
+                manifest["doc_count"] = doc_count
+            self._write_manifest(manifest)
+
+        # Old files are unreachable once the manifest is committed
+        for segment_id in segments:
+            for path in self._segment_paths(segment_id):
+                if os.path.exists(path):
+                    os.remove(path)
+        self._remove_base(old_base)
+
+    def stage_base(self, index_bytes: np.ndarray, doc_count: int, directory: str):
+        """Write a new base and a manifest without segments into a compaction staging directory
+
+        The live manifest and files are untouched until the staging
+        directory is committed (see commit_compaction).
+        """
+        with self._lock:
+            base_id = self.manifest["next_id"]
+            manifest = dict(self.manifest)
+            manifest["next_id"] = base_id + 1
+            # Reserve the id so concurrent appends cannot reuse it
+            self.manifest = manifest
+
+        base = f"base_{base_id:08d}"
+        os.makedirs(os.path.join(directory, base), exist_ok=True)
+        atomic_write(os.path.join(directory, base, "faiss.index"), lambda f: f.write(index_bytes.tobytes()))
+        staged = {**manifest, "base": base, "segments": [], "doc_count": doc_count}
+        atomic_write(os.path.join(directory, self.MANIFEST), lambda f: json.dump(staged, f, indent=2), mode="w")
+
+    def clear(self):
+        """Delete the base, every segment and the manifest"""
+        with self._lock:
+            self._remove_base(self.manifest["base"])
+            manifest_file = os.path.join(self.db_path, self.MANIFEST)
+            if os.path.exists(manifest_file):
+                os.remove(manifest_file)
+            shutil.rmtree(self.segments_dir, ignore_errors=True)
+            os.makedirs(self.segments_dir, exist_ok=True)
+            self.manifest = self._read_manifest()
+        self._remove_orphans()
+
+    def _remove_base(self, base: Optional[str]):
+        if base is None:
+            return
+        if base == self.LEGACY_BASE:
+            for name in ["faiss.index", "documents.pkl", "metadata.pkl"]:
+                path = os.path.join(self.db_path, name)
+                if os.path.exists(path):
+                    os.remove(path)
+        else:
+            shutil.rmtree(os.path.join(self.db_path, base), ignore_errors=True)
+
+    def _remove_orphans(self):
+        """Delete segment and base files left behind by an interrupted write"""
+        committed = set()
+        for segment_id in self.manifest["segments"]:
+            committed.update(os.path.basename(p) for p in self._segment_paths(segment_id))
+        for name in os.listdir(self.segments_dir):
+            if name not in committed:
+                os.remove(os.path.join(self.segments_dir, name))
+        for name in os.listdir(self.db_path):
+            if name.startswith("base_") and name != self.manifest["base"]:
+                shutil.rmtree(os.path.join(self.db_path, name), ignore_errors=True)
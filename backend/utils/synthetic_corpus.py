@@ -0,0 +1,196 @@
+import json
+import os
+import random
+import wave
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+TOPICS = ["retrieval", "indexing", "transcription", "invoices", "maintenance", "forecasting",
+          "compliance", "onboarding", "logistics", "security", "pricing", "research"]
+WORDS = ("system report quarter revenue customer model vector search latency throughput "
+         "document page audio image table section summary policy update review budget team "
+         "project release network storage server query answer context token embedding batch "
+         "pipeline schedule incident metric target growth region supplier contract warehouse").split()
+
+FILE_TYPES = ["pdf", "docx", "image", "audio"]
+EXTENSIONS = {"pdf": ".pdf", "docx": ".docx", "image": ".png", "audio": ".wav"}
+
+
+def sentence(rng: random.Random, topic: str) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 16))]
+    words.insert(rng.randrange(len(words)), topic)
+    return " ".join(words).capitalize() + "."
+
+
+def paragraph(rng: random.Random, topic: str, sentences: int = 6) -> str:
+    return " ".join(sentence(rng, topic) for _ in range(sentences))
+
+
+def fact(rng: random.Random, doc_id: int, topic: str) -> Dict[str, str]:
+    """A sentence with a unique code, and a question whose answer is that code"""
+    code = f"{rng.choice(WORDS).upper()}-{doc_id:04d}-{rng.randint(100, 999)}"
+    return {
+        "text": f"The {topic} reference code for file {doc_id} is {code}.",
+        "question": f"What is the {topic} reference code for file {doc_id}?",
+        "answer": code,
+    }
+
+
+def write_pdf(path: str, pages: List[str], line_chars: int = 90):
+    """Minimal text PDF (Helvetica, one content stream per page) readable by PyPDF2"""
+    def escape(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        words, lines, line = text.split(), [], ""
+        for word in words:
+            if line and len(line) + len(word) + 1 > line_chars:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.append(line)
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({escape(l)}) Tj T*" for l in lines) + " ET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+
+
+def write_docx(path: str, paragraphs: List[str]):
+    from docx import Document
+
+    document = Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    document.save(path)
+
+
+def write_image(path: str, lines: List[str], width: int = 2400, font_size: int = 28):
+    """White page with black text lines, large enough for OCR"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", font_size)
+    except OSError:
+        font = ImageFont.load_default()
+    line_height = int(font_size * 1.6)
+    image = Image.new("RGB", (width, line_height * (len(lines) + 2)), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((40, line_height * (i + 1)), line, fill="black", font=font)
+    image.save(path)
+
+
+def write_wav(path: str, seconds: float, rng: random.Random, sample_rate: int = 16000):
+    """Mono 16-bit WAV of voiced-like tone bursts separated by pauses
+
+    There is no offline text-to-speech here, so the audio carries no words;
+    it exercises decoding, VAD windowing and Whisper inference time.
+    """
+    samples = []
+    remaining = int(seconds * sample_rate)
+    while remaining > 0:
+        burst = min(int(rng.uniform(0.5, 3.0) * sample_rate), remaining)
+        t = np.arange(burst) / sample_rate
+        pitch = rng.uniform(110, 260)
+        tone = sum(np.sin(2 * np.pi * pitch * h * t) / h for h in range(1, 5))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(2, 6) * t)
+        samples.append(0.2 * tone * envelope)
+        remaining -= burst
+        pause = min(int(rng.uniform(0.2, 1.0) * sample_rate), remaining)
+        samples.append(np.zeros(pause))
+        remaining -= pause
+    audio = np.concatenate(samples) if samples else np.zeros(0)
+    audio += np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, 0.003, len(audio))
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+def generate_corpus(out_dir: str, counts: Optional[Dict[str, int]] = None, pages: int = 5,
+                    audio_seconds: float = 20.0, seed: int = 0) -> Dict[str, Any]:
+    """Write a reproducible corpus of PDF, DOCX, image and audio files
+
+    counts maps file type to number of files; pages is the number of PDF
+    pages (DOCX paragraphs and image text blocks scale with it). Every text
+    file carries one fact with a unique code, so queries have a known
+    answer. The same seed always produces the same files. Returns the
+    manifest, also written to out_dir/manifest.json.
+    """
+    counts = {file_type: 2 for file_type in FILE_TYPES} if counts is None else counts
+    unknown = set(counts) - set(FILE_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown file types: {sorted(unknown)} (expected {FILE_TYPES})")
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+
+    files, queries = [], []
+    doc_id = 0
+    for file_type in FILE_TYPES:
+        for _ in range(counts.get(file_type, 0)):
+            topic = rng.choice(TOPICS)
+            path = os.path.join(out_dir, f"{file_type}_{doc_id:04d}{EXTENSIONS[file_type]}")
+            planted = fact(rng, doc_id, topic) if file_type != "audio" else None
+            if file_type == "pdf":
+                texts = [paragraph(rng, topic, 12) for _ in range(pages)]
+                texts[rng.randrange(pages)] += " " + planted["text"]
+                write_pdf(path, texts)
+            elif file_type == "docx":
+                texts = [paragraph(rng, topic) for _ in range(pages * 3)]
+                texts.insert(rng.randrange(len(texts)), planted["text"])
+                write_docx(path, texts)
+            elif file_type == "image":
+                texts = [sentence(rng, topic) for _ in range(pages * 2)]
+                texts.insert(rng.randrange(len(texts)), planted["text"])
+                write_image(path, texts)
+            else:
+                write_wav(path, audio_seconds, rng)
+            files.append({"path": path, "type": file_type, "topic": topic, "bytes": os.path.getsize(path)})
+            if planted is not None:
+                queries.append({"question": planted["question"], "answer": planted["answer"],
+                                "file": os.path.basename(path)})
+            doc_id += 1
+
+    manifest = {"seed": seed, "pages": pages, "audio_seconds": audio_seconds,
+                "counts": counts, "files": files, "queries": queries}
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def synthetic_chunks(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """count (text, metadata) chunks for store-level benchmarks, without writing files"""
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(count):
+        topic = rng.choice(TOPICS)
+        chunks.append({"text": paragraph(rng, topic, rng.randint(3, 8)),
+                       "metadata": {"chunk_id": i, "type": rng.choice(FILE_TYPES), "topic": topic}})
+    return chunks
+
+
+def synthetic_queries(count: int, seed: int = 1) -> List[str]:
+    """count search queries over the synthetic vocabulary"""
+    rng = random.Random(seed)
+    return [" ".join([rng.choice(TOPICS)] + [rng.choice(WORDS) for _ in range(rng.randint(2, 6))])
+            for _ in range(count)]
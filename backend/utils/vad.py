@@ -0,0 +1,59 @@
+import numpy as np
+from typing import List, Tuple
+
+
+def speech_regions(audio: np.ndarray, sample_rate: int = 16000, frame_ms: int = 30,
+                   dynamic_range_db: float = 40.0, floor_db: float = -60.0,
+                   min_silence_ms: int = 400, padding_ms: int = 200) -> List[Tuple[int, int]]:
+    """Energy-based voice activity detection
+
+    A frame counts as speech when its RMS level is above `floor_db` dBFS
+    and within `dynamic_range_db` of the loudest frame. Pauses shorter than
+    `min_silence_ms` are bridged and every region is padded by
+    `padding_ms`. Returns (start, end) sample offsets.
+    """
+    frame = max(1, sample_rate * frame_ms // 1000)
+    num_frames = len(audio) // frame
+    if num_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    frames = audio[:num_frames * frame].reshape(num_frames, frame).astype(np.float32)
+    level_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    threshold = max(floor_db, level_db.max() - dynamic_range_db)
+    speech = level_db > threshold
+
+    regions = []
+    max_gap = min_silence_ms // frame_ms
+    start = last = None
+    for i in np.flatnonzero(speech):
+        if start is None:
+            start = last = i
+        elif i - last > max_gap:
+            regions.append((start, last + 1))
+            start = i
+        last = i
+    if start is not None:
+        regions.append((start, last + 1))
+
+    pad = sample_rate * padding_ms // 1000
+    return [(int(max(0, s * frame - pad)), int(min(len(audio), e * frame + pad))) for s, e in regions]
+
+
+def speech_windows(audio: np.ndarray, sample_rate: int = 16000,
+                   max_seconds: float = 30.0, **vad_kwargs) -> List[Tuple[int, int]]:
+    """Group speech regions into windows of at most `max_seconds`
+
+    Windows end at silences where possible; a region longer than the limit
+    is cut into fixed-length pieces.
+    """
+    max_samples = int(max_seconds * sample_rate)
+    windows = []
+    for start, end in speech_regions(audio, sample_rate, **vad_kwargs):
+        while end - start > max_samples:
+            windows.append((start, start + max_samples))
+            start += max_samples
+        if windows and end - windows[-1][0] <= max_samples:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+    return windows
@@ -1,106 +1,745 @@
-from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
-import pickle
 import os
-from typing import List, Dict, Any
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from .model_registry import get_embedding_model
+from .segment_store import (SegmentStore, atomic_write, commit_compaction, finish_compaction,
+                            COMPACTION_DIR)
+from .doc_store import DocStore
+from .micro_batcher import MicroBatcher
+from .bm25_index import BM25Index
+from .metadata_index import MetadataIndex
+from .metrics import metrics
+from .faiss_index import (build_index, with_ids, index_contents, remove_ids, renumber_ids,
+                          get_index_type, search_params, recall_vs_latency)
 
 class VectorStore:
     """FAISS-based vector store for embeddings"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", db_path: str = "./data/vector_db"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", db_path: str = "./data/vector_db",
+                 compact_threshold: int = 16, index_type: str = "flat",
+                 index_params: Optional[Dict[str, int]] = None,
+                 search_batch_size: int = 32, search_batch_wait_ms: float = 2,
+                 lexical_weight: float = 0.5, fusion_depth: int = 50,
+                 exact_filter_limit: int = 50000, purge_ratio: float = 0.1,
+                 embedding_backend: str = "torch"):
+        self.model_name = model_name
+        # Embedder inference backend: torch (fp32), int8 or onnx
+        self.embedding_backend = embedding_backend
         self.db_path = db_path
+        self.compact_threshold = compact_threshold
+        self._compactor = None
+        # Tombstoned vectors are purged from the index once they exceed this share of it
+        self.purge_ratio = purge_ratio
+        self._purger = None
+        # Target ANN index; the store starts flat and migrates once it can train
+        self.index_type = index_type
+        self.index_params = {
+            "train_size": 10000, "nlist": 1024, "pq_m": 48, "hnsw_m": 32,
+            "nprobe": 16, "ef_search": 64,
+            **(index_params or {})
+        }
+        self.index_report = None
+        self._migrator = None
+        # Bumped on every change to the corpus so caches can invalidate
+        self.corpus_version = 0
+        # Concurrent search() calls are micro-batched when search_batch_size > 1
+        self.batcher = None
+        if search_batch_size > 1:
+            self.batcher = MicroBatcher(self._search_batch, max_batch_size=search_batch_size,
+                                        max_wait_ms=search_batch_wait_ms, name="search-batcher")
         self.dimension = 384  # Default for MiniLM
         self.index = None
-        self.documents = []
-        self.metadata = []
+        # Default share of lexical evidence in fusion (0 = dense only, 1 = BM25 only)
+        self.lexical_weight = lexical_weight
+        # Hits taken from each retriever before reciprocal-rank fusion
+        self.fusion_depth = fusion_depth
+        # Filters matching at most this many chunks are scored exactly on just those vectors
+        self.exact_filter_limit = exact_filter_limit
+        self.tombstone_file = os.path.join(db_path, "tombstones.bin")
+        # Guards the index and document store against concurrent ingest jobs
+        self._lock = threading.RLock()
+        # Serializes snapshots, and index rebuilds (migration, purge) against each other
+        self._compact_lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        # Writers hold positions (hold_positions) so purge() renumbers only between them
+        self._holds = 0
+        self._renumbering = False
+        self._holds_changed = threading.Condition()
+        # search() reads several stores in turn; purge() swaps them in only between searches
+        self._readers = 0
+        self._swapping = False
+        self._readers_changed = threading.Condition()
+        # Objects that store positions and are renumbered by purge() (see track_positions)
+        self._position_owners = []
+        # Bumped whenever purge() renumbers positions
+        self.generation = 0
         
-        # Try to load existing index
+        self._open()
+        self._maybe_migrate()
+        self._maybe_purge()
+    
+    def _open(self):
+        """Open the on-disk stores and load the index"""
+        # A purge interrupted after its commit is finished before anything is read
+        finish_compaction(self.db_path)
+        self.store = SegmentStore(self.db_path)
+        # Chunk text and metadata stay on disk (mmap) instead of in Python lists
+        self.docs = DocStore(os.path.join(self.db_path, "docs"))
+        # BM25 index over the same positions, fused with dense hits at search time
+        self.lexical = BM25Index(os.path.join(self.db_path, "bm25"))
+        # Filterable metadata columns; filtered searches scan only matching positions
+        self.metadata_index = MetadataIndex(os.path.join(self.db_path, "meta"))
+        # Positions of deleted/superseded chunks not yet purged; vectors are
+        # stored under their position as id
+        self.tombstones = set()
+        if os.path.exists(self.tombstone_file):
+            self.tombstones = set(np.fromfile(self.tombstone_file, dtype=np.int64).tolist())
         self._load_index()
     
+    @property
+    def model(self):
+        """Embedding model, loaded lazily from the shared model registry"""
+        return get_embedding_model(self.model_name, backend=self.embedding_backend)
+    
     def _load_index(self):
-        """Load existing FAISS index and metadata"""
-        index_file = os.path.join(self.db_path, "faiss.index")
-        docs_file = os.path.join(self.db_path, "documents.pkl")
-        meta_file = os.path.join(self.db_path, "metadata.pkl")
-        
-        if os.path.exists(index_file):
-            self.index = faiss.read_index(index_file)
-            with open(docs_file, 'rb') as f:
-                self.documents = pickle.load(f)
-            with open(meta_file, 'rb') as f:
-                self.metadata = pickle.load(f)
-            print(f"Loaded existing index with {len(self.documents)} documents")
+        """Load the base snapshot and replay committed segments"""
+        index, segments, legacy_documents, legacy_metadata = self.store.load()
+        
+        if index is None:
+            index = faiss.IndexFlatL2(self.dimension)
+        # Indexes written before vectors had ids are converted once and re-snapshotted
+        converted = with_ids(index)
+        resnapshot = converted is not index and converted.ntotal > 0
+        index = converted
+        for vectors, ids in segments:
+            if ids is None:
+                # Segment from before vectors had ids: ids were their positions
+                ids = np.arange(index.ntotal, index.ntotal + len(vectors), dtype=np.int64)
+            index.add_with_ids(vectors, ids)
+        self.index = index
+        
+        # Drop documents whose vectors were never committed
+        if self.store.doc_count is not None:
+            self.docs.truncate(self.store.doc_count)
+        
+        if legacy_documents and len(self.docs) == 0:
+            print(f"Migrating {len(legacy_documents)} pickled documents to the document store...")
+            self.docs.append(legacy_documents, legacy_metadata)
+            self.compact(force=True)
+        
+        self.lexical.load(self.docs)
+        self.metadata_index.load(self.docs)
+        self.metadata_index.remove(list(self.tombstones))
+        if resnapshot:
+            self.compact(force=True)
+        
+        current_type = get_index_type(self.index)
+        if current_type not in ("flat", self.index_type):
+            print(f"Warning: stored index is {current_type}, configured {self.index_type}; "
+                  f"keeping {current_type}")
+        
+        if self.index.ntotal:
+            print(f"Loaded existing index with {self.index.ntotal - len(self.tombstones)} documents "
+                  f"({self.store.segment_count} segments)")
         else:
-            self.index = faiss.IndexFlatL2(self.dimension)
             print("Created new FAISS index")
     
-    def _save_index(self):
-        """Save FAISS index and metadata"""
-        os.makedirs(self.db_path, exist_ok=True)
+    def compact(self, force: bool = False):
+        """Merge all committed segments into a new base snapshot"""
+        with self._compact_lock:
+            with self._lock:
+                segments = list(self.store.manifest["segments"])
+                if not segments and not force:
+                    return
+                # Snapshot under the lock, write to disk outside it
+                index_bytes = faiss.serialize_index(self.index)
+                doc_count = len(self.docs)
+            
+            self.store.compact(index_bytes, segments, doc_count)
+            self.lexical.save()
+        print(f"Compacted {len(segments)} segments into a new base snapshot")
+    
+    def _maybe_compact(self):
+        """Start a background compaction once enough segments have accumulated"""
+        if self.store.segment_count < self.compact_threshold:
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
         
-        index_file = os.path.join(self.db_path, "faiss.index")
-        docs_file = os.path.join(self.db_path, "documents.pkl")
-        meta_file = os.path.join(self.db_path, "metadata.pkl")
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Warning: vector store compaction failed: {e}")
         
-        faiss.write_index(self.index, index_file)
-        with open(docs_file, 'wb') as f:
-            pickle.dump(self.documents, f)
-        with open(meta_file, 'wb') as f:
-            pickle.dump(self.metadata, f)
+        self._compactor = threading.Thread(target=run, name="vector-compactor", daemon=True)
+        self._compactor.start()
     
-    def add_documents(self, documents: List[str], metadata: List[Dict[str, Any]]):
-        """Add documents to the vector store"""
-        if not documents:
+    def _maybe_migrate(self):
+        """Start a background flat -> ANN migration once enough vectors exist to train"""
+        if self.index_type == "flat" or get_index_type(self.index) != "flat":
+            return
+        if self.index.ntotal < self.index_params["train_size"]:
+            return
+        if self._migrator is not None and self._migrator.is_alive():
+            return
+        
+        def run():
+            try:
+                self._migrate()
+            except Exception as e:
+                print(f"Warning: index migration to {self.index_type} failed: {e}")
+        
+        self._migrator = threading.Thread(target=run, name="vector-migrator", daemon=True)
+        self._migrator.start()
+    
+    def _migrate(self):
+        """Train the configured ANN index on the current vectors and swap it in"""
+        with self._rebuild_lock:
+            with self._lock:
+                ntotal = self.index.ntotal
+                ids, vectors = index_contents(self.index)
+            
+            print(f"Training {self.index_type} index on {ntotal} vectors...")
+            params = self.index_params
+            index = build_index(self.index_type, self.dimension, ntotal,
+                                nlist=params["nlist"], pq_m=params["pq_m"], hnsw_m=params["hnsw_m"])
+            index.train(vectors)
+            index.add_with_ids(vectors, ids)
+            self.index_report = recall_vs_latency(vectors, index, ids=ids)
+            
+            with self._lock:
+                # Catch up with vectors added while training
+                if self.index.ntotal > ntotal:
+                    new_ids, new_vectors = index_contents(self.index, start=ntotal)
+                    index.add_with_ids(new_vectors, new_ids)
+                self.index = index
+            print(f"Migrated vector store to {self.index_type} index")
+            
+            # Persist the trained index so restarts do not retrain
+            self.compact(force=True)
+    
+    def _maybe_purge(self):
+        """Start a background purge once tombstones pass purge_ratio of the index"""
+        if not self.tombstones or len(self.tombstones) < self.purge_ratio * self.index.ntotal:
+            return
+        if self._purger is not None and self._purger.is_alive():
             return
         
-        # Generate embeddings
-        embeddings = self.model.encode(documents, show_progress_bar=True)
-        embeddings = np.array(embeddings).astype('float32')
+        def run():
+            try:
+                self.purge()
+            except Exception as e:
+                print(f"Warning: vector store purge failed: {e}")
         
-        # Add to FAISS index
-        self.index.add(embeddings)
+        self._purger = threading.Thread(target=run, name="vector-purger", daemon=True)
+        self._purger.start()
+    
+    def track_positions(self, owner):
+        """Register an object that stores positions, renumbered along with the store by purge()
+
+        owner provides stage_renumber(remap, directory), writing its renumbered
+        files into the purge's staging directory, and apply_renumber(), called
+        once the purge has committed (see ContentIndex).
+        """
+        if owner not in self._position_owners:
+            self._position_owners.append(owner)
+    
+    @contextmanager
+    def hold_positions(self):
+        """Keep positions stable while the block runs; purge() renumbers only when none are held
         
-        # Store documents and metadata
-        self.documents.extend(documents)
-        self.metadata.extend(metadata)
+        Callers that keep positions across calls (ingestion, deletes) hold them.
+        """
+        with self._holds_changed:
+            self._holds_changed.wait_for(lambda: not self._renumbering)
+            self._holds += 1
+        try:
+            yield
+        finally:
+            with self._holds_changed:
+                self._holds -= 1
+                self._holds_changed.notify_all()
+    
+    @contextmanager
+    def _renumber_window(self):
+        """Wait until no positions are held and keep new holders out until the block ends"""
+        with self._holds_changed:
+            self._holds_changed.wait_for(lambda: self._holds == 0)
+            self._renumbering = True
+        try:
+            yield
+        finally:
+            with self._holds_changed:
+                self._renumbering = False
+                self._holds_changed.notify_all()
+    
+    @contextmanager
+    def _reading(self):
+        """Keep purge() from swapping in renumbered stores while a search reads them"""
+        with self._readers_changed:
+            self._readers_changed.wait_for(lambda: not self._swapping)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._readers_changed:
+                self._readers -= 1
+                self._readers_changed.notify_all()
+    
+    @contextmanager
+    def _swap_window(self):
+        """Turn new searches away and wait for running ones before the stores are swapped"""
+        with self._readers_changed:
+            self._swapping = True
+            self._readers_changed.wait_for(lambda: self._readers == 0)
+        try:
+            yield
+        finally:
+            with self._readers_changed:
+                self._swapping = False
+                self._readers_changed.notify_all()
+    
+    def purge(self):
+        """Drop tombstoned chunks from every store and renumber the survivors from 0
         
-        # Save to disk
-        self._save_index()
+        Live rows of the document store, BM25 postings, metadata columns and
+        FAISS ids are rewritten into fresh files, with positions remapped in
+        order; tracked owners (the content index) are renumbered the same
+        way. Everything is staged in <db_path>/compaction/ and committed at
+        once (see finish_compaction), so a crash leaves either the old store
+        or the new one. Searches keep running on the old store until the swap;
+        writers wait in hold_positions(). HNSW graphs do not support removal
+        and are rebuilt from the surviving vectors.
+        """
+        with self._rebuild_lock, self._renumber_window(), self._compact_lock:
+            with self._lock:
+                count = len(self.docs)
+                doomed = np.array(sorted(p for p in self.tombstones if p < count), dtype=np.int64)
+                if len(doomed) == 0:
+                    return
+                hnsw = get_index_type(self.index) == "hnsw"
+                if hnsw:
+                    ids, vectors = index_contents(self.index)
+                else:
+                    index = faiss.clone_index(self.index)
+            
+            keep = np.ones(count, dtype=bool)
+            keep[doomed] = False
+            positions = np.flatnonzero(keep)
+            remap = np.full(count, -1, dtype=np.int64)
+            remap[positions] = np.arange(len(positions), dtype=np.int64)
+            
+            if hnsw:
+                alive = remap[ids] >= 0
+                index = build_index("hnsw", self.dimension, int(alive.sum()),
+                                    hnsw_m=self.index_params["hnsw_m"])
+                index.add_with_ids(vectors[alive], remap[ids[alive]])
+            else:
+                remove_ids(index, doomed)
+                renumber_ids(index, remap)
+            
+            staging = os.path.join(self.db_path, COMPACTION_DIR)
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            self.docs.compact_into(os.path.join(staging, "docs"), positions)
+            self.lexical.compact_into(os.path.join(staging, "bm25"), remap)
+            self.metadata_index.compact_into(os.path.join(staging, "meta"), positions)
+            for owner in self._position_owners:
+                owner.stage_renumber(remap, staging)
+            atomic_write(os.path.join(staging, os.path.basename(self.tombstone_file)), lambda f: None)
+            self.store.stage_base(faiss.serialize_index(index), len(positions), staging)
+            
+            with self._swap_window(), self._lock:
+                self.docs.close()
+                commit_compaction(self.db_path)
+                self._open()
+                for owner in self._position_owners:
+                    owner.apply_renumber()
+                self.generation += 1
+                self.corpus_version += 1
+        print(f"Purged {len(doomed)} deleted chunks; renumbered {len(positions)} live chunks")
+    
+    def reset(self):
+        """Delete every document, vector and index file and start empty"""
+        for thread in [self._compactor, self._migrator, self._purger]:
+            if thread is not None:
+                thread.join()
+        with self._rebuild_lock, self._compact_lock, self._lock:
+            self.docs.close()
+            self.store.clear()
+            for name in ["docs", "bm25", "meta"]:
+                shutil.rmtree(os.path.join(self.db_path, name), ignore_errors=True)
+            if os.path.exists(self.tombstone_file):
+                os.remove(self.tombstone_file)
+            self.index_report = None
+            self._open()
+            self.generation += 1
+            self.corpus_version += 1
+        print("Reset vector store")
+    
+    def embed(self, documents: List[str], batch_size: int = 32) -> np.ndarray:
+        """Generate embeddings for documents without touching the index"""
+        embeddings = self.model.encode(documents, batch_size=batch_size, show_progress_bar=True)
+        metrics.inc("embedded_texts_total", len(documents), kind="documents")
+        return np.array(embeddings).astype('float32')
+    
+    def count_tokens(self, text: str) -> int:
+        """Number of embedding-model tokens in text (used to size chunks)"""
+        return len(self.model.tokenizer.encode(text, add_special_tokens=False))
+    
+    def get_embeddings(self, positions: List[int], generation: Optional[int] = None) -> Optional[np.ndarray]:
+        """Stored embeddings of chunk positions, as added (None if the index cannot return them)"""
+        if not positions:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return None
+            try:
+                return self.index.reconstruct_batch(np.array(positions, dtype=np.int64))
+            except (RuntimeError, AttributeError):
+                return None
+    
+    def get_vectors(self, positions: List[int], generation: Optional[int] = None) -> Optional[np.ndarray]:
+        """Unit-length stored embeddings of chunk positions (None if the index cannot return them)
+        
+        generation is the store's generation when the positions were
+        retrieved; if a purge has renumbered them since, None is returned.
+        """
+        vectors = self.get_embeddings(positions, generation)
+        if vectors is None:
+            return None
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+    
+    def get_chunks(self, positions: List[int]) -> Tuple[List[str], List[Dict[str, Any]], Dict[str, Any]]:
+        """Text and own metadata of chunks, and the file metadata of the first, for copying them"""
+        with self._lock:
+            documents = [self.docs.get_document(position) for position in positions]
+            parts = [self.docs.get_parts(position) for position in positions]
+        return documents, [chunk_meta for chunk_meta, _ in parts], parts[0][1] if parts else {}
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embedding of a single query as search() computes it (pass it back as query_embedding)"""
+        with metrics.stage("embed_query"):
+            embedding = np.array(self.model.encode([query])[0]).astype('float32')
+        metrics.inc("embedded_texts_total", kind="queries")
+        return embedding
+    
+    def add_documents(self, documents: List[str], metadata: List[Dict[str, Any]],
+                      embeddings: Optional[np.ndarray] = None,
+                      file_metadata: Optional[Dict[str, Any]] = None) -> List[int]:
+        """Add documents to the vector store and return their positions
+        
+        file_metadata is shared by every chunk and stored once rather than
+        copied into each chunk's metadata.
+        """
+        if not documents:
+            return []
+        
+        # Generate embeddings (callers may pass precomputed ones)
+        if embeddings is None:
+            embeddings = self.embed(documents)
+        
+        with self.hold_positions(), self._lock:
+            # Store documents and metadata
+            first = self.docs.append(documents, metadata, file_metadata=file_metadata)
+            self.lexical.add(first, documents)
+            self.metadata_index.add(first, [{**(file_metadata or {}), **meta} for meta in metadata])
+            
+            # Add to FAISS index, keyed by document position
+            ids = np.arange(first, first + len(documents), dtype=np.int64)
+            self.index.add_with_ids(embeddings, ids)
+            
+            # Persist only the new batch as an append-only segment
+            self.store.append(embeddings, len(self.docs), ids)
+            self.corpus_version += 1
+        
+        self._maybe_compact()
+        self._maybe_migrate()
         
         print(f"Added {len(documents)} documents to vector store")
+        return list(range(first, first + len(documents)))
+    
+    def add_many(self, batches: List[Tuple[List[str], List[Dict[str, Any]], Optional[Dict[str, Any]]]],
+                 embeddings: np.ndarray) -> List[List[int]]:
+        """Add several files' (documents, metadata, file_metadata) as one segment
+        
+        embeddings holds the vectors of all batches in order. Returns the
+        positions of each batch.
+        """
+        positions = []
+        with self.hold_positions(), self._lock:
+            start = len(self.docs)
+            for documents, metadata, file_metadata in batches:
+                if not documents:
+                    positions.append([])
+                    continue
+                first = self.docs.append(documents, metadata, file_metadata=file_metadata)
+                self.lexical.add(first, documents)
+                self.metadata_index.add(first, [{**(file_metadata or {}), **meta} for meta in metadata])
+                positions.append(list(range(first, first + len(documents))))
+            
+            ids = np.arange(start, len(self.docs), dtype=np.int64)
+            self.index.add_with_ids(embeddings, ids)
+            self.store.append(embeddings, len(self.docs), ids)
+            self.corpus_version += 1
+        
+        self._maybe_compact()
+        self._maybe_migrate()
+        
+        print(f"Added {len(embeddings)} documents from {len(batches)} files to vector store")
+        return positions
+    
+    def delete_positions(self, positions: List[int]):
+        """Tombstone chunks so they no longer appear in search results
+        
+        Their vectors are removed from the index by the next purge.
+        """
+        with self.hold_positions(), self._lock:
+            positions = [p for p in positions if p not in self.tombstones]
+            if not positions:
+                return
+            with open(self.tombstone_file, "ab") as f:
+                f.write(np.array(positions, dtype=np.int64).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self.tombstones.update(positions)
+            self.metadata_index.remove(positions)
+            self.corpus_version += 1
+        
+        self._maybe_purge()
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar documents"""
+    def search(self, query: str, top_k: int = 5, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None,
+               lexical_weight: Optional[float] = None,
+               filters: Optional[Dict[str, Any]] = None,
+               query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Hybrid search: dense FAISS hits fused with BM25 hits
+        
+        nprobe (IVF) and ef_search (HNSW) trade recall for speed per query.
+        lexical_weight overrides the default share of BM25 in the fusion.
+        filters (see MetadataIndex) restrict both retrievers to matching
+        chunks before scoring. query_embedding (from embed_query) skips
+        encoding the query again. Concurrent unfiltered calls are merged
+        into one encode and one FAISS search.
+        """
+        with self._reading():
+            return self._search(query, top_k, nprobe, ef_search, lexical_weight, filters, query_embedding)
+    
+    def _search(self, query: str, top_k: int, nprobe: Optional[int], ef_search: Optional[int],
+                lexical_weight: Optional[float], filters: Optional[Dict[str, Any]],
+                query_embedding: Optional[np.ndarray]) -> List[Dict[str, Any]]:
         if self.index.ntotal == 0:
             return []
+        # Deletes grow the tombstone set meanwhile; search against a consistent snapshot
+        tombstones = self._deleted()
         
-        # Generate query embedding
-        query_embedding = self.model.encode([query])
-        query_embedding = np.array(query_embedding).astype('float32')
+        allowed = None
+        if filters:
+            with metrics.stage("filter"):
+                allowed = self.metadata_index.mask(filters, exclude=tombstones)
+            if not allowed.any():
+                return []
         
-        # Search in FAISS
-        distances, indices = self.index.search(query_embedding, min(top_k, self.index.ntotal))
+        weight = self.lexical_weight if lexical_weight is None else min(max(lexical_weight, 0.0), 1.0)
+        if weight <= 0:
+            with metrics.stage("dense_search"):
+                return self._dense_search(query, top_k, nprobe, ef_search, allowed, query_embedding)
         
-        # Prepare results
-        results = []
-        for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(self.documents):
-                results.append({
-                    "rank": i + 1,
-                    "document": self.documents[idx],
-                    "metadata": self.metadata[idx],
-                    "similarity_score": float(1 / (1 + dist))  # Convert distance to similarity
-                })
+        depth = max(top_k, self.fusion_depth)
+        dense = []
+        if weight < 1:
+            with metrics.stage("dense_search"):
+                dense = self._dense_search(query, depth, nprobe, ef_search, allowed, query_embedding)
+        with metrics.stage("lexical_search"):
+            lexical = self.lexical.search(query, top_k=depth, exclude=tombstones, allowed=allowed)
+        with metrics.stage("fusion"):
+            return self._fuse(dense, lexical, weight, top_k)
+    
+    def _deleted(self) -> frozenset:
+        """Snapshot of the tombstoned positions"""
+        with self._lock:
+            return frozenset(self.tombstones)
+    
+    def _dense_search(self, query: str, top_k: int, nprobe: Optional[int],
+                      ef_search: Optional[int], allowed: Optional[np.ndarray] = None,
+                      query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        if allowed is not None:
+            return self._filtered_search(query, np.flatnonzero(allowed), top_k, nprobe, ef_search, query_embedding)
+        if self.batcher is not None:
+            return self.batcher((query, top_k, nprobe, ef_search, query_embedding))
+        return self.search_many([query], top_k=top_k, nprobe=nprobe, ef_search=ef_search,
+                                query_embeddings=[query_embedding])[0]
+    
+    def _filtered_search(self, query: str, candidates: np.ndarray, top_k: int,
+                         nprobe: Optional[int], ef_search: Optional[int],
+                         query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Dense search restricted to candidate positions
+        
+        Small candidate sets are scored exactly on their reconstructed vectors,
+        so the cost scales with the filter, not the corpus. Larger ones use a
+        FAISS ID selector, widening nprobe/efSearch by the filter's selectivity
+        so the ANN probes still reach enough matching vectors.
+        """
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        query_embedding = np.asarray(query_embedding, dtype='float32').reshape(1, -1)
         
+        with self._lock:
+            candidates = candidates[candidates < len(self.docs)].astype(np.int64)
+            # Chunks deleted (and maybe purged) since the filter mask was taken
+            candidates = candidates[self.metadata_index.alive(candidates)]
+            if len(candidates) == 0:
+                return []
+            k = min(top_k, len(candidates))
+            
+            if len(candidates) <= self.exact_filter_limit:
+                vectors = self.index.reconstruct_batch(candidates)
+                distances = ((vectors - query_embedding) ** 2).sum(axis=1)
+                best = np.argpartition(distances, k - 1)[:k]
+                best = best[np.argsort(distances[best])]
+                return [self._hit(int(candidates[i]), float(distances[i]), rank + 1)
+                        for rank, i in enumerate(best)]
+            
+            widen = max(self.index.ntotal / len(candidates), 1.0)
+            selector = faiss.IDSelectorBatch(len(candidates), faiss.swig_ptr(candidates))
+            params = search_params(
+                self.index,
+                nprobe=int(np.ceil((nprobe or self.index_params["nprobe"]) * widen)),
+                ef_search=int(np.ceil((ef_search or self.index_params["ef_search"]) * widen)),
+                sel=selector
+            )
+            with metrics.stage("faiss_search"):
+                distances, indices = self.index.search(query_embedding, k, params=params)
+            return [self._hit(int(idx), float(dist), rank + 1)
+                    for rank, (dist, idx) in enumerate(zip(distances[0], indices[0])) if idx >= 0]
+    
+    def _hit(self, position: int, distance: float, rank: int) -> Dict[str, Any]:
+        return {
+            "rank": rank,
+            "position": position,
+            "document": self.docs.get_document(position),
+            "metadata": self.docs.get_metadata(position),
+            "similarity_score": float(1 / (1 + distance))  # Convert distance to similarity
+        }
+    
+    def _fuse(self, dense: List[Dict[str, Any]], lexical: List[tuple],
+              weight: float, top_k: int, k: int = 60) -> List[Dict[str, Any]]:
+        """Weighted reciprocal-rank fusion of dense results and (position, score) BM25 hits"""
+        fused = {}
+        for rank, hit in enumerate(dense):
+            fused[hit["position"]] = {**hit, "lexical_score": 0.0,
+                                      "fusion_score": (1 - weight) / (k + rank + 1)}
+        for rank, (position, score) in enumerate(lexical):
+            if position not in fused:
+                fused[position] = {
+                    "position": position,
+                    "document": self.docs.get_document(position),
+                    "metadata": self.docs.get_metadata(position),
+                    "similarity_score": 0.0,
+                    "fusion_score": 0.0
+                }
+            fused[position]["lexical_score"] = score
+            fused[position]["fusion_score"] += weight / (k + rank + 1)
+        
+        results = sorted(fused.values(), key=lambda hit: hit["fusion_score"], reverse=True)[:top_k]
+        for rank, hit in enumerate(results):
+            hit["rank"] = rank + 1
         return results
     
+    def _search_batch(self, requests: List[tuple]) -> List[List[Dict[str, Any]]]:
+        """MicroBatcher callback: run queued searches grouped by their search parameters"""
+        results = [None] * len(requests)
+        groups = {}
+        for i, (_, _, nprobe, ef_search, _) in enumerate(requests):
+            groups.setdefault((nprobe, ef_search), []).append(i)
+        
+        for (nprobe, ef_search), positions in groups.items():
+            top_k = max(requests[i][1] for i in positions)
+            found = self.search_many([requests[i][0] for i in positions], top_k=top_k,
+                                     nprobe=nprobe, ef_search=ef_search,
+                                     query_embeddings=[requests[i][4] for i in positions])
+            for i, hits in zip(positions, found):
+                results[i] = hits[:requests[i][1]]
+        return results
+    
+    def search_many(self, queries: List[str], top_k: int = 5, nprobe: Optional[int] = None,
+                    ef_search: Optional[int] = None,
+                    query_embeddings: Optional[List[Optional[np.ndarray]]] = None) -> List[List[Dict[str, Any]]]:
+        """Search for several queries with one batched encode and one FAISS search
+        
+        query_embeddings, if given, holds precomputed embeddings (or None)
+        row for row; only the queries without one are encoded.
+        """
+        if not queries:
+            return []
+        if self.index.ntotal == 0:
+            return [[] for _ in queries]
+        
+        # Generate the missing query embeddings
+        embeddings = list(query_embeddings) if query_embeddings is not None else [None] * len(queries)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            with metrics.stage("embed_query"):
+                encoded = self.model.encode([queries[i] for i in missing])
+            metrics.inc("embedded_texts_total", len(missing), kind="queries")
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+        query_embeddings = np.array(embeddings).astype('float32')
+        
+        with self._lock:
+            # Search in FAISS, skipping tombstoned ids inside the index scan
+            selector = None
+            if self.tombstones:
+                deleted = np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones))
+                excluded = faiss.IDSelectorBatch(len(deleted), faiss.swig_ptr(deleted))
+                selector = faiss.IDSelectorNot(excluded)
+            params = search_params(
+                self.index,
+                nprobe=nprobe or self.index_params["nprobe"],
+                ef_search=ef_search or self.index_params["ef_search"],
+                sel=selector
+            )
+            k = min(top_k, self.index.ntotal)
+            if k == 0:
+                # Emptied by a purge since search() checked
+                return [[] for _ in queries]
+            with metrics.stage("faiss_search"):
+                distances, indices = self.index.search(query_embeddings, k, params=params)
+            
+            # Prepare results
+            all_results = []
+            for row_distances, row_indices in zip(distances, indices):
+                results = []
+                for dist, idx in zip(row_distances, row_indices):
+                    if 0 <= idx < len(self.docs):
+                        results.append(self._hit(int(idx), float(dist), len(results) + 1))
+                all_results.append(results)
+        
+        return all_results
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get vector store statistics"""
+        with self._lock:
+            indexed, deleted = self.index.ntotal, len(self.tombstones)
         return {
-            "total_documents": len(self.documents),
+            "total_documents": indexed - deleted,
+            "deleted_documents": deleted,
+            "stored_documents": len(self.docs),
+            "doc_store_bytes": self.docs.size_bytes(),
             "index_size": self.index.ntotal,
-            "dimension": self.dimension
+            "dimension": self.dimension,
+            "index_type": get_index_type(self.index),
+            "target_index_type": self.index_type,
+            "index_report": self.index_report,
+            "lexical_index": self.lexical.get_stats(),
+            "lexical_weight": self.lexical_weight,
+            "metadata_index": self.metadata_index.get_stats(),
+            "search_batching": self.batcher.get_stats() if self.batcher else None
         }